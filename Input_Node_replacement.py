@@ -1,6 +1,9 @@
-import json
+import logging
 import re
 import xml.etree.ElementTree as ET
+import config_registry
+
+logger = logging.getLogger(__name__)
 
 def replace_subflow_nodes(new_msgflow, json_filepath='replacement_mapping.json'):
     """
@@ -9,36 +12,33 @@ def replace_subflow_nodes(new_msgflow, json_filepath='replacement_mapping.json')
     :param new_msgflow: The root element of the msgflow XML tree.
     :param json_filepath: The path to the JSON file containing the replacement mappings.
     """
-    # Load the replacement mapping from a JSON file
-    with open(json_filepath, 'r') as f:
-        replacement_data = json.load(f)
+    # The replacement mapping is loaded once and shared (see config_registry)
+    replacement_mapping = config_registry.replacement_mapping(json_filepath)
+    debug = logger.isEnabledFor(logging.DEBUG)
 
     # Iterate through all nodes in the composition section of the msgflow
     for node in new_msgflow.findall(".//composition/nodes"):
         node_type = node.attrib.get('{http://www.omg.org/XMI}type', '')
 
-        # Check if any key in replacement_data exists within node_type
-        for key, replacement_info in replacement_data.items():
-            if key in node_type:
-                replacement_name = replacement_info.get("Name", "")
-
-                # Iterate through each original and replacement namespace mapping
-                for original_namespace, replacement_namespace in replacement_info.items():
-                    if original_namespace in ["Name"]:
-                        continue
+        # Check if any key in the replacement mapping exists within node_type
+        for entry in replacement_mapping.entries_in(node_type):
+            replacement_name = entry.name
 
-                    # Replace the node type if it contains the original namespace
-                    if original_namespace in node_type:
-                        node.attrib['{http://www.omg.org/XMI}type'] = node_type.replace(original_namespace,
-                                                                                        replacement_namespace)
+            # Iterate through each original and replacement namespace mapping
+            for original_namespace, replacement_namespace in entry.namespaces:
+                # Replace the node type if it contains the original namespace
+                if original_namespace in node_type:
+                    node.attrib['{http://www.omg.org/XMI}type'] = node_type.replace(original_namespace,
+                                                                                    replacement_namespace)
 
-                        # Update translation string if present
-                        translation_node = node.find(".//translation")
-                        if translation_node is not None:
-                            translation_node.set('string', replacement_name)
+                    # Update translation string if present
+                    translation_node = node.find(".//translation")
+                    if translation_node is not None:
+                        translation_node.set('string', replacement_name)
 
-                        print(f"Replaced subflow node '{node_type}' with '{replacement_namespace}'")
-                        break
+                    if debug:
+                        logger.debug("Replaced subflow node '%s' with '%s'", node_type, replacement_namespace)
+                    break
 
 def add_input_node_to_msgflow(msgflow_root, namespaces, json_filepath='input_node_config.json'):
     """
@@ -47,9 +47,8 @@ def add_input_node_to_msgflow(msgflow_root, namespaces, json_filepath='input_nod
     :param msgflow_root: The root element of the msgflow XML.
     :param json_filepath: The path to the JSON file containing node and connection details.
     """
-    # Load input node configuration from the JSON file
-    with open(json_filepath, 'r') as f:
-        input_node_config = json.load(f)
+    # Load input node configuration from the JSON file (see config_registry)
+    input_node_config = config_registry.input_node_config(json_filepath)
 
     input_node_details = input_node_config.get("input_node", {})
     namespace = input_node_details.get("namespace")
@@ -60,7 +59,7 @@ def add_input_node_to_msgflow(msgflow_root, namespaces, json_filepath='input_nod
     ecore_package = msgflow_root.find(".//ecore:EPackage", namespaces)
     if ecore_package is not None and namespace not in ecore_package.attrib:
         ecore_package.attrib[f"xmlns:{namespace}"] = namespace
-        print(f"Added namespace '{namespace}' to ecore:EPackage.")
+        logger.debug("Added namespace '%s' to ecore:EPackage.", namespace)
 
     # Get the maximum xmi:id for nodes and connections
     max_node_id = get_max_xmi_id(msgflow_root, ".//composition/nodes", "FCMComposite")
@@ -77,7 +76,7 @@ def add_input_node_to_msgflow(msgflow_root, namespaces, json_filepath='input_nod
         "xmi:type": "utility:ConstantString",
         "string": node_config.get("translation", "")
     })
-    print(f"Added new node with ID '{new_node_id}'.")
+    logger.debug("Added new node with ID '%s'.", new_node_id)
 
     # Insert the new node into the nodes section
     nodes_section = msgflow_root.find(".//composition")
@@ -96,7 +95,7 @@ def add_input_node_to_msgflow(msgflow_root, namespaces, json_filepath='input_nod
             "targetTerminalName": connection_details.get("targetTerminalName")
         })
         nodes_section.append(new_connection)
-        print(f"Added new connection with ID '{connection_id}'.")
+        logger.debug("Added new connection with ID '%s'.", connection_id)
 
 def get_max_xmi_id(msgflow_root, xpath, prefix):
     """
@@ -0,0 +1,53 @@
+"""Receive-side cost of a file: base64 text round trip vs. raw bytes read into a reusable buffer.
+
+Usage: python benchmarks/bench_binary_transfer.py [files] [file_kb]
+"""
+import base64
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from binary_transfer import decode_text, read_stream
+
+
+def base64_path(encoded_output):
+    # What get_remote_file_base64 does with the captured command output
+    text = encoded_output.decode("ascii").strip()
+    padding_needed = len(text) % 4
+    if padding_needed:
+        text += "=" * (4 - padding_needed)
+    return base64.b64decode(text).decode("utf-8", errors="replace")
+
+
+def binary_path(raw_output):
+    return decode_text(read_stream(io.BytesIO(raw_output)))[0]
+
+
+def bench(label, convert, outputs, wire_bytes):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for output in outputs:
+        convert(output)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} {wire_bytes / 1e6:8.1f} MB on the wire  {elapsed * 1000:8.1f} ms  peak {peak / 1e6:6.1f} MB")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    size = (int(sys.argv[2]) if len(sys.argv) > 2 else 256) * 1024
+    line = "    SET OutputRoot.XMLNSC.Ändern.Wert = InputRoot.XMLNSC.Feld; -- Kommentar\n".encode()
+    raw = [(line * (size // len(line) + 1))[:size] for _ in range(count)]
+    encoded = [base64.encodebytes(content) for content in raw]
+
+    bench("base64", base64_path, encoded, sum(map(len, encoded)))
+    bench("binary", binary_path, raw, sum(map(len, raw)))
+
+
+if __name__ == "__main__":
+    main()
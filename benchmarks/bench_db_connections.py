@@ -0,0 +1,71 @@
+"""Per-row cost of the queue/definition insert methods: connection per call vs. the manager's persistent connection.
+
+The persistent connection is measured twice: with sqlite3's prepared-statement cache switched
+off and with STATEMENT_CACHE_SIZE, which separates the cost of re-parsing the insert SQL from
+the cost of opening a connection.
+
+Usage: python benchmarks/bench_db_connections.py [rows]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection_profiles import apply_connection_profile
+from database_manager import STATEMENT_CACHE_SIZE, DatabaseManager
+
+
+def insert_queue_connect_per_call(db_path, queue_name, queue_type):
+    """The previous implementation: open, look up, insert, commit and close for every row."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT queue_id FROM Queues WHERE queue_name = ? AND queue_type = ?", (queue_name, queue_type))
+    result = cursor.fetchone()
+    if result:
+        conn.close()
+        return result[0]
+    cursor.execute("INSERT INTO Queues (queue_name, queue_type) VALUES (?, ?)", (queue_name, queue_type))
+    conn.commit()
+    queue_id = cursor.lastrowid
+    conn.close()
+    return queue_id
+
+
+def new_database(directory, name):
+    db_manager = DatabaseManager(os.path.join(directory, name), id_cache_size=0)
+    db_manager.create_database()
+    return db_manager
+
+
+def bench(label, rows, insert_row):
+    start = time.perf_counter()
+    for i in range(rows):
+        insert_row(f"QL.BENCH.{i}_EVT", "EVT")
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {rows:>7} rows  {elapsed:8.3f} s  {elapsed / rows * 1e6:9.1f} us/row")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as directory:
+        before = new_database(directory, "before.db")
+        bench("connection per call", rows, lambda name, kind: insert_queue_connect_per_call(before.db_path, name, kind))
+        before.close()
+
+        uncached = new_database(directory, "uncached.db")
+        conn = apply_connection_profile(sqlite3.connect(uncached.db_path, cached_statements=0), uncached.profile)
+        bench("persistent, no statement cache", rows, lambda name, kind: uncached.insert_queue(conn, name, kind))
+        conn.close()
+        uncached.close()
+
+        after = new_database(directory, "after.db")
+        conn = after.connect()
+        bench(f"persistent, {STATEMENT_CACHE_SIZE} statements", rows, lambda name, kind: after.insert_queue(conn, name, kind))
+        after.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""ESQL parse throughput in MB/s: the single-pass lexer against the previous regex scans.
+
+The file size is grown by adding routines to each module, which is where the regex approach,
+searching for the next CREATE FUNCTION from every function start, goes quadratic.
+
+Usage: python benchmarks/bench_esql_parser.py [routines_per_module ...]
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_esql_pool import synthetic_file
+from esql_lexer import parse_esql
+
+
+def legacy_parse(file_content):
+    """Frozen copy of the regex scans ESQLProcessor used before the lexer, returning (module, function, ops, calls)."""
+    results = []
+    module_pattern = re.compile(r'\bCREATE\s+.*?\bMODULE\s+\w+\b.*?\bEND\s+MODULE\b', re.IGNORECASE | re.DOTALL)
+    for module_match in re.finditer(module_pattern, file_content):
+        module_content = module_match.group(0)
+        module_name_match = re.search(r'\bCREATE\s+.*?\bMODULE\s+(\w+)\b', module_content, re.IGNORECASE)
+        module_name = module_name_match.group(1) if module_name_match else None
+        legacy_functions(module_content, module_name, results)
+    standalone_content = re.sub(module_pattern, "", file_content).strip()
+    if standalone_content:
+        legacy_functions(standalone_content, None, results)
+    return results
+
+
+def legacy_functions(content, module_name, results):
+    function_pattern = re.compile(r'\bCREATE\s+(?:FUNCTION|PROCEDURE)\s+([A-Za-z0-9_]+)\s*\(\s*', re.DOTALL)
+    for func_match in function_pattern.finditer(content):
+        func_start = func_match.end()
+        next_create_match = function_pattern.search(content, func_start)
+        func_end = next_create_match.start() if next_create_match else len(content)
+        func_body = content[func_start:func_end]
+
+        sql_pattern = re.compile(
+            r'''
+            \bSELECT\b.*?\bFROM\s+([\w.\{\}\(\)\[\]\|\-\+\:\'\"]+)
+            (?=\s|WHERE|;|\)|,|\()
+
+            | \bINSERT\s+INTO\s+([\w.\{\}\(\)\[\]\|\-\+\:\'\"]+)
+            (?=\s|\(|;|,)
+            ''',
+            re.IGNORECASE | re.VERBOSE | re.DOTALL
+        )
+        operations = [
+            ("SELECT" if sql_match.group(1) else "INSERT", sql_match.group(1) or sql_match.group(2))
+            for sql_match in sql_pattern.finditer(func_body)
+        ]
+        call_pattern = re.compile(r'([A-Z]*[a-z_]+[A-Za-z0-9_]*)\(\s*', re.DOTALL)
+        calls = set(call_pattern.findall(func_body))
+        results.append((module_name, func_match.group(1), operations, calls))
+
+
+def bench(label, parse, content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(content)
+    elapsed = (time.perf_counter() - start) / repeat
+    return f"{label} {len(content) / 1e6 / elapsed:7.2f} MB/s"
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1000]
+    for routines in sizes:
+        content = synthetic_file(0, modules=4, routines=routines)
+        repeat = max(1, 2000 // routines)
+        print(f"{len(content) / 1e6:7.2f} MB  {routines:>5} routines/module  "
+              f"{bench('regex', legacy_parse, content, repeat)}  {bench('lexer', parse_esql, content, repeat)}")
+
+
+if __name__ == "__main__":
+    main()
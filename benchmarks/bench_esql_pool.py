@@ -0,0 +1,66 @@
+"""ESQL parse throughput with parse_esql in a process pool, for 1..N worker processes.
+
+Only the parsing is timed; results are streamed back to this process the same way main() does
+before handing them to the writer.
+
+Usage: python benchmarks/bench_esql_pool.py [files] [max_workers] [chunksize]
+"""
+import concurrent.futures
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from esql_processor import parse_esql_file
+
+ROUTINE = """
+CREATE FUNCTION Transform_{n}() RETURNS BOOLEAN
+BEGIN
+    DECLARE rows ROW;
+    SET rows.item[] = SELECT T.ID, T.NAME FROM Database.CUSTOMER_{n} AS T WHERE T.ID = InputRoot.XMLNSC.Id;
+    INSERT INTO Database.AUDIT_{n} (ID, TS) VALUES (rows.item[1].ID, CURRENT_TIMESTAMP);
+    CALL CopyMessageHeaders();
+    SET OutputRoot.XMLNSC.Name = TRIM(rows.item[1].NAME) || formatName(rows.item[1].NAME);
+    RETURN TRUE;
+END;
+"""
+
+
+def synthetic_file(index, modules=4, routines=12):
+    parts = []
+    for m in range(modules):
+        body = "".join(ROUTINE.format(n=f"{index}_{m}_{r}") for r in range(routines))
+        parts.append(f"CREATE COMPUTE MODULE Flow_{index}_{m}\n{body}\nEND MODULE;\n")
+    parts.append(ROUTINE.format(n=f"{index}_standalone"))
+    return "".join(parts)
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    chunksize = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    jobs = [(synthetic_file(i), f"File_{i}.esql", 1) for i in range(files)]
+    megabytes = sum(len(content) for content, _, _ in jobs) / 1e6
+
+    baseline = None
+    workers = 1
+    while True:
+        start = time.perf_counter()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            routines = sum(
+                len(module.routines)
+                for _, _, modules in executor.map(parse_esql_file, jobs, chunksize=chunksize)
+                for module in modules
+            )
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>3} workers  {elapsed:7.2f} s  {megabytes / elapsed:7.2f} MB/s  "
+              f"speed-up {baseline / elapsed:5.2f}  ({routines} routines)")
+        if workers >= max_workers:
+            break
+        workers = min(workers * 2, max_workers)
+
+
+if __name__ == "__main__":
+    main()
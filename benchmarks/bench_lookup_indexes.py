@@ -0,0 +1,93 @@
+"""Get-or-create lookup latency on Nodes as the table grows, with and without the natural-key indexes.
+
+The tables are grown in steps (10k, 100k, 1M nodes by default) and the Nodes lookup used by
+insert_node is timed after each step. Without indexes the lookup is a full table scan, so only
+the smaller steps are timed for that case.
+
+Usage: python benchmarks/bench_lookup_indexes.py [max_rows] [lookups]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import JOIN_INDEXES, NATURAL_KEY_INDEXES, DatabaseManager
+
+NODES_PER_FLOW = 20
+UNINDEXED_MAX_ROWS = 100000
+NODE_LOOKUP = "SELECT node_id FROM Nodes WHERE node_name = ? AND msgflow_id = ?"
+
+
+def new_database(directory, name, indexed):
+    db_manager = DatabaseManager(os.path.join(directory, name), id_cache_size=0)
+    db_manager.create_database()
+    conn = db_manager.connect()
+    if not indexed:
+        for index_name, _, _ in NATURAL_KEY_INDEXES + JOIN_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+    conn.execute("INSERT INTO Projects (project_name) VALUES ('BENCH')")
+    conn.commit()
+    return db_manager, conn
+
+
+def grow(conn, start, end):
+    """Adds nodes start..end-1, NODES_PER_FLOW per message flow."""
+    first_flow, last_flow = start // NODES_PER_FLOW, end // NODES_PER_FLOW
+    conn.executemany(
+        "INSERT INTO MsgFlows (msgflow_id, msgflow_name, project_id) VALUES (?, ?, 1)",
+        ((flow + 1, f"MF_{flow}") for flow in range(first_flow, last_flow)),
+    )
+    conn.executemany(
+        "INSERT INTO Nodes (node_name, msgflow_id) VALUES (?, ?)",
+        ((f"Node_{i % NODES_PER_FLOW}_{i}", i // NODES_PER_FLOW + 1) for i in range(start, end)),
+    )
+    conn.commit()
+
+
+def time_lookups(conn, rows, lookups):
+    keys = [(f"Node_{i % NODES_PER_FLOW}_{i}", i // NODES_PER_FLOW + 1) for i in random.sample(range(rows), lookups)]
+    start = time.perf_counter()
+    for key in keys:
+        conn.execute(NODE_LOOKUP, key).fetchone()
+    return (time.perf_counter() - start) / lookups * 1e6
+
+
+def sizes(max_rows):
+    size = 10000
+    while size < max_rows:
+        yield size
+        size *= 10
+    yield max_rows
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directory:
+        indexed, indexed_conn = new_database(directory, "indexed.db", indexed=True)
+        unindexed, unindexed_conn = new_database(directory, "unindexed.db", indexed=False)
+
+        print(f"{'rows':>9}  {'indexed':>12}  {'unindexed':>12}")
+        previous = 0
+        for rows in sizes(max_rows):
+            grow(indexed_conn, previous, rows)
+            indexed_us = time_lookups(indexed_conn, rows, lookups)
+            unindexed_column = "-"
+            if rows <= UNINDEXED_MAX_ROWS:
+                grow(unindexed_conn, previous, rows)
+                # A scan per lookup: keep the sample small so the run finishes
+                unindexed_us = time_lookups(unindexed_conn, rows, max(1, lookups // 20))
+                unindexed_column = f"{unindexed_us:9.1f} us"
+            print(f"{rows:>9}  {indexed_us:9.1f} us  {unindexed_column:>12}")
+            previous = rows
+
+        indexed.close()
+        unindexed.close()
+
+
+if __name__ == "__main__":
+    main()
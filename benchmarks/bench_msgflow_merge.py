@@ -0,0 +1,104 @@
+"""Merging promoted properties into a flow: one insert() and chain walk per element against splice and tail pointer.
+
+A generated flow classifier with a few hundred nodes and connections receives the given
+number of promoted properties, each with an eStructuralFeature, a propertyDescriptor and an
+attributeLink. The previous code inserted every feature and link with insert(), shifting the
+child list each time, and walked the whole nested descriptor chain for every descriptor. The
+current code splices the features and links in with one rebuild of the child list and appends
+the descriptors behind a tail pointer. Both must build the same tree.
+
+Usage: python benchmarks/bench_msgflow_merge.py [properties ...]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from msgflow_manipulation import insert_propertyDescriptors, splice_children
+
+
+def synthetic_classifier(nodes=300):
+    classifier = ET.Element("eClassifiers", {"name": "FCMComposite_1"})
+    ET.SubElement(classifier, "eSuperTypes", {"href": "http://www.ibm.com/wbi/2005/eflow#//FCMBlock"})
+    ET.SubElement(classifier, "eStructuralFeatures", {"name": "Existing"})
+    composition = ET.SubElement(classifier, "composition")
+    for index in range(nodes):
+        ET.SubElement(composition, "nodes", {"location": f"{index},{index}"})
+        ET.SubElement(composition, "connections", {"targetNode": f"FCMComposite_1_{index}"})
+    organizer = ET.SubElement(classifier, "propertyOrganizer")
+    ET.SubElement(organizer, "propertyDescriptor", {"describedAttribute": "Property.Existing"})
+    ET.SubElement(classifier, "stickyBoard")
+    return classifier
+
+
+def promoted_properties(properties):
+    features = [ET.Element("eStructuralFeatures", {"name": f"Prop{i}"}) for i in range(properties)]
+    descriptors = [ET.Element("propertyDescriptor", {"describedAttribute": f"Property.Prop{i}"}) for i in range(properties)]
+    links = [ET.Element("attributeLinks", {"promotedAttribute": f"Property.Prop{i}"}) for i in range(properties)]
+    return features, descriptors, links
+
+
+def legacy(classifier, features, descriptors, links):
+    """Frozen copy of the insertion steps of create_new_msgflow before the splice and the tail pointer."""
+    last_index = list(classifier).index(classifier.findall("eStructuralFeatures")[-1])
+    for feature in features:
+        classifier.insert(last_index + 1, feature)
+        last_index += 1
+        print(f"Inserted eStructuralFeature with xmi:id: {feature.attrib.get('xmi:id')}")
+    property_organizer = classifier.find(".//propertyOrganizer")
+    for descriptor in descriptors:
+        current = property_organizer
+        while True:
+            last_pd = current.findall("propertyDescriptor")
+            if not last_pd:
+                break
+            current = last_pd[-1]
+        current.append(descriptor)
+        print(f"Inserted propertyDescriptor with describedAttribute: {descriptor.attrib.get('describedAttribute')}")
+    property_organizer_index = list(classifier).index(property_organizer)
+    for link in links:
+        property_organizer_index += 1
+        classifier.insert(property_organizer_index, link)
+        print(f"Inserted attributeLink with promotedAttribute: {link.attrib.get('promotedAttribute')}")
+
+
+def spliced(classifier, features, descriptors, links):
+    children = list(classifier)
+    property_organizer = classifier.find(".//propertyOrganizer")
+    last_feature_index = max(index for index, child in enumerate(children) if child.tag == "eStructuralFeatures")
+    property_organizer_index = children.index(property_organizer)
+    for feature in features:
+        print(f"Inserted eStructuralFeature with xmi:id: {feature.attrib.get('xmi:id')}")
+    for link in links:
+        print(f"Inserted attributeLink with promotedAttribute: {link.attrib.get('promotedAttribute')}")
+    splice_children(classifier, [(last_feature_index + 1, features), (property_organizer_index + 1, links)])
+    insert_propertyDescriptors(property_organizer, descriptors)
+
+
+def timed(merge, properties):
+    classifier = synthetic_classifier()
+    elements = promoted_properties(properties)
+    # Both versions print per inserted element; the output is discarded
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        merge(classifier, *elements)
+        elapsed = time.perf_counter() - start
+    return ET.tostring(classifier), elapsed
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 300, 800]
+    print(f"{'properties':>10}  {'legacy ms':>9}  {'spliced ms':>10}")
+    for properties in sizes:
+        expected, legacy_time = timed(legacy, properties)
+        result, spliced_time = timed(spliced, properties)
+        assert result == expected, "trees differ"
+        print(f"{properties:>10}  {legacy_time * 1000:>9.1f}  {spliced_time * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
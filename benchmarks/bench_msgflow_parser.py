@@ -0,0 +1,76 @@
+"""Msgflow parse time and peak memory: the regex scans against the streaming parser, on generated flows.
+
+Each node carries a block of filler elements, like the layout and property data of real
+flows, which is what the lazy DOTALL patterns have to step over. In the "regular" layout
+both parsers must agree. In the "typed" layout user-defined properties carry a type
+attribute between name and value: the property pattern then searches the rest of the flow
+from every property, which is quadratic, and finds nothing.
+
+Times are measured without tracing; peak memory in a second, traced run.
+
+Usage: python benchmarks/bench_msgflow_parser.py [nodes ...]
+"""
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from msgflow_parser import iter_msgflow, iter_msgflow_regex
+
+
+def synthetic_flow(nodes, filler=40, typed=False):
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<Flow xmlns:xmi="http://www.omg.org/XMI">\n']
+    for index in range(nodes):
+        padding = "".join(
+            f'    <Property key="property{i}" value="{"x" * 60}" location="{i},{index}"/>\n' for i in range(filler)
+        )
+        if index % 5 == 0:
+            body = f'    <Subflow uri="Sub{index}.subflow"/>\n'
+        else:
+            body = (
+                f'    <ComputeNode codeType="ESQL" moduleName="Module_{index}" functionName="Main"'
+                f' dataSource="DS{index % 3}"/>\n'
+            )
+        parts.append(f'  <Node xmi:id="n{index}" name="Node_{index}" x="{index}" y="{index}">\n{padding}{body}  </Node>\n')
+    for index in range(nodes // 2):
+        udp_type = ' type="String"' if typed else ""
+        parts.append(f'  <UserDefinedProperty name="udp{index}"{udp_type} value="value{index}"/>\n')
+    parts.append("</Flow>\n")
+    return "".join(parts)
+
+
+def measure(parse):
+    start = time.perf_counter()
+    result = parse()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    parse()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 400, 1600]
+    print(f"{'layout':<8} {'nodes':>6} {'MB':>6}  {'regex ms':>9} {'peak MB':>8}  {'stream ms':>9} {'peak MB':>8}  {'speedup':>7}")
+    for typed in (False, True):
+        for nodes in sizes:
+            flow = synthetic_flow(nodes, typed=typed)
+            encoded = flow.encode()
+            regex, regex_time, regex_peak = measure(lambda: list(iter_msgflow_regex(flow)))
+            # The streaming parser reads from a file object here, as it would from a fetched stream
+            stream, stream_time, stream_peak = measure(lambda: list(iter_msgflow(io.BytesIO(encoded))))
+            if not typed:
+                assert sorted(regex) == sorted(stream), "parsers disagree"
+            print(
+                f"{'typed' if typed else 'regular':<8} {nodes:>6} {len(encoded) / 1e6:>6.1f}"
+                f"  {regex_time * 1000:>9.1f} {regex_peak / 1e6:>8.2f}"
+                f"  {stream_time * 1000:>9.1f} {stream_peak / 1e6:>8.2f}  {regex_time / stream_time:>6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
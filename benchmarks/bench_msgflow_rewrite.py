@@ -0,0 +1,120 @@
+"""Msgflow rewrite I/O: time and peak memory to load a flow and write it back out.
+
+The previous path read the flow into a string, parsed it, serialized it, parsed that
+again, serialized again and then spliced and replaced over the whole document string
+before writing it. The current path parses the file into one tree (collecting the
+namespaces on the way) and streams that tree to the output file. Both must write the
+same bytes.
+
+Times are measured without tracing; peak memory in a second, traced run.
+
+Usage: python benchmarks/bench_msgflow_rewrite.py [nodes ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from msgflow_manipulation import (
+    _StartTagSplicer, extract_namespaces, load_msgflow, update_ecore_package_content, update_tree_namespaces
+)
+
+REPLACEMENT_MAPPING = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'replacement_mapping.json')
+
+
+def synthetic_flow(nodes):
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<ecore:EPackage xmi:version="2.0" xmlns:xmi="http://www.omg.org/XMI"'
+        ' xmlns:ecore="http://www.eclipse.org/emf/2002/Ecore" xmlns:eflow="http://www.ibm.com/wbi/2005/eflow"'
+        ' xmlns:utility="http://www.ibm.com/wbi/2005/eflow_utility"'
+        ' xmlns:de_it_eai_STD_INPUT.subflow="de/it/eai/STD_INPUT.subflow" nsURI="flows/Bench.msgflow">\n'
+        '  <eClassifiers xmi:type="eflow:FCMComposite" name="FCMComposite_1">\n'
+        '    <eSuperTypes href="http://www.ibm.com/wbi/2005/eflow#//FCMBlock"/>\n    <composition>\n'
+    ]
+    for index in range(nodes):
+        node_type = "de_it_eai_STD_INPUT.subflow:FCMComposite_1" if index % 10 == 0 else "ComIbmCompute.msgnode:FCMComposite_1"
+        parts.append(
+            f'      <nodes xmi:type="{node_type}" xmi:id="FCMComposite_1_{index}" location="{index},{index}"'
+            f' computeExpression="esql://routine/de.it.eai#Module_{index}.Main">\n'
+            f'        <translation xmi:type="utility:ConstantString" string="Node {index}"/>\n      </nodes>\n'
+        )
+    for index in range(nodes):
+        parts.append(
+            f'      <connections xmi:type="eflow:FCMConnection" xmi:id="FCMConnection_{index}"'
+            f' targetNode="FCMComposite_1_{index}" sourceNode="FCMComposite_1_{(index + 1) % nodes}"'
+            f' sourceTerminalName="OutTerminal.out" targetTerminalName="InTerminal.in"/>\n'
+        )
+    parts.append('    </composition>\n    <stickyBoard/>\n  </eClassifiers>\n</ecore:EPackage>\n')
+    return "".join(parts)
+
+
+def legacy_round_trip(path, out_path):
+    """Frozen copy of the load and write steps of read_msgflow_file/create_new_msgflow before one tree per flow."""
+    with open(path, 'r', encoding='utf-8') as file:
+        content = file.read()
+    root = ET.fromstring(content)
+    namespaces = extract_namespaces(content)
+    for prefix, uri in namespaces.items():
+        ET.register_namespace(prefix, uri)
+    modified_content = ET.tostring(root, encoding='utf-8').decode('utf-8')
+    new_msgflow = ET.fromstring(modified_content)
+    for prefix, uri in extract_namespaces(modified_content).items():
+        ET.register_namespace(prefix, uri)
+    xml_string = ET.tostring(new_msgflow, encoding='utf-8').decode('utf-8')
+    start_index = content.find('<ecore:EPackage') + len('<ecore:EPackage')
+    end_index = content.find('>', start_index)
+    start_tag_index = xml_string.find('<ecore:EPackage') + len('<ecore:EPackage')
+    end_tag_index = xml_string.find('>', start_tag_index)
+    new_string = xml_string[:start_tag_index] + content[start_index:end_index + 1] + xml_string[end_tag_index + 1:]
+    final_content = update_ecore_package_content('<?xml version="1.0" encoding="UTF-8"?>\n' + new_string, REPLACEMENT_MAPPING)
+    with open(out_path, 'w', encoding='utf-8') as file:
+        file.write(final_content)
+
+
+def streamed_round_trip(path, out_path):
+    root, namespaces, epackage_attributes = load_msgflow(path)
+    for prefix, uri in namespaces.items():
+        ET.register_namespace(prefix, uri)
+    update_tree_namespaces(root, REPLACEMENT_MAPPING)
+    epackage_attributes = update_ecore_package_content(epackage_attributes, REPLACEMENT_MAPPING)
+    with open(out_path, 'w', encoding='utf-8') as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        ET.ElementTree(root).write(_StartTagSplicer(file, epackage_attributes), encoding='unicode')
+
+
+def measure(round_trip, path, out_path):
+    start = time.perf_counter()
+    round_trip(path, out_path)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    round_trip(path, out_path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    with open(out_path, 'rb') as f:
+        return f.read(), elapsed, peak
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 5000, 20000]
+    print(f"{'nodes':>6} {'MB':>6}  {'legacy ms':>9} {'peak MB':>8}  {'streamed ms':>11} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'Bench.msgflow')
+        for nodes in sizes:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(synthetic_flow(nodes))
+            legacy, legacy_time, legacy_peak = measure(legacy_round_trip, path, path + '.legacy')
+            streamed, streamed_time, streamed_peak = measure(streamed_round_trip, path, path + '.streamed')
+            assert legacy == streamed, "outputs differ"
+            print(
+                f"{nodes:>6} {os.path.getsize(path) / 1e6:>6.1f}  {legacy_time * 1000:>9.1f} {legacy_peak / 1e6:>8.1f}"
+                f"  {streamed_time * 1000:>11.1f} {streamed_peak / 1e6:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Promoted property lookup and rename: per-feature tree searches and list scans against the xmi:id index.
+
+A generated subflow promotes the given number of properties. For each feature, the rewrite takes its
+attribute link and, on a rename, updates its descriptor and link. The previous code searched
+the subflow tree for the link of every feature and scanned all descriptors and links for every
+rename, both quadratic in the number of properties. The current code looks both up in the index
+of the SubflowTemplate and of index_related_elements. Renames here never collide, so both must
+produce the same elements.
+
+Usage: python benchmarks/bench_promoted_properties.py [properties ...]
+"""
+import contextlib
+import copy
+import io
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from msgflow_manipulation import index_related_elements, update_related_elements
+from subflow_repository import SubflowTemplate
+
+XMI_ID = '{http://www.omg.org/XMI}id'
+
+
+def synthetic_subflow(properties):
+    ids = [f"Property.Prop{i}" for i in range(properties)]
+    parts = ['<ecore:EPackage xmlns:xmi="http://www.omg.org/XMI" xmlns:ecore="http://www.eclipse.org/emf/2002/Ecore">'
+             '<eClassifiers name="FCMComposite_1">']
+    parts.extend(f'<eStructuralFeatures xmi:id="{xmi_id}" name="{xmi_id[9:]}"><eType href="#//EString"/></eStructuralFeatures>'
+                 for xmi_id in ids)
+    parts.append('<composition><nodes xmi:id="FCMComposite_1_1"/></composition><propertyOrganizer>')
+    parts.extend(f'<propertyDescriptor describedAttribute="{xmi_id}"><propertyName key="{xmi_id}"/>' for xmi_id in ids)
+    parts.append('</propertyDescriptor>' * len(ids) + '</propertyOrganizer>')
+    parts.extend(f'<attributeLinks promotedAttribute="{xmi_id}" overriddenNodes="FCMComposite_1_1">'
+                 f'<overriddenAttribute href="ComIbmCompute.msgnode#{xmi_id}"/></attributeLinks>' for xmi_id in ids)
+    parts.append('</eClassifiers></ecore:EPackage>')
+    return ET.fromstring("".join(parts))
+
+
+def legacy(root):
+    """Frozen copy of the lookups of extract_attributeLinks and update_related_elements before the index."""
+    template = SubflowTemplate("bench.subflow", 0, root)
+    features = template.features()
+    descriptors = [template.property_descriptor(feature.get(XMI_ID)) for feature in features]
+    links = [copy.deepcopy(root.find(f".//attributeLinks[@promotedAttribute='{feature.get(XMI_ID)}']"))
+             for feature in features]
+    for feature in features:
+        original_id = feature.get(XMI_ID)
+        modified_id = original_id + "_1"
+        for prop_desc in descriptors:
+            if prop_desc.attrib.get('describedAttribute') == original_id:
+                prop_desc.attrib['describedAttribute'] = modified_id
+                for property_name in prop_desc.findall('propertyName'):
+                    property_name.attrib['key'] = modified_id
+                print(f"Updated propertyDescriptor for describedAttribute: {modified_id}")
+        for attr_link in links:
+            if attr_link.attrib.get('promotedAttribute') == original_id:
+                attr_link.attrib['promotedAttribute'] = modified_id
+                for overridden_attribute in attr_link.findall('overriddenAttribute'):
+                    overridden_attribute.attrib['href'] = f"{overridden_attribute.get('href').split('#')[0]}#{original_id}"
+                print(f"Updated attributeLink for promotedAttribute: {modified_id}")
+    return descriptors, links
+
+
+def indexed(root):
+    template = SubflowTemplate("bench.subflow", 0, root)
+    features = template.features()
+    descriptors = [template.property_descriptor(feature.get(XMI_ID)) for feature in features]
+    links = [template.attribute_link(feature.get(XMI_ID)) for feature in features]
+    related_elements = index_related_elements(descriptors, links)
+    for feature in features:
+        original_id = feature.get(XMI_ID)
+        property_descriptors, attribute_links = related_elements.get(original_id, ((), ()))
+        update_related_elements(original_id, 1, property_descriptors, attribute_links, original_id + "_1")
+    return descriptors, links
+
+
+def timed(function, root):
+    # Both versions print per updated element; the output is discarded
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = function(root)
+        return result, time.perf_counter() - start
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [50, 200, 800]
+    print(f"{'properties':>10}  {'legacy ms':>9}  {'indexed ms':>10}")
+    for properties in sizes:
+        root = synthetic_subflow(properties)
+        expected, legacy_time = timed(legacy, root)
+        result, indexed_time = timed(indexed, root)
+        serialize = lambda elements: [ET.tostring(element) for group in elements for element in group]
+        assert serialize(result) == serialize(expected), "results differ"
+        print(f"{properties:>10}  {legacy_time * 1000:>9.1f}  {indexed_time * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Property file parse time: the indexed single-pass parser against the previous per-value rescans.
+
+A generated file has one replace.value.N line per ten lines, each with values for a few
+environments, plus queues and a database property. The previous parser rescans the whole
+file for every replace.value line, so it is only timed up to --legacy-lines lines; where
+it runs, both parsers must return the same structure.
+
+Usage: python benchmarks/bench_property_parser.py [lines ...] [--legacy-lines N]
+"""
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from properties_processor import PropertiesProcessor
+
+ENVIRONMENTS = ("dev", "test", "acc", "prod")
+
+
+def synthetic_properties(lines):
+    out = ["prod.broker.eg=EG_MAIN_01"]
+    for env in ENVIRONMENTS:
+        out.append(f"{env}.replace.replacement.17=DB_{env.upper()}")
+    number = 100
+    while len(out) < lines:
+        kind = number % 4
+        name = ("{RPL_DB%02d}", "{RPL_URL_%d}", "{SETTING_%d}", "{RPL_Q_%d}")[kind] % number
+        out.append(f"replace.value.{number}={name}")
+        for env in ENVIRONMENTS:
+            value = f"APP.{number}.QUEUE_EVT" if kind == 3 else f"{env}-value-{number}"
+            out.append(f"{env}.replace.replacement.{number}={value}")
+        out.append(f"replace.replacement.{number}=common-value-{number}")
+        out.extend(f"# comment line {number}.{i}" for i in range(4))
+        number += 1
+    return "\n".join(out[:lines]) + "\n"
+
+
+def legacy_parse(content):
+    """Frozen copy of PropertiesProcessor._parse_env_properties before the prop_num index."""
+    properties = {
+        "integration_server": None,
+        "queues": set(),
+        "database_names": defaultdict(dict),
+        "webservices": defaultdict(dict),
+        "other_properties": defaultdict(dict)
+    }
+    integration_server_pattern = re.compile(r"^prod\.broker\.eg=(.+)$", re.MULTILINE)
+    queue_pattern = re.compile(r"=(.+?(_EVT|_ERR|_CPY))$", re.MULTILINE)
+    db_property_pattern = re.compile(r"^(?P<env>\w+)\.replace\.replacement\.17=(?P<value>.+)$", re.MULTILINE)
+    dynamic_property_pattern = re.compile(r"^(?P<env>\w+)?\.?replace\.replacement\.(?P<prop_num>\d+)=(?P<value>.+)$", re.MULTILINE)
+    prop_value_pattern = re.compile(r"^replace\.value\.(?P<num>\d+)=(?P<property_name>.+)$", re.MULTILINE)
+
+    match = integration_server_pattern.search(content)
+    if match:
+        properties["integration_server"] = match.group(1).strip()
+    for match in queue_pattern.finditer(content):
+        properties["queues"].add(match.group(1).strip())
+    for match in db_property_pattern.finditer(content):
+        properties["database_names"]["{RPL_DB00}"][match.group("env")] = match.group("value").strip()
+    for match in prop_value_pattern.finditer(content):
+        num = match.group("num")
+        property_name = match.group("property_name").strip()
+        for env_match in dynamic_property_pattern.finditer(content):
+            env = env_match.group("env") or "common"
+            value = env_match.group("value").strip()
+            if env_match.group("prop_num") == num:
+                if "RPL_DB" in property_name:
+                    properties["database_names"][property_name][env] = value
+                elif "RPL_" in property_name and "URL" in property_name:
+                    properties["webservices"][property_name][env] = value
+                elif any(value in prop_set for prop_set in [properties["queues"], properties["database_names"], properties["webservices"]]):
+                    continue
+                else:
+                    properties["other_properties"][property_name][env] = value
+    return properties
+
+
+def timed(parse, content):
+    start = time.perf_counter()
+    result = parse(content)
+    return result, time.perf_counter() - start
+
+
+def main():
+    args = sys.argv[1:]
+    legacy_lines = 10000
+    if "--legacy-lines" in args:
+        position = args.index("--legacy-lines")
+        legacy_lines = int(args[position + 1])
+        del args[position:position + 2]
+    sizes = [int(arg) for arg in args] or [1000, 10000, 50000]
+
+    parser = PropertiesProcessor.__new__(PropertiesProcessor)  # Parsing needs no database
+    print(f"{'lines':>7} {'KB':>6}  {'indexed ms':>10}  {'legacy ms':>10}")
+    for lines in sizes:
+        content = synthetic_properties(lines)
+        result, elapsed = timed(parser._parse_env_properties, content)
+        legacy = "skipped"
+        if lines <= legacy_lines:
+            expected, legacy_elapsed = timed(legacy_parse, content)
+            assert result == expected, "parsers disagree"
+            legacy = f"{legacy_elapsed * 1000:.1f}"
+        print(f"{lines:>7} {len(content) / 1024:>6.0f}  {elapsed * 1000:>10.1f}  {legacy:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Per-element messages of the msgflow rewrite: unconditional print against level-gated logging.
+
+A generated flow with the given number of nodes has every node shifted and receives as many
+promoted properties, each renamed and its propertyDescriptor appended to the descriptor chain.
+The previous code printed a formatted line per node, per renamed element and per descriptor.
+The current code logs them at DEBUG, behind one isEnabledFor check per call when debug logging
+is off, as it is by default. stdout goes to os.devnull, so the legacy time includes the writes
+but not a terminal. Both must build the same tree.
+
+Usage: python benchmarks/bench_rewrite_logging.py [nodes ...]
+"""
+import contextlib
+import logging
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from msgflow_manipulation import (
+    index_related_elements, insert_propertyDescriptors, shift_nodes_x_axis, update_related_elements
+)
+
+XMI_ID = '{http://www.omg.org/XMI}id'
+
+
+def synthetic_flow(nodes):
+    root = ET.Element("EPackage")
+    classifier = ET.SubElement(root, "eClassifiers")
+    composition = ET.SubElement(classifier, "composition")
+    for index in range(nodes):
+        ET.SubElement(composition, "nodes", {XMI_ID: f"FCMComposite_1_{index}", "location": f"{index},{index}"})
+    organizer = ET.SubElement(classifier, "propertyOrganizer")
+    descriptors = []
+    links = []
+    for index in range(nodes):
+        descriptor = ET.Element("propertyDescriptor", {"describedAttribute": f"Property.Prop{index}"})
+        ET.SubElement(descriptor, "propertyName", {"key": f"Property.Prop{index}"})
+        descriptors.append(descriptor)
+        link = ET.Element("attributeLinks", {"promotedAttribute": f"Property.Prop{index}"})
+        ET.SubElement(link, "overriddenAttribute", {"href": f"de/it/eai/STD_INPUT.subflow#Property.Prop{index}"})
+        links.append(link)
+    return root, organizer, descriptors, links
+
+
+def legacy(root, organizer, descriptors, links):
+    """Frozen copy of the element loops of shift_nodes_x_axis, update_related_elements and
+    insert_propertyDescriptors before level-gated logging."""
+    for node in root.findall(".//composition/nodes"):
+        x, y = map(int, node.attrib['location'].split(','))
+        new_location = f"{x + 200},{y}"
+        node.set('location', new_location)
+        print(f"Updated node '{node.attrib.get('xmi:id')}' location to: {new_location}")
+    for index, (prop_desc, attr_link) in enumerate(zip(descriptors, links)):
+        modified_id = f"Property.Prop{index}_1"
+        prop_desc.attrib['describedAttribute'] = modified_id
+        for property_name in prop_desc.findall('propertyName'):
+            property_name.attrib['key'] = modified_id
+        print(f"Updated propertyDescriptor for describedAttribute: {prop_desc.attrib['describedAttribute']}")
+        original_id = attr_link.attrib['promotedAttribute']
+        attr_link.attrib['promotedAttribute'] = modified_id
+        for overridden_attribute in attr_link.findall('overriddenAttribute'):
+            overridden_attribute.attrib['href'] = f"{overridden_attribute.get('href').split('#')[0]}#{original_id}"
+        print(f"Updated attributeLink for promotedAttribute: {attr_link.attrib['promotedAttribute']}")
+    tail = organizer
+    for new_property_desc in descriptors:
+        tail.append(new_property_desc)
+        print(f"Inserted propertyDescriptor with describedAttribute: {new_property_desc.attrib.get('describedAttribute')}")
+        tail = new_property_desc
+
+
+def gated(root, organizer, descriptors, links):
+    shift_nodes_x_axis(root, 200)
+    related_elements = index_related_elements(descriptors, links)
+    for index in range(len(descriptors)):
+        original_id = f"Property.Prop{index}"
+        property_descriptors, attribute_links = related_elements[original_id]
+        update_related_elements(original_id, 1, property_descriptors, attribute_links, f"{original_id}_1")
+    insert_propertyDescriptors(organizer, descriptors)
+
+
+def timed(rewrite, nodes):
+    elements = synthetic_flow(nodes)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        rewrite(*elements)
+        elapsed = time.perf_counter() - start
+    return ET.tostring(elements[0]), elapsed
+
+
+def main():
+    # As configure_logging sets it up by default: summaries at INFO, element details off
+    logging.basicConfig(level=logging.INFO)
+    sizes = [int(arg) for arg in sys.argv[1:]] or [200, 500, 900]
+    print(f"{'nodes':>6}  {'print ms':>8}  {'gated ms':>8}")
+    for nodes in sizes:
+        expected, legacy_time = timed(legacy, nodes)
+        result, gated_time = timed(gated, nodes)
+        assert result == expected, "trees differ"
+        print(f"{nodes:>6}  {legacy_time * 1000:>8.1f}  {gated_time * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Fetch throughput of RemoteFileHandler over FakeSSHExecutor: one session vs. SSHSessionPool sizes vs. one tar stream.
+
+Usage: python benchmarks/bench_ssh_pool.py [files] [latency_ms] [failure_rate]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_ssh_executor import FakeSSHExecutor
+from remote_file_handler import RemoteFileHandler
+from ssh_pool import SSHSessionPool
+
+FOLDER = "/repo/PROJECT"
+
+
+def bench(label, files, fetch):
+    start = time.perf_counter()
+    fetched = sum(1 for _, content in fetch() if content)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {fetched:>6} files  {elapsed:7.2f} s  {fetched / elapsed:8.1f} files/s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+    failure_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    files = {f"{FOLDER}/flows/File_{i}.esql": b"CREATE FUNCTION f() BEGIN END;\n" * 100 for i in range(count)}
+    paths = sorted(files)
+
+    single = RemoteFileHandler(FakeSSHExecutor(files, latency=latency, failure_rate=failure_rate, seed=1))
+    bench("single session", files, lambda: single.fetch_files("cvsroot", paths))
+
+    for size in (1, 4, 8, 16):
+        pool = SSHSessionPool(
+            lambda: FakeSSHExecutor(files, latency=latency, failure_rate=failure_rate), size=size, backoff_base=0.05
+        )
+        handler = RemoteFileHandler(pool)
+        bench(f"pool of {size}", files, lambda: handler.fetch_files("cvsroot", paths))
+        pool.close()
+        if pool.stats["retries"] or pool.stats["failures"]:
+            print(f"{'':<24} {pool.stats['retries']} retries, {pool.stats['failures']} failures")
+
+    bulk = RemoteFileHandler(FakeSSHExecutor(files, latency=latency))
+    bench("one tar stream", files, lambda: bulk.iter_folder_files("cvsroot", FOLDER, ("esql",)))
+
+
+if __name__ == "__main__":
+    main()
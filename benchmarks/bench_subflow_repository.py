@@ -0,0 +1,98 @@
+"""Subflow reads: parsing the .subflow for every subflow node against the SubflowRepository.
+
+A generated subflow promotes --properties properties, each with a feature, a descriptor in
+the nested descriptor chain and an attribute link. Every lookup then takes what the rewrite
+needs: the features and, per feature, its descriptor and attribute link. The previous path
+parses the file and deep-copies the descriptor (with the rest of its chain) per lookup.
+
+Usage: python benchmarks/bench_subflow_repository.py [lookups ...] [--properties N]
+"""
+import copy
+import os
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from subflow_repository import SubflowRepository
+
+
+def synthetic_subflow(properties):
+    ids = [f"Property.Prop{i}" for i in range(properties)]
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<ecore:EPackage xmlns:xmi="http://www.omg.org/XMI" xmlns:ecore="http://www.eclipse.org/emf/2002/Ecore"'
+        ' xmlns:eflow="http://www.ibm.com/wbi/2005/eflow" nsURI="de/it/eai/BENCH.subflow">\n'
+        '  <eClassifiers xmi:type="eflow:FCMComposite" name="FCMComposite_1">\n'
+    ]
+    parts.extend(
+        f'    <eStructuralFeatures xmi:type="ecore:EAttribute" xmi:id="{xmi_id}" name="{xmi_id[9:]}">\n'
+        f'      <eType xmi:type="ecore:EDataType" href="http://www.eclipse.org/emf/2002/Ecore#//EString"/>\n'
+        f'    </eStructuralFeatures>\n' for xmi_id in ids
+    )
+    parts.append('    <propertyOrganizer>\n')
+    parts.extend(f'<propertyDescriptor groupName="Group.Basic" describedAttribute="{xmi_id}">'
+                 f'<propertyName key="{xmi_id}"/>' for xmi_id in ids)
+    parts.append('</propertyDescriptor>' * len(ids) + '\n    </propertyOrganizer>\n')
+    parts.extend(
+        f'    <attributeLinks promotedAttribute="{xmi_id}" overriddenNodes="FCMComposite_1_1">\n'
+        f'      <overriddenAttribute href="ComIbmCompute.msgnode#{xmi_id}"/>\n    </attributeLinks>\n' for xmi_id in ids
+    )
+    parts.append('  </eClassifiers>\n</ecore:EPackage>\n')
+    return "".join(parts)
+
+
+def parse_every_time(path):
+    """The previous read_subflow_file and extract_* lookups."""
+    with open(path, 'r', encoding='utf-8') as file:
+        root = ET.fromstring(file.read())
+    features = root.findall(".//eClassifiers/eStructuralFeatures")
+    descriptors = {pd.attrib.get('describedAttribute'): pd for pd in root.iter('propertyDescriptor')}
+    for feature in features:
+        xmi_id = feature.attrib.get('{http://www.omg.org/XMI}id')
+        copy.deepcopy(descriptors[xmi_id])
+        root.find(f".//attributeLinks[@promotedAttribute='{xmi_id}']")
+
+
+def from_repository(repository, path):
+    template = repository.get(path)
+    for feature in template.features():
+        xmi_id = feature.attrib.get('{http://www.omg.org/XMI}id')
+        template.property_descriptor(xmi_id)
+        template.attribute_link(xmi_id)
+
+
+def main():
+    args = sys.argv[1:]
+    properties = 50
+    if "--properties" in args:
+        position = args.index("--properties")
+        properties = int(args[position + 1])
+        del args[position:position + 2]
+    sizes = [int(arg) for arg in args] or [100, 1000]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "BENCH.subflow")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(synthetic_subflow(properties))
+        print(f"{properties} promoted properties, {os.path.getsize(path) / 1024:.0f} KB")
+        print(f"{'lookups':>8}  {'parse ms':>9}  {'cached ms':>9}  {'hit rate':>8}")
+        for lookups in sizes:
+            start = time.perf_counter()
+            for _ in range(lookups):
+                parse_every_time(path)
+            parse_time = time.perf_counter() - start
+
+            repository = SubflowRepository()
+            start = time.perf_counter()
+            for _ in range(lookups):
+                from_repository(repository, path)
+            cached_time = time.perf_counter() - start
+            hit_rate = repository.stats()["hit_rate"]
+            print(f"{lookups:>8}  {parse_time * 1000:>9.1f}  {cached_time * 1000:>9.1f}  {hit_rate:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Raw byte transfer of remote command output and one-pass text decoding.
+
+Remote files used to travel as base64 text: 33% more bytes on the wire, and a str of the
+encoded output, the decoded bytes and the final text in memory. Reading the raw output of
+a command into a reusable buffer and decoding the text straight from that buffer leaves a
+single copy of the content.
+"""
+import codecs
+import threading
+
+# Checked in order: UTF-32 LE starts with the UTF-16 LE BOM
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+FALLBACK_ENCODING = "cp1252"
+
+
+class TransferBuffer:
+    """Growable receive buffer, reused across reads so each file does not allocate its own.
+
+    read_stream returns a memoryview of the buffer that is only valid until the next read;
+    callers that keep the content have to copy it (bytes(view)) or decode it first. A buffer
+    that grew past max_kept_size for a large file is dropped after that read, so one large
+    file does not pin its memory in every worker for the rest of the run.
+    """
+
+    def __init__(self, initial_size=256 * 1024, max_kept_size=8 * 1024 * 1024):
+        self.initial_size = initial_size
+        self.max_kept_size = max_kept_size
+        self._buffer = bytearray(initial_size)
+
+    def read_stream(self, stream):
+        """Reads stream to the end and returns a memoryview of the bytes read."""
+        buffer = self._buffer
+        view = memoryview(buffer)
+        readinto = getattr(stream, "readinto", None)
+        filled = 0
+        while True:
+            if filled == len(buffer):
+                # Grow into a new buffer rather than resizing: views from earlier reads may still be alive
+                grown = bytearray(len(buffer) * 2)
+                grown[:filled] = view[:filled]
+                buffer, view = grown, memoryview(grown)
+                self._buffer = buffer
+            if readinto is not None:
+                count = readinto(view[filled:])
+            else:
+                chunk = stream.read(len(buffer) - filled)
+                count = len(chunk)
+                view[filled:filled + count] = chunk
+            if not count:
+                break
+            filled += count
+        if len(buffer) > self.max_kept_size:
+            # The returned view keeps the large buffer alive for as long as the caller needs it
+            self._buffer = bytearray(self.initial_size)
+        return view[:filled]
+
+
+_local = threading.local()
+
+
+def read_stream(stream):
+    """Reads stream into the calling thread's TransferBuffer; see TransferBuffer.read_stream."""
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        buffer = _local.buffer = TransferBuffer()
+    return buffer.read_stream(stream)
+
+
+def detect_encoding(data):
+    """Returns the encoding of data: from its byte order mark, else utf-8 if it decodes, else cp1252."""
+    encoding = _bom_encoding(data)
+    if encoding:
+        return encoding
+    try:
+        str(data, "utf-8")
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+    return "utf-8"
+
+
+def decode_text(data):
+    """Decodes bytes or a memoryview to text in one pass and returns (text, encoding).
+
+    The encoding is detected as in detect_encoding, but the successful utf-8 attempt is the
+    decode, so the content is not scanned twice. Bytes cp1252 leaves undefined are replaced.
+    """
+    encoding = _bom_encoding(data)
+    if encoding:
+        return str(data, encoding, "replace"), encoding
+    try:
+        return str(data, "utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        return str(data, FALLBACK_ENCODING, "replace"), FALLBACK_ENCODING
+
+
+def _bom_encoding(data):
+    head = bytes(data[:4])
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    return None
@@ -0,0 +1,152 @@
+"""The JSON configuration of the msgflow rewrite, loaded once per process.
+
+replacement_mapping.json, property_names.json and input_node_config.json used to be
+opened and parsed by every function that needed them, some of them once per subflow node.
+The registry loads each file on first use, checks its structure, precompiles what the
+rewrite looks up (a combined pattern of the namespaces to replace, a frozenset of the
+property names) and keeps the result until the file's modification time changes.
+"""
+import json
+import os
+import re
+import threading
+from collections import namedtuple
+
+
+class ConfigError(ValueError):
+    """A configuration file does not have the expected structure."""
+
+
+ReplacementEntry = namedtuple("ReplacementEntry", ["key", "name", "namespaces"])
+
+
+class ReplacementMapping:
+    """replacement_mapping.json: per subflow key, a "Name" and (original, replacement) namespace pairs."""
+
+    def __init__(self, entries):
+        self.entries = tuple(entries)
+        # All (original, replacement) pairs in file order, as the replacements are applied
+        self.namespaces = tuple(pair for entry in self.entries for pair in entry.namespaces)
+        self._key_pattern = _union_pattern(entry.key for entry in self.entries)
+        # Pairs that replace a namespace by itself change nothing and need not be found
+        self._namespace_pattern = _union_pattern(
+            original for original, replacement in self.namespaces if original != replacement
+        )
+
+    def entries_in(self, text):
+        """Returns the entries whose key occurs in text, in file order."""
+        if self._key_pattern is None or not self._key_pattern.search(text):
+            return ()
+        return [entry for entry in self.entries if entry.key in text]
+
+    def replace(self, text):
+        """Replaces every original namespace in text, one pair after the other in file order.
+
+        One scan with the combined pattern decides whether anything is to be replaced; text
+        without any of the namespaces, by far the most common case, is returned as is.
+        """
+        if self._namespace_pattern is None or not self._namespace_pattern.search(text):
+            return text
+        for original, replacement in self.namespaces:
+            text = text.replace(original, replacement)
+        return text
+
+
+def _union_pattern(strings):
+    # Longest first, so that no alternative hides a longer one starting at the same place
+    strings = sorted(set(strings), key=len, reverse=True)
+    if not strings:
+        return None
+    return re.compile("|".join(map(re.escape, strings)))
+
+
+def _load_replacement_mapping(path, data):
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path}: expected an object of subflow keys")
+    entries = []
+    for key, replacement_info in data.items():
+        if not isinstance(replacement_info, dict):
+            raise ConfigError(f"{path}: {key!r} must map namespaces to their replacements")
+        for original, replacement in replacement_info.items():
+            if not isinstance(replacement, str):
+                raise ConfigError(f"{path}: the replacement of {original!r} in {key!r} must be a string")
+        namespaces = [(original, replacement) for original, replacement in replacement_info.items() if original != "Name"]
+        entries.append(ReplacementEntry(key, replacement_info.get("Name", ""), tuple(namespaces)))
+    return ReplacementMapping(entries)
+
+
+def _load_property_names(path, data):
+    names = data.get("property_names", []) if isinstance(data, dict) else None
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        raise ConfigError(f"{path}: expected {{\"property_names\": [names]}}")
+    return frozenset(names)
+
+
+def _load_input_node_config(path, data):
+    input_node = data.get("input_node", {}) if isinstance(data, dict) else None
+    if not isinstance(input_node, dict):
+        raise ConfigError(f"{path}: expected an \"input_node\" object")
+    if not isinstance(input_node.get("node", {}), dict):
+        raise ConfigError(f"{path}: \"node\" must be an object")
+    connections = input_node.get("connections", [])
+    if not isinstance(connections, list) or not all(isinstance(connection, dict) for connection in connections):
+        raise ConfigError(f"{path}: \"connections\" must be a list of objects")
+    return data
+
+
+class ConfigRegistry:
+    """Loaded configuration files by absolute path, reloaded when their modification time changes.
+
+    The returned objects are shared by all callers and must not be modified.
+    """
+
+    def __init__(self):
+        self._entries = {}  # (path, loader) -> (mtime, loaded value)
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def replacement_mapping(self, path='replacement_mapping.json'):
+        return self._get(path, _load_replacement_mapping)
+
+    def property_names(self, path='property_names.json'):
+        return self._get(path, _load_property_names)
+
+    def input_node_config(self, path='input_node_config.json'):
+        return self._get(path, _load_input_node_config)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, path, load):
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            entry = self._entries.get((path, load))
+            if entry is not None and entry[0] == mtime:
+                return entry[1]
+        with open(path, 'r') as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ConfigError(f"{path}: {e}") from e
+        value = load(path, data)
+        with self._lock:
+            self._entries[(path, load)] = (mtime, value)
+            self.loads += 1
+        return value
+
+
+registry = ConfigRegistry()  # The configuration of this process
+
+
+def replacement_mapping(path='replacement_mapping.json'):
+    return registry.replacement_mapping(path)
+
+
+def property_names(path='property_names.json'):
+    return registry.property_names(path)
+
+
+def input_node_config(path='input_node_config.json'):
+    return registry.input_node_config(path)
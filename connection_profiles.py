@@ -0,0 +1,72 @@
+import logging
+
+# Named SQLite pragma sets applied to every connection the managers and writer threads open.
+#   safe                 durable writes, the default
+#   bulk-load            fast initial/full loads; a crash mid-run may lose the run but not corrupt the file.
+#                        Foreign keys are checked once at the end of the run and the non-unique
+#                        indexes are rebuilt then (see DatabaseManager.begin_run/end_run)
+#   read-only-analytics  large caches and mmap for reporting queries, writes refused
+CONNECTION_PROFILES = {
+    "safe": {
+        "page_size": 4096,
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "temp_store": "DEFAULT",
+        "mmap_size": 0,
+        "cache_size": -2000,  # negative: KiB, i.e. 2 MB
+        "foreign_keys": 1,
+    },
+    "bulk-load": {
+        "page_size": 8192,
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "temp_store": "MEMORY",
+        "mmap_size": 268435456,
+        "cache_size": -262144,
+        "foreign_keys": 0,
+        "defer_checks": True,
+    },
+    "read-only-analytics": {
+        "page_size": 4096,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+        "mmap_size": 1073741824,
+        "cache_size": -131072,
+        "foreign_keys": 1,
+        "query_only": 1,
+    },
+}
+
+DEFAULT_PROFILE = "safe"
+
+# Applied in this order: page_size only takes effect before the first table is created and
+# while the database is not yet in WAL mode, so it has to come before journal_mode
+_PRAGMA_ORDER = ("page_size", "journal_mode", "synchronous", "temp_store", "mmap_size", "cache_size", "foreign_keys", "query_only")
+
+
+def get_connection_profile(profile):
+    """Returns the pragma settings of a named profile, raising ValueError for unknown names."""
+    try:
+        return CONNECTION_PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown connection profile {profile!r}, expected one of {', '.join(CONNECTION_PROFILES)}") from None
+
+
+def apply_connection_profile(conn, profile=DEFAULT_PROFILE):
+    """Applies the pragmas of a named profile to an open connection and returns the connection."""
+    settings = get_connection_profile(profile)
+    for pragma in _PRAGMA_ORDER:
+        if pragma not in settings:
+            continue
+        value = settings[pragma]
+        row = conn.execute(f"PRAGMA {pragma} = {value}").fetchone()
+        # journal_mode reports the mode actually in effect, e.g. "memory" for :memory: databases
+        if pragma == "journal_mode" and row is not None and str(row[0]).upper() != str(value).upper():
+            logging.debug(f"journal_mode {value} not available, connection uses {row[0]}")
+    return conn
+
+
+def defers_checks(profile):
+    """True when the profile postpones foreign key checks and index builds to the end of a run."""
+    return get_connection_profile(profile).get("defer_checks", False)
@@ -0,0 +1,222 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+
+
+class ContentCache:
+    """Local, content-addressed cache of file contents fetched from CVS, keyed by (cvsroot, path, revision).
+
+    Contents are stored once per SHA-256 under cache_dir/objects, zlib compressed; a SQLite
+    index in cache_dir/index.sqlite maps (cvsroot, path, revision) to a content hash. A given
+    revision of a file never changes, so a hit needs no remote call beyond the revision probe.
+    When the compressed objects grow past max_bytes, the least recently used ones are evicted.
+
+    With offline=True nothing is downloaded: fetch serves the latest cached revision of a file
+    and returns None for files that were never cached.
+
+        cache = ContentCache("~/.cache/esql-analysis", max_bytes=2 * 1024 ** 3)
+        content = cache.fetch(cvsroot, path, download=lambda: ..., probe=lambda: ...)
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3, offline=False, compression_level=6):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.compression_level = compression_level
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.RLock()
+        os.makedirs(os.path.join(self.cache_dir, "objects"), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS Entries (
+                cvsroot TEXT NOT NULL,
+                path TEXT NOT NULL,
+                revision TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (cvsroot, path, revision)
+            );
+            CREATE INDEX IF NOT EXISTS ix_entries_hash ON Entries(content_hash);
+            CREATE TABLE IF NOT EXISTS Objects (
+                content_hash TEXT PRIMARY KEY,
+                stored_size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_objects_last_used ON Objects(last_used);
+        """)
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def fetch(self, cvsroot, path, download, probe=None, revision=None):
+        """Returns the content bytes of path, downloading them only if the revision is not cached.
+
+        revision defaults to probe(), a cheap remote call returning the file's head revision;
+        download() returns the content bytes (or None on failure) and is only called on a miss.
+        Without a revision the content is downloaded and not cached. Offline, the latest cached
+        revision is served and neither callable is used.
+        """
+        if self.offline:
+            content = self.get(cvsroot, path, revision) if revision is not None else self.latest(cvsroot, path)[1]
+            self._count("hits" if content is not None else "misses")
+            return content
+
+        if revision is None and probe is not None:
+            try:
+                revision = probe()
+            except Exception as e:
+                logging.warning(f"Revision probe for {path} failed, bypassing the content cache: {e}")
+        if revision is not None:
+            content = self.get(cvsroot, path, revision)
+            if content is not None:
+                self._count("hits")
+                return content
+        self._count("misses")
+        content = download()
+        if content is not None and revision is not None:
+            self.put(cvsroot, path, revision, content)
+        return content
+
+    def get(self, cvsroot, path, revision):
+        """Returns the cached content of path at revision, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM Entries WHERE cvsroot = ? AND path = ? AND revision = ?",
+                (cvsroot, path, revision)
+            ).fetchone()
+        return self._read_object(row[0]) if row else None
+
+    def latest(self, cvsroot, path):
+        """Returns (revision, content) of the most recently cached revision of path, or (None, None)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT revision, content_hash FROM Entries WHERE cvsroot = ? AND path = ? ORDER BY stored_at DESC LIMIT 1",
+                (cvsroot, path)
+            ).fetchone()
+        if not row:
+            return None, None
+        content = self._read_object(row[1])
+        return (row[0], content) if content is not None else (None, None)
+
+    def revisions(self, folder, cvsroot=None):
+        """Returns {path: latest cached revision} for the cached files below folder."""
+        prefix = folder.rstrip("/") + "/"
+        query = "SELECT path, revision FROM Entries WHERE substr(path, 1, ?) = ?"
+        params = [len(prefix), prefix]
+        if cvsroot is not None:
+            query += " AND cvsroot = ?"
+            params.append(cvsroot)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY stored_at", params).fetchall()
+        return dict(rows)  # Later rows win: the latest revision of each path
+
+    def put(self, cvsroot, path, revision, content):
+        """Stores content as path at revision and returns its content hash.
+
+        Content that is larger than max_bytes even compressed is not stored; None is returned.
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        object_path = self._object_path(content_hash)
+        now = time.time()
+        with self._lock:
+            known = self._conn.execute("SELECT 1 FROM Objects WHERE content_hash = ?", (content_hash,)).fetchone()
+            if not known or not os.path.exists(object_path):
+                data = zlib.compress(content, self.compression_level)
+                if len(data) > self.max_bytes:
+                    logging.info(f"Not caching {path} {revision}: {len(data)} bytes compressed exceed the cache size")
+                    return None
+                stored_size = self._write_object(object_path, data)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO Objects (content_hash, stored_size, last_used) VALUES (?, ?, ?)",
+                    (content_hash, stored_size, now)
+                )
+            else:
+                self._conn.execute("UPDATE Objects SET last_used = ? WHERE content_hash = ?", (now, content_hash))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO Entries (cvsroot, path, revision, content_hash, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (cvsroot, path, revision, content_hash, now)
+            )
+            self._evict(keep=content_hash)
+            self._conn.commit()
+        return content_hash
+
+    def size(self):
+        """Total size of the compressed objects in bytes."""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(stored_size), 0) FROM Objects").fetchone()[0]
+
+    def _read_object(self, content_hash):
+        try:
+            with open(self._object_path(content_hash), "rb") as f:
+                content = zlib.decompress(f.read())
+        except (OSError, zlib.error) as e:
+            logging.warning(f"Dropping unreadable cache object {content_hash}: {e}")
+            self._drop_objects([content_hash])
+            return None
+        with self._lock:
+            self._conn.execute("UPDATE Objects SET last_used = ? WHERE content_hash = ?", (time.time(), content_hash))
+            self._conn.commit()
+        return content
+
+    def _write_object(self, object_path, data):
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        # Write to a temporary file first so a crash never leaves a truncated object behind
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(object_path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, object_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return len(data)
+
+    def _evict(self, keep):
+        """Drops the least recently used objects until the cache fits max_bytes; keep is the object just stored."""
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for content_hash, stored_size in self._conn.execute(
+            "SELECT content_hash, stored_size FROM Objects WHERE content_hash != ? ORDER BY last_used", (keep,)
+        ):
+            evicted.append(content_hash)
+            excess -= stored_size
+            if excess <= 0:
+                break
+        self._drop_objects(evicted)
+        self.stats["evictions"] += len(evicted)
+        logging.info(f"Evicted {len(evicted)} objects from the content cache")
+
+    def _drop_objects(self, content_hashes):
+        with self._lock:
+            for content_hash in content_hashes:
+                self._conn.execute("DELETE FROM Entries WHERE content_hash = ?", (content_hash,))
+                self._conn.execute("DELETE FROM Objects WHERE content_hash = ?", (content_hash,))
+                try:
+                    os.remove(self._object_path(content_hash))
+                except FileNotFoundError:
+                    pass
+            self._conn.commit()
+
+    def _object_path(self, content_hash):
+        return os.path.join(self.cache_dir, "objects", content_hash[:2], content_hash[2:])
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
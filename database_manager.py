@@ -1,9 +1,263 @@
+import logging
 import sqlite3
+import threading
+from collections import OrderedDict
+
+from connection_profiles import DEFAULT_PROFILE, apply_connection_profile, defers_checks
+
+# Prepared statements sqlite3 keeps per connection, keyed by SQL text (its default is 128). The
+# insert methods use constant SQL strings; the headroom is for the per-table and per-chunk-size
+# statements built by insert_rows_bulk and get_or_insert_many.
+STATEMENT_CACHE_SIZE = 256
+
+# Tables whose get-or-create lookups are cached: table -> (id column, natural key columns)
+ID_CACHE_TABLES = {
+    "Projects": ("project_id", ("project_name",)),
+    "PFNumbers": ("pf_id", ("pf_number", "project_id")),
+    "Mandants": ("mandant_id", ("mandant_name", "pf_id", "project_id")),
+    "Environments": ("environment_id", ("environment_name",)),
+    "MsgFlows": ("msgflow_id", ("msgflow_name", "project_id")),
+    "Nodes": ("node_id", ("node_name", "msgflow_id")),
+    "Subflows": ("subflow_id", ("subflow_name",)),
+    "Expressions": ("expression_id", ("node_id", "module_id", "function_id", "code_type", "datasource")),
+    "PAP": ("pap_id", ("pap_name",)),
+    "PropertyFiles": ("file_id", ("pap_id", "pf_id", "file_name")),
+    "Queues": ("queue_id", ("queue_name", "queue_type")),
+    "IntegrationServers": ("server_id", ("server_name",)),
+    "Definitions": ("definition_id", ("type", "name")),
+    "EsqlFiles": ("esql_file_id", ("esql_file_name", "project_id")),
+    "Modules": ("module_id", ("module_name", "esql_file_id")),
+    "Functions": ("function_id", ("function_name", "esql_file_id", "module_id")),
+}
+
+# Bumped whenever migrate_schema learns a new step; stored in PRAGMA user_version
+SCHEMA_VERSION = 4
+
+# Composite UNIQUE indexes on the natural keys the get-or-create methods look up.
+# Single-column keys (Projects, Subflows, PAP, ...) are already declared UNIQUE.
+# SQLite treats NULLs as distinct in a UNIQUE index, so nullable key columns are indexed
+# through IFNULL with a value they never hold; their lookups compare with IS.
+NATURAL_KEY_INDEXES = [
+    ("ux_pfnumbers_key", "PFNumbers", ("pf_number", "project_id")),
+    ("ux_mandants_key", "Mandants", ("mandant_name", "pf_id", "project_id")),
+    ("ux_environment_properties_key", "EnvironmentProperties",
+     ("property_file_id", "environment_id", "IFNULL(data_source_name, '')", "IFNULL(web_service_url, '')")),
+    ("ux_msgflows_key", "MsgFlows", ("msgflow_name", "project_id")),
+    ("ux_nodes_key", "Nodes", ("node_name", "msgflow_id")),
+    ("ux_expressions_key", "Expressions",
+     ("node_id", "module_id", "function_id", "IFNULL(code_type, '')", "IFNULL(datasource, '')")),
+    ("ux_esqlfiles_key", "EsqlFiles", ("esql_file_name", "project_id")),
+    ("ux_modules_key", "Modules", ("module_name", "esql_file_id")),
+    ("ux_functions_key", "Functions", ("function_name", "esql_file_id", "IFNULL(module_id, 0)")),
+    ("ux_queues_key", "Queues", ("queue_name", "queue_type")),
+    ("ux_definitions_key", "Definitions", ("type", "name")),
+    # Leaf tables: the ON CONFLICT clauses of insert_rows_bulk skip rows that match these (version 4)
+    ("ux_calls_key", "Calls", ("function_id", "call_name")),
+    ("ux_sql_operations_key", "SQL_Operations", ("function_id", "operation_type", "table_name")),
+    ("ux_user_defined_properties_key", "UserDefinedProperties", ("msgflow_id", "property_name", "IFNULL(property_value, '')")),
+    ("ux_database_properties_key", "DatabaseProperties", ("file_id", "db_name", "environment")),
+    ("ux_web_services_key", "WebServices", ("file_id", "ws_name", "environment")),
+]
+
+# Indexes whose columns changed in version 4, rebuilt in databases created before
+REBUILT_KEY_INDEXES = ("ux_environment_properties_key", "ux_expressions_key", "ux_functions_key")
+
+# Covering indexes for the joins in summary_view that no natural key index leads with
+JOIN_INDEXES = [
+    ("ix_msgflows_project", "MsgFlows", ("project_id", "msgflow_id", "msgflow_name")),
+    ("ix_nodes_msgflow", "Nodes", ("msgflow_id", "node_id")),
+]
+
+# Indexes on the foreign keys followed when the rows derived from a changed file are replaced (version 2)
+FOREIGN_KEY_INDEXES = [
+    ("ix_functions_file", "Functions", ("esql_file_id",)),
+    ("ix_functions_module", "Functions", ("module_id",)),
+    ("ix_modules_file", "Modules", ("esql_file_id",)),
+    ("ix_expressions_function", "Expressions", ("function_id",)),
+    ("ix_expressions_module", "Expressions", ("module_id",)),
+]
+
+# Tables whose definition changed after databases were created with an earlier one; migrate_schema
+# rebuilds them from these (see _rebuild_table). {table} is the name the table is created under.
+TABLE_DEFINITIONS = {
+    "PropertyFiles": """
+        CREATE TABLE IF NOT EXISTS {table} (
+            file_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pap_id INTEGER NOT NULL,
+            pf_id INTEGER NOT NULL,
+            file_name TEXT NOT NULL,
+            FOREIGN KEY (pap_id) REFERENCES PAP(pap_id)
+        )
+    """,
+    "EnvironmentProperties": """
+        CREATE TABLE IF NOT EXISTS {table} (
+            env_property_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            property_file_id INTEGER NOT NULL,
+            environment_id INTEGER NOT NULL,
+            data_source_name TEXT,
+            web_service_url TEXT,
+            FOREIGN KEY (property_file_id) REFERENCES PropertyFiles(file_id),
+            FOREIGN KEY (environment_id) REFERENCES Environments(environment_id)
+        )
+    """,
+    "PAP_Queues": """
+        CREATE TABLE IF NOT EXISTS {table} (
+            pap_queue_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pap_id INTEGER NOT NULL,
+            pf_id INTEGER NOT NULL,
+            queue_id INTEGER NOT NULL,
+            FOREIGN KEY (pap_id) REFERENCES PAP(pap_id),
+            FOREIGN KEY (pf_id) REFERENCES PFNumbers(pf_id),
+            FOREIGN KEY (queue_id) REFERENCES Queues(queue_id),
+            UNIQUE (pap_id, pf_id, queue_id)  -- Ensures no duplicate entries for the same PAP-PF-Queue combination
+        )
+    """,
+    "OtherProperties": """
+        CREATE TABLE IF NOT EXISTS {table} (
+            other_property_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            property_file_id INTEGER NOT NULL,
+            property_name TEXT NOT NULL,
+            environment TEXT,
+            value TEXT,
+            FOREIGN KEY (property_file_id) REFERENCES PropertyFiles(file_id),
+            UNIQUE (property_file_id, property_name, environment)
+        )
+    """,
+}
+
+# Leaf tables written with insert_rows_bulk: table -> (columns, ON CONFLICT action against the table's UNIQUE constraint)
+BULK_INSERT_TABLES = {
+    "Calls": (("function_id", "call_name"), "DO NOTHING"),
+    "SQL_Operations": (("function_id", "operation_type", "table_name"), "DO NOTHING"),
+    "UserDefinedProperties": (("msgflow_id", "property_name", "property_value"), "DO NOTHING"),
+    "Attributes": (
+        ("definition_id", "attribute_key", "attribute_value"),
+        "(definition_id, attribute_key) DO UPDATE SET attribute_value = excluded.attribute_value",
+    ),
+    "DatabaseProperties": (("file_id", "db_name", "environment", "value"), "DO NOTHING"),
+    "WebServices": (("file_id", "ws_name", "environment", "url"), "DO NOTHING"),
+    "OtherProperties": (("property_file_id", "property_name", "environment", "value"), "DO NOTHING"),
+    "PAP_Queues": (("pap_id", "pf_id", "queue_id"), "DO NOTHING"),
+    "PAP_IntegrationServers": (("pap_id", "server_id"), "DO NOTHING"),
+}
+
+# EsqlFiles entry of each project that holds the modules and functions message flows refer to
+# before the ESQL file declaring them has been parsed (see DatabaseManager.insert_module_reference)
+UNRESOLVED_ESQL_FILE = "<unresolved>"
+
+# Bound parameters per statement in get_or_insert_many; SQLite before 3.32 allows 999
+MAX_SQL_VARIABLES = 999
+
+
+class IdCache:
+    """Bounded LRU map of natural key -> ID for one table, with hit/miss counters."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Stores the ID and returns it, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
 
 class DatabaseManager:
-    def __init__(self, db_path):
-        self.conn = sqlite3.connect(db_path)
-        self.conn.execute("PRAGMA foreign_keys = 1")  # Enable foreign keys
+    def __init__(self, db_path, id_cache_size=100000, profile=DEFAULT_PROFILE):
+        self.db_path = db_path
+        self.profile = profile
+        self.conn = apply_connection_profile(sqlite3.connect(db_path), profile)
+        self.id_caches = {table: IdCache(id_cache_size) for table in ID_CACHE_TABLES}
+        self.warm_id_cache()
+        self._writer_conn = None
+        self._writer_conn_lock = threading.Lock()
+
+    def connect(self):
+        """Returns the persistent write connection owned by this manager, opening it on first use.
+
+        The connection is handed to the insert methods by the writer thread, so every row
+        reuses the same open file and parsed schema instead of paying for a fresh
+        sqlite3.connect() per call. Besides that, the only change is cached_statements: the
+        insert SQL is not rewritten or batched here, its statements are simply found in the
+        connection's cache (see benchmarks/bench_db_connections.py).
+        """
+        with self._writer_conn_lock:
+            if self._writer_conn is None:
+                self._writer_conn = apply_connection_profile(
+                    sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE),
+                    self.profile,
+                )
+            return self._writer_conn
+
+    def close(self):
+        """Closes the write connection and the setup connection."""
+        with self._writer_conn_lock:
+            if self._writer_conn is not None:
+                self._writer_conn.close()
+                self._writer_conn = None
+        self.conn.close()
+
+    def warm_id_cache(self):
+        """Preloads the most recent IDs of every cached table so that repeated runs start with a warm cache."""
+        cursor = self.conn.cursor()
+        for table, (id_column, key_columns) in ID_CACHE_TABLES.items():
+            cache = self.id_caches[table]
+            try:
+                cursor.execute(
+                    f"SELECT {', '.join(key_columns)}, {id_column} FROM {table} ORDER BY {id_column} DESC LIMIT ?",
+                    (cache.maxsize,)
+                )
+            except sqlite3.OperationalError:
+                continue  # Table not created yet
+            for row in reversed(cursor.fetchall()):
+                cache.put(tuple(row[:-1]), row[-1])
+            logging.info(f"Warmed ID cache for {table} with {len(cache)} entries")
+
+    def clear_id_cache(self):
+        """Drops all cached IDs, e.g. after a rollback discarded rows that were already cached."""
+        for cache in self.id_caches.values():
+            cache.clear()
+
+    def id_cache_stats(self):
+        """Returns {table: {"hits", "misses", "size", "hit_rate"}} for every cached table."""
+        stats = {}
+        for table, cache in self.id_caches.items():
+            lookups = cache.hits + cache.misses
+            stats[table] = {
+                "hits": cache.hits,
+                "misses": cache.misses,
+                "size": len(cache),
+                "hit_rate": cache.hits / lookups if lookups else 0.0,
+            }
+        return stats
 
     def create_database(self):
         """Creates all tables and views in the database."""
@@ -39,21 +293,6 @@ class DatabaseManager:
             )
         """)
 
-        # PropertyFiles Table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS PropertyFiles (
-                property_file_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                pf_id INTEGER NOT NULL,
-                mandant_id INTEGER NOT NULL,
-                execution_group TEXT,
-                event_queue TEXT,
-                output_queue TEXT,
-                copy_queue TEXT,
-                FOREIGN KEY (pf_id) REFERENCES PFNumbers(pf_id),
-                FOREIGN KEY (mandant_id) REFERENCES Mandants(mandant_id)
-            )
-        """)
-
         # Environments Table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS Environments (
@@ -63,17 +302,7 @@ class DatabaseManager:
         """)
 
         # EnvironmentProperties Table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS EnvironmentProperties (
-                env_property_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                property_file_id INTEGER NOT NULL,
-                environment_id INTEGER NOT NULL,
-                data_source_name TEXT,
-                web_service_url TEXT,
-                FOREIGN KEY (property_file_id) REFERENCES PropertyFiles(property_file_id),
-                FOREIGN KEY (environment_id) REFERENCES Environments(environment_id)
-            )
-        """)
+        cursor.execute(TABLE_DEFINITIONS["EnvironmentProperties"].format(table="EnvironmentProperties"))
 
         # MsgFlows Table
         cursor.execute("""
@@ -147,7 +376,9 @@ class DatabaseManager:
                 function_id INTEGER PRIMARY KEY AUTOINCREMENT,
                 function_name TEXT NOT NULL,
                 esql_file_id INTEGER NOT NULL,
-                FOREIGN KEY (esql_file_id) REFERENCES EsqlFiles(esql_file_id)
+                module_id INTEGER,
+                FOREIGN KEY (esql_file_id) REFERENCES EsqlFiles(esql_file_id),
+                FOREIGN KEY (module_id) REFERENCES Modules(module_id)
             )
         """)
 
@@ -182,6 +413,19 @@ class DatabaseManager:
             )
         """)
 
+        # FileManifest Table: what was analysed from each file, for incremental runs
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS FileManifest (
+                file_path TEXT PRIMARY KEY,
+                project_id INTEGER NOT NULL,
+                file_type TEXT NOT NULL,
+                revision TEXT,
+                content_hash TEXT NOT NULL,
+                analysed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (project_id) REFERENCES Projects(project_id)
+            )
+        """)
+
         # Create View
         cursor.execute("""
             CREATE VIEW IF NOT EXISTS summary_view AS
@@ -205,17 +449,18 @@ class DatabaseManager:
                 p.project_name, mf.msgflow_name, f.function_name, m.module_name
         """)
 
-        # Create PropertyFiles Table
+        # Create PAP Table
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS PropertyFiles (
-                file_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                pap_id INTEGER NOT NULL,
-                pf_id INTEGER NOT NULL,
-                file_name TEXT NOT NULL,
-                FOREIGN KEY (pap_id) REFERENCES PAP(pap_id)
+            CREATE TABLE IF NOT EXISTS PAP (
+                pap_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                pap_name TEXT UNIQUE NOT NULL,
+                description TEXT
             )
         """)
 
+        # Create PropertyFiles Table
+        cursor.execute(TABLE_DEFINITIONS["PropertyFiles"].format(table="PropertyFiles"))
+
         # Create Queues Table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS Queues (
@@ -226,18 +471,7 @@ class DatabaseManager:
         """)
 
         # Create PAP_Queues Table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS PAP_Queues (
-    pap_queue_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    pap_id INTEGER NOT NULL,
-    pf_id INTEGER NOT NULL,
-    queue_id INTEGER NOT NULL,
-    FOREIGN KEY (pap_id) REFERENCES PAP(pap_id),
-    FOREIGN KEY (pf_id) REFERENCES PropertyFiles(pf_id),
-    FOREIGN KEY (queue_id) REFERENCES Queues(queue_id),
-    UNIQUE (pap_id, pf_id, queue_id)  -- Ensures no duplicate entries for the same PAP-PF-Queue combination
-)
-        """)
+        cursor.execute(TABLE_DEFINITIONS["PAP_Queues"].format(table="PAP_Queues"))
 
         # Create DatabaseProperties Table
         cursor.execute("""
@@ -263,13 +497,13 @@ class DatabaseManager:
             )
         """)
         cursor.execute("""
-            CREATE TABLE IntegrationServers (
+            CREATE TABLE IF NOT EXISTS IntegrationServers (
     server_id INTEGER PRIMARY KEY AUTOINCREMENT,
     server_name TEXT NOT NULL UNIQUE
 )
         """)
         cursor.execute("""
-            CREATE TABLE PAP_IntegrationServers (
+            CREATE TABLE IF NOT EXISTS PAP_IntegrationServers (
     pap_server_id INTEGER PRIMARY KEY AUTOINCREMENT,
     pap_id INTEGER NOT NULL,
     server_id INTEGER NOT NULL,
@@ -278,17 +512,7 @@ class DatabaseManager:
     UNIQUE (pap_id, server_id)  -- Ensures no duplicate entries for the same PAP-Server pair
 )
         """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS OtherProperties (
-    other_property_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    property_file_id INTEGER NOT NULL,
-    property_name TEXT NOT NULL,
-    environment TEXT,
-    value TEXT,
-    FOREIGN KEY (property_file_id) REFERENCES PropertyFiles(pf_id),
-    UNIQUE (property_file_id, property_name, environment)
-)
-        """)
+        cursor.execute(TABLE_DEFINITIONS["OtherProperties"].format(table="OtherProperties"))
         # Definitions Table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS Definitions (
@@ -322,82 +546,238 @@ class DatabaseManager:
                 FOREIGN KEY (related_definition_id) REFERENCES Definitions(definition_id)
             );
         """)
-        
-        conn.commit()
-        conn.close()
-        
+
+        self.conn.commit()
+        self.migrate_schema()
+
+    def migrate_schema(self):
+        """Brings an existing database up to SCHEMA_VERSION; safe to call on every start."""
+        cursor = self.conn.cursor()
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version < 4:
+            # Columns added to existing tables; the indexes of the earlier versions already use them
+            self._add_missing_columns(cursor)
+        if version < 1:
+            self._create_lookup_indexes(cursor)
+        if version < 2:
+            for index_name, table, columns in FOREIGN_KEY_INDEXES:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({', '.join(columns)})")
+        if version < 3:
+            self._migrate_property_files(cursor)
+        if version < 4:
+            if version >= 1:
+                for index_name in REBUILT_KEY_INDEXES:
+                    cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+                    cursor.execute(f"DROP INDEX IF EXISTS {index_name.replace('ux_', 'ix_', 1)}")
+            # Creates the rebuilt indexes and the leaf table keys; the others exist already
+            self._create_lookup_indexes(cursor)
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.commit()
+
+    def _add_missing_columns(self, cursor):
+        """Version 4: Functions.module_id was added to the table definition without a migration."""
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(Functions)")]
+        if columns and "module_id" not in columns:
+            cursor.execute("ALTER TABLE Functions ADD COLUMN module_id INTEGER REFERENCES Modules(module_id)")
+
+    def _migrate_property_files(self, cursor):
+        """Version 3: PropertyFiles was declared twice and databases got the first, unused declaration.
+
+        Its rows have no PAP or file name to carry over, so they are kept in PropertyFiles_legacy.
+        The tables whose foreign keys pointed at columns PropertyFiles does not have are rebuilt.
+        """
+        rebuilt = False
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(PropertyFiles)")]
+        if "file_id" not in columns:
+            self._rebuild_table(cursor, "PropertyFiles", keep_rows=False)
+            rebuilt = True
+        for table in ("EnvironmentProperties", "PAP_Queues", "OtherProperties"):
+            references = {(row[2], row[4]) for row in cursor.execute(f"PRAGMA foreign_key_list({table})")}
+            if ("PropertyFiles", "property_file_id") in references or ("PropertyFiles", "pf_id") in references:
+                self._rebuild_table(cursor, table)
+                rebuilt = True
+        if rebuilt:
+            # The indexes of the rebuilt tables were dropped with them
+            self._create_lookup_indexes(cursor)
+
+    def _rebuild_table(self, cursor, table, keep_rows=True):
+        """Replaces a table by its definition in TABLE_DEFINITIONS, following SQLite's procedure for
+        schema changes ALTER TABLE cannot make. The rows are copied in the columns both versions have;
+        with keep_rows=False they are moved to {table}_legacy instead, or to {table}_legacy_2 and so
+        on if an earlier migration left one behind. The rebuild is one transaction, so a failure
+        leaves the table as it was. Indexes on the table are dropped with it and have to be created
+        again by the caller.
+        """
+        self.conn.commit()
+        foreign_keys = cursor.execute("PRAGMA foreign_keys").fetchone()[0]
+        cursor.execute("PRAGMA foreign_keys = OFF")  # Has no effect inside a transaction
+        try:
+            cursor.execute("BEGIN")
+            try:
+                old_columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+                if not keep_rows and cursor.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                    legacy_table = self._free_table_name(cursor, f"{table}_legacy")
+                    cursor.execute(f"CREATE TABLE {legacy_table} AS SELECT * FROM {table}")
+                    logging.warning(f"Kept the rows of the old {table} table in {legacy_table}")
+                cursor.execute(f"DROP TABLE IF EXISTS {table}_new")
+                cursor.execute(TABLE_DEFINITIONS[table].format(table=f"{table}_new"))
+                if keep_rows:
+                    new_columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table}_new)")]
+                    shared = ", ".join(column for column in new_columns if column in old_columns)
+                    cursor.execute(f"INSERT INTO {table}_new ({shared}) SELECT {shared} FROM {table}")
+                cursor.execute(f"DROP TABLE {table}")
+                cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+        finally:
+            cursor.execute(f"PRAGMA foreign_keys = {foreign_keys}")
+        logging.info(f"Rebuilt table {table} with its current definition")
+
+    @staticmethod
+    def _free_table_name(cursor, name):
+        """Returns name, or name_2, name_3, ... whichever is not taken yet."""
+        candidate, number = name, 1
+        while cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (candidate,)).fetchone():
+            number += 1
+            candidate = f"{name}_{number}"
+        return candidate
+
+    def _create_lookup_indexes(self, cursor):
+        for index_name, table, columns in NATURAL_KEY_INDEXES:
+            try:
+                cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table} ({', '.join(columns)})")
+            except sqlite3.IntegrityError:
+                # Existing duplicates: keep the lookup fast and leave the clean-up to the operator
+                logging.warning(f"Duplicate natural keys in {table}, creating a non-unique index instead")
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name.replace('ux_', 'ix_', 1)} ON {table} ({', '.join(columns)})")
+            except sqlite3.OperationalError as e:
+                logging.warning(f"Skipping index {index_name}: {e}")
+
+        self._create_join_indexes(cursor)
+
+    def _create_join_indexes(self, cursor):
+        for index_name, table, columns in JOIN_INDEXES:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({', '.join(columns)})")
+
+    def begin_run(self, drop_indexes=True):
+        """Prepares the database for a load run under the connection profile.
+
+        Profiles that defer checks (bulk-load) drop the non-unique join indexes of an empty
+        database here so rows are not indexed one at a time; they are rebuilt in one pass by
+        end_run. Once the tables hold rows the indexes stay: a run over an existing database
+        replaces the rows of every file it analyses, and those deletes look rows up by message
+        flow. The UNIQUE natural-key indexes always stay, the get-or-create lookups and
+        ON CONFLICT clauses depend on them. Incremental runs pass drop_indexes=False.
+        """
+        if not defers_checks(self.profile) or not drop_indexes:
+            return
+        cursor = self.conn.cursor()
+        if any(cursor.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() for _, table, _ in JOIN_INDEXES):
+            return
+        for index_name, _, _ in JOIN_INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
         self.conn.commit()
-    def insert_project(self, project_name):
+
+    def end_run(self):
+        """Finishes a load run: rebuilds deferred indexes and runs the deferred foreign key check.
+
+        Returns the foreign key violations as (table, rowid, parent table, fk index) rows; they are
+        logged but not raised, the loaded data is kept for inspection. Call after the writer has stopped.
+        """
+        if not defers_checks(self.profile):
+            return []
         cursor = self.conn.cursor()
+        self._create_join_indexes(cursor)
+        self.conn.commit()
+        violations = []
+        tables = [row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        for table in tables:
+            try:
+                violations.extend(cursor.execute(f"PRAGMA foreign_key_check({table})").fetchall())
+            except sqlite3.OperationalError as e:
+                # The foreign key itself is unusable (e.g. points at a column that is not a key)
+                logging.warning(f"Cannot check foreign keys of {table}: {e}")
+        for table, rowid, parent, _ in violations[:20]:
+            logging.warning(f"Foreign key violation: {table} row {rowid} references a missing {parent} row")
+        if violations:
+            logging.warning(f"{len(violations)} foreign key violations found after the bulk load")
+        return violations
+
+    def insert_project(self, conn, project_name):
+        key = (project_name,)
+        cached_id = self.id_caches["Projects"].get(key)
+        if cached_id is not None:
+            return cached_id
+
+        cursor = conn.cursor()
         cursor.execute("SELECT project_id FROM Projects WHERE project_name = ?", (project_name,))
         result = cursor.fetchone()
         
         if result:
-            return result[0]  # Return existing ID
+            return self.id_caches["Projects"].put(key, result[0])  # Return existing ID
         else:
             cursor.execute("INSERT INTO Projects (project_name) VALUES (?)", (project_name,))
-            self.conn.commit()
-            return cursor.lastrowid
+            conn.commit()
+            return self.id_caches["Projects"].put(key, cursor.lastrowid)
 
-    def insert_pf_number(self, pf_number, project_id):
-        cursor = self.conn.cursor()
+    def insert_pf_number(self, conn, pf_number, project_id):
+        key = (pf_number, project_id)
+        cached_id = self.id_caches["PFNumbers"].get(key)
+        if cached_id is not None:
+            return cached_id
+
+        cursor = conn.cursor()
         cursor.execute("SELECT pf_id FROM PFNumbers WHERE pf_number = ? AND project_id = ?", (pf_number, project_id))
         result = cursor.fetchone()
         
         if result:
-            return result[0]
+            return self.id_caches["PFNumbers"].put(key, result[0])
         else:
             cursor.execute("INSERT INTO PFNumbers (pf_number, project_id) VALUES (?, ?)", (pf_number, project_id))
-            self.conn.commit()
-            return cursor.lastrowid
+            conn.commit()
+            return self.id_caches["PFNumbers"].put(key, cursor.lastrowid)
 
-    def insert_mandant(self, mandant_name, pf_id, project_id):
-        cursor = self.conn.cursor()
+    def insert_mandant(self, conn, mandant_name, pf_id, project_id):
+        key = (mandant_name, pf_id, project_id)
+        cached_id = self.id_caches["Mandants"].get(key)
+        if cached_id is not None:
+            return cached_id
+
+        cursor = conn.cursor()
         cursor.execute("SELECT mandant_id FROM Mandants WHERE mandant_name = ? AND pf_id = ? AND project_id = ?", (mandant_name, pf_id, project_id))
         result = cursor.fetchone()
         
         if result:
-            return result[0]
+            return self.id_caches["Mandants"].put(key, result[0])
         else:
             cursor.execute("INSERT INTO Mandants (mandant_name, pf_id, project_id) VALUES (?, ?, ?)", (mandant_name, pf_id, project_id))
-            self.conn.commit()
-            return cursor.lastrowid
+            conn.commit()
+            return self.id_caches["Mandants"].put(key, cursor.lastrowid)
 
-    def insert_property_file(self, pf_id, mandant_id, execution_group, event_queue, output_queue, copy_queue):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT property_file_id FROM PropertyFiles 
-            WHERE pf_id = ? AND mandant_id = ? AND execution_group = ? AND event_queue = ? AND output_queue = ? AND copy_queue = ?
-        """, (pf_id, mandant_id, execution_group, event_queue, output_queue, copy_queue))
-        result = cursor.fetchone()
-        
-        if result:
-            return result[0]
-        else:
-            cursor.execute("""
-                INSERT INTO PropertyFiles (pf_id, mandant_id, execution_group, event_queue, output_queue, copy_queue)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (pf_id, mandant_id, execution_group, event_queue, output_queue, copy_queue))
-            self.conn.commit()
-            return cursor.lastrowid
+    def insert_environment(self, conn, environment_name):
+        key = (environment_name,)
+        cached_id = self.id_caches["Environments"].get(key)
+        if cached_id is not None:
+            return cached_id
 
-    def insert_environment(self, environment_name):
-        cursor = self.conn.cursor()
+        cursor = conn.cursor()
         cursor.execute("SELECT environment_id FROM Environments WHERE environment_name = ?", (environment_name,))
         result = cursor.fetchone()
         
         if result:
-            return result[0]
+            return self.id_caches["Environments"].put(key, result[0])
         else:
             cursor.execute("INSERT INTO Environments (environment_name) VALUES (?)", (environment_name,))
-            self.conn.commit()
-            return cursor.lastrowid
+            conn.commit()
+            return self.id_caches["Environments"].put(key, cursor.lastrowid)
 
-    def insert_environment_property(self, property_file_id, environment_id, data_source_name, web_service_url):
-        cursor = self.conn.cursor()
+    def insert_environment_property(self, conn, property_file_id, environment_id, data_source_name, web_service_url):
+        cursor = conn.cursor()
         cursor.execute("""
             SELECT env_property_id FROM EnvironmentProperties 
-            WHERE property_file_id = ? AND environment_id = ? AND data_source_name = ? AND web_service_url = ?
+            WHERE property_file_id = ? AND environment_id = ? AND data_source_name IS ? AND web_service_url IS ?
         """, (property_file_id, environment_id, data_source_name, web_service_url))
         result = cursor.fetchone()
         
@@ -408,67 +788,87 @@ class DatabaseManager:
                 INSERT INTO EnvironmentProperties (property_file_id, environment_id, data_source_name, web_service_url)
                 VALUES (?, ?, ?, ?)
             """, (property_file_id, environment_id, data_source_name, web_service_url))
-            self.conn.commit()
+            conn.commit()
             return cursor.lastrowid
 
-    def insert_msgflow(self, msgflow_name, project_id):
-        cursor = self.conn.cursor()
+    def insert_msgflow(self, conn, msgflow_name, project_id):
+        key = (msgflow_name, project_id)
+        cached_id = self.id_caches["MsgFlows"].get(key)
+        if cached_id is not None:
+            return cached_id
+
+        cursor = conn.cursor()
         cursor.execute("SELECT msgflow_id FROM MsgFlows WHERE msgflow_name = ? AND project_id = ?", (msgflow_name, project_id))
         result = cursor.fetchone()
         
         if result:
-            return result[0]
+            return self.id_caches["MsgFlows"].put(key, result[0])
         else:
             cursor.execute("INSERT INTO MsgFlows (msgflow_name, project_id) VALUES (?, ?)", (msgflow_name, project_id))
-            self.conn.commit()
-            return cursor.lastrowid
+            conn.commit()
+            return self.id_caches["MsgFlows"].put(key, cursor.lastrowid)
 
-    def insert_node(self, node_name, msgflow_id, subflow_id=None):
-        cursor = self.conn.cursor()
+    def insert_node(self, conn, node_name, msgflow_id, subflow_id=None):
+        key = (node_name, msgflow_id)
+        cached_id = self.id_caches["Nodes"].get(key)
+        if cached_id is not None:
+            return cached_id
+
+        cursor = conn.cursor()
         cursor.execute("SELECT node_id FROM Nodes WHERE node_name = ? AND msgflow_id = ?", (node_name, msgflow_id))
         result = cursor.fetchone()
         
         if result:
-            return result[0]
+            return self.id_caches["Nodes"].put(key, result[0])
         else:
             cursor.execute("INSERT INTO Nodes (node_name, msgflow_id, subflow_id) VALUES (?, ?, ?)", (node_name, msgflow_id, subflow_id))
-            self.conn.commit()
-            return cursor.lastrowid
+            conn.commit()
+            return self.id_caches["Nodes"].put(key, cursor.lastrowid)
 
-    def insert_subflow(self, subflow_name):
-        cursor = self.conn.cursor()
+    def insert_subflow(self, conn, subflow_name):
+        key = (subflow_name,)
+        cached_id = self.id_caches["Subflows"].get(key)
+        if cached_id is not None:
+            return cached_id
+
+        cursor = conn.cursor()
         cursor.execute("SELECT subflow_id FROM Subflows WHERE subflow_name = ?", (subflow_name,))
         result = cursor.fetchone()
         
         if result:
-            return result[0]
+            return self.id_caches["Subflows"].put(key, result[0])
         else:
             cursor.execute("INSERT INTO Subflows (subflow_name) VALUES (?)", (subflow_name,))
-            self.conn.commit()
-            return cursor.lastrowid
+            conn.commit()
+            return self.id_caches["Subflows"].put(key, cursor.lastrowid)
 
-    def insert_expression(self, node_id, module_id, function_id, code_type, datasource):
-        cursor = self.conn.cursor()
+    def insert_expression(self, conn, node_id, module_id, function_id, code_type, datasource):
+        key = (node_id, module_id, function_id, code_type, datasource)
+        cached_id = self.id_caches["Expressions"].get(key)
+        if cached_id is not None:
+            return cached_id
+
+        cursor = conn.cursor()
         cursor.execute("""
             SELECT expression_id FROM Expressions 
-            WHERE node_id = ? AND module_id = ? AND function_id = ? AND code_type = ? AND datasource IS ?
+            WHERE node_id = ? AND module_id = ? AND function_id = ? AND code_type IS ? AND datasource IS ?
         """, (node_id, module_id, function_id, code_type, datasource))
         result = cursor.fetchone()
         
         if result:
-            return result[0]
+            return self.id_caches["Expressions"].put(key, result[0])
         else:
             cursor.execute("""
                 INSERT INTO Expressions (node_id, module_id, function_id, code_type, datasource)
                 VALUES (?, ?, ?, ?, ?)
             """, (node_id, module_id, function_id, code_type, datasource))
-            self.conn.commit()
-            return cursor.lastrowid
+            conn.commit()
+            return self.id_caches["Expressions"].put(key, cursor.lastrowid)
 
-    def insert_user_defined_property(self, msgflow_id, property_name, property_value):
-        cursor = self.conn.cursor()
+    def insert_user_defined_property(self, conn, msgflow_id, property_name, property_value):
+        cursor = conn.cursor()
         cursor.execute("""
-            SELECT property_id FROM UserDefinedProperties WHERE msgflow_id = ? AND property_name = ? AND property_value = ?
+            SELECT property_id FROM UserDefinedProperties WHERE msgflow_id = ? AND property_name = ? AND property_value IS ?
         """, (msgflow_id, property_name, property_value))
         result = cursor.fetchone()
         
@@ -479,86 +879,380 @@ class DatabaseManager:
                 INSERT INTO UserDefinedProperties (msgflow_id, property_name, property_value)
                 VALUES (?, ?, ?)
             """, (msgflow_id, property_name, property_value))
-            self.conn.commit()
+            conn.commit()
             return cursor.lastrowid
     
+    def insert_esql_file(self, conn, esql_file_name, project_id):
+        key = (esql_file_name, project_id)
+        cached_id = self.id_caches["EsqlFiles"].get(key)
+        if cached_id is not None:
+            return cached_id
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT esql_file_id FROM EsqlFiles WHERE esql_file_name = ? AND project_id = ?", (esql_file_name, project_id))
+        result = cursor.fetchone()
+        
+        if result:
+            return self.id_caches["EsqlFiles"].put(key, result[0])
+        else:
+            cursor.execute("INSERT INTO EsqlFiles (esql_file_name, project_id) VALUES (?, ?)", (esql_file_name, project_id))
+            conn.commit()
+            return self.id_caches["EsqlFiles"].put(key, cursor.lastrowid)
+
+    def insert_module(self, conn, file_name, module_name, project_id):
+        esql_file_id = self.insert_esql_file(conn, file_name, project_id)
+        key = (module_name, esql_file_id)
+        cached_id = self.id_caches["Modules"].get(key)
+        if cached_id is not None:
+            return cached_id
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT module_id FROM Modules WHERE module_name = ? AND esql_file_id = ?", (module_name, esql_file_id))
+        result = cursor.fetchone()
+        
+        if result:
+            return self.id_caches["Modules"].put(key, result[0])
+        if file_name != UNRESOLVED_ESQL_FILE:
+            # A message flow may have referred to the module before its file was parsed
+            module_id = self._adopt_module_reference(conn, module_name, esql_file_id, project_id)
+            if module_id is not None:
+                conn.commit()
+                return self.id_caches["Modules"].put(key, module_id)
+        cursor.execute("INSERT INTO Modules (module_name, esql_file_id) VALUES (?, ?)", (module_name, esql_file_id))
+        conn.commit()
+        return self.id_caches["Modules"].put(key, cursor.lastrowid)
+
+    def insert_function(self, conn, file_name, function_name, project_id, module_id=None):
+        esql_file_id = self.insert_esql_file(conn, file_name, project_id)
+        return self._insert_function(conn, function_name, esql_file_id, module_id)
+
+    def _insert_function(self, conn, function_name, esql_file_id, module_id):
+        key = (function_name, esql_file_id, module_id)
+        cached_id = self.id_caches["Functions"].get(key)
+        if cached_id is not None:
+            return cached_id
+
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT function_id FROM Functions WHERE function_name = ? AND esql_file_id = ? AND module_id IS ?",
+            (function_name, esql_file_id, module_id)
+        )
+        result = cursor.fetchone()
+        
+        if result:
+            return self.id_caches["Functions"].put(key, result[0])
+        else:
+            cursor.execute(
+                "INSERT INTO Functions (function_name, esql_file_id, module_id) VALUES (?, ?, ?)",
+                (function_name, esql_file_id, module_id)
+            )
+            conn.commit()
+            return self.id_caches["Functions"].put(key, cursor.lastrowid)
+
+    def insert_module_reference(self, conn, module_name, project_id):
+        """Returns the ID of the module a compute node of a message flow refers to by name.
+
+        A compute expression names its module but not the ESQL file that declares it, so the
+        module is looked up among the modules of the project's ESQL files. A module no parsed
+        file declares (yet) is created under the project's UNRESOLVED_ESQL_FILE; insert_module
+        moves it to its file once that file is parsed.
+        """
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT m.module_id FROM Modules m JOIN EsqlFiles ef ON m.esql_file_id = ef.esql_file_id
+            WHERE m.module_name = ? AND ef.project_id = ?
+            ORDER BY ef.esql_file_name = ?, m.module_id LIMIT 1
+        """, (module_name, project_id, UNRESOLVED_ESQL_FILE))
+        result = cursor.fetchone()
+        if result:
+            return result[0]
+        return self.insert_module(conn, UNRESOLVED_ESQL_FILE, module_name, project_id)
+
+    def insert_function_reference(self, conn, function_name, module_id):
+        """Returns the ID of the function of a module a compute node refers to (see insert_module_reference)."""
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT function_id FROM Functions WHERE function_name = ? AND module_id = ? ORDER BY function_id LIMIT 1",
+            (function_name, module_id)
+        )
+        result = cursor.fetchone()
+        if result:
+            return result[0]
+        # Not declared (yet): the function goes into the file of its module
+        cursor.execute("SELECT esql_file_id FROM Modules WHERE module_id = ?", (module_id,))
+        return self._insert_function(conn, function_name, cursor.fetchone()[0], module_id)
+
+    def _adopt_module_reference(self, conn, module_name, esql_file_id, project_id):
+        """Moves a module created for a message flow reference, with its functions, to the ESQL file
+        that declares it. Returns the module's ID, or None if no message flow referred to it."""
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT m.module_id, m.esql_file_id FROM Modules m JOIN EsqlFiles ef ON m.esql_file_id = ef.esql_file_id
+            WHERE m.module_name = ? AND ef.esql_file_name = ? AND ef.project_id = ?
+        """, (module_name, UNRESOLVED_ESQL_FILE, project_id))
+        result = cursor.fetchone()
+        if not result:
+            return None
+        module_id, unresolved_file_id = result
+
+        cursor.execute("SELECT function_name, esql_file_id, module_id FROM Functions WHERE module_id = ?", (module_id,))
+        for key in cursor.fetchall():
+            self.id_caches["Functions"].discard(tuple(key))
+        cursor.execute("UPDATE Functions SET esql_file_id = ? WHERE module_id = ?", (esql_file_id, module_id))
+        cursor.execute("UPDATE Modules SET esql_file_id = ? WHERE module_id = ?", (esql_file_id, module_id))
+        self.id_caches["Modules"].discard((module_name, unresolved_file_id))
+        return module_id
+
+    def insert_rows_bulk(self, conn, table, rows):
+        """Writes leaf rows whose IDs are never needed with a single executemany.
+
+        Rows that already exist are skipped by the table's UNIQUE constraint (Attributes
+        update their value instead), so no per-row existence SELECT is needed.
+        """
+        columns, on_conflict = BULK_INSERT_TABLES[table]
+        placeholders = ", ".join("?" * len(columns))
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) ON CONFLICT {on_conflict}",
+            rows
+        )
+        conn.commit()
+        return len(rows)
+
+    def get_or_insert_many(self, conn, table, keys):
+        """Bulk get-or-create for a table of ID_CACHE_TABLES: returns {natural key: ID} for keys.
+
+        Keys are tuples of the table's natural key columns. IDs come from the ID cache where
+        possible; the remaining keys are looked up with a few multi-row SELECTs and the missing
+        ones inserted with one executemany, all in a single write.
+        """
+        id_column, key_columns = ID_CACHE_TABLES[table]
+        cache = self.id_caches[table]
+        ids = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            cached_id = cache.get(key)
+            if cached_id is None:
+                missing.append(key)
+            else:
+                ids[key] = cached_id
+        if not missing:
+            return ids
+
+        found = self._select_ids(conn, table, id_column, key_columns, missing)
+        new_keys = [key for key in missing if key not in found]
+        if new_keys:
+            placeholders = ", ".join("?" * len(key_columns))
+            conn.executemany(f"INSERT INTO {table} ({', '.join(key_columns)}) VALUES ({placeholders})", new_keys)
+            found.update(self._select_ids(conn, table, id_column, key_columns, new_keys))
+        conn.commit()
+        for key, row_id in found.items():
+            ids[key] = cache.put(key, row_id)
+        return ids
+
+    @staticmethod
+    def _select_ids(conn, table, id_column, key_columns, keys):
+        found = {}
+        # IN never matches NULL: keys with a NULL in them are looked up one by one with IS
+        nullable = [key for key in keys if None in key]
+        if nullable:
+            keys = [key for key in keys if None not in key]
+            condition = " AND ".join(f"{column} IS ?" for column in key_columns)
+            for key in nullable:
+                row = conn.execute(f"SELECT {id_column} FROM {table} WHERE {condition} ORDER BY {id_column} LIMIT 1", key).fetchone()
+                if row:
+                    found[key] = row[0]
+        chunk_size = MAX_SQL_VARIABLES // len(key_columns)
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            if len(key_columns) == 1:
+                condition = f"{key_columns[0]} IN ({', '.join('?' * len(chunk))})"
+            else:
+                row = f"({', '.join('?' * len(key_columns))})"
+                condition = f"({', '.join(key_columns)}) IN (VALUES {', '.join([row] * len(chunk))})"
+            params = [value for key in chunk for value in key]
+            for row_id, *key in conn.execute(f"SELECT {id_column}, {', '.join(key_columns)} FROM {table} WHERE {condition}", params):
+                found.setdefault(tuple(key), row_id)
+        return found
+
+    def get_file_manifest(self):
+        """Returns {file_path: (revision, content_hash, project_id, file_type)} for every analysed file."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT file_path, revision, content_hash, project_id, file_type FROM FileManifest")
+        return {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+
+    def record_file(self, conn, file_path, project_id, file_type, revision, content_hash):
+        """Stores the revision and content hash a file was analysed at."""
+        conn.execute("""
+            INSERT INTO FileManifest (file_path, project_id, file_type, revision, content_hash)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (file_path) DO UPDATE SET
+                project_id = excluded.project_id, file_type = excluded.file_type, revision = excluded.revision,
+                content_hash = excluded.content_hash, analysed_at = CURRENT_TIMESTAMP
+        """, (file_path, project_id, file_type, revision, content_hash))
+        conn.commit()
+
+    def forget_file(self, conn, file_path, project_id, file_type):
+        """Removes a file that no longer exists: its derived rows and its manifest entry."""
+        if file_type == "esql":
+            self.delete_esql_file_rows(conn, file_path, project_id)
+        elif file_type == "msgflow":
+            self.delete_msgflow_rows(conn, file_path, project_id)
+        conn.execute("DELETE FROM FileManifest WHERE file_path = ?", (file_path,))
+        conn.commit()
+
+    def delete_esql_file_rows(self, conn, esql_file_name, project_id):
+        """Deletes what was derived from an ESQL file so that it can be parsed again.
+
+        SQL operations and calls of its functions are always removed. Functions and modules are
+        removed unless an expression of a message flow still refers to them; those rows are kept
+        and picked up again by the get-or-create inserts when the file is re-parsed.
+        """
+        cursor = conn.cursor()
+        cursor.execute("SELECT esql_file_id FROM EsqlFiles WHERE esql_file_name = ? AND project_id = ?", (esql_file_name, project_id))
+        result = cursor.fetchone()
+        if not result:
+            return
+        esql_file_id = result[0]
+
+        cursor.execute("""
+            DELETE FROM SQL_Operations WHERE function_id IN (SELECT function_id FROM Functions WHERE esql_file_id = ?)
+        """, (esql_file_id,))
+        cursor.execute("DELETE FROM Calls WHERE function_id IN (SELECT function_id FROM Functions WHERE esql_file_id = ?)", (esql_file_id,))
+
+        cursor.execute("""
+            SELECT function_name, esql_file_id, module_id FROM Functions f
+            WHERE esql_file_id = ? AND NOT EXISTS (SELECT 1 FROM Expressions e WHERE e.function_id = f.function_id)
+        """, (esql_file_id,))
+        for key in cursor.fetchall():
+            self.id_caches["Functions"].discard(tuple(key))
+        cursor.execute("""
+            DELETE FROM Functions
+            WHERE esql_file_id = ? AND NOT EXISTS (SELECT 1 FROM Expressions e WHERE e.function_id = Functions.function_id)
+        """, (esql_file_id,))
+
+        cursor.execute("""
+            SELECT module_name, esql_file_id FROM Modules m
+            WHERE esql_file_id = ?
+              AND NOT EXISTS (SELECT 1 FROM Expressions e WHERE e.module_id = m.module_id)
+              AND NOT EXISTS (SELECT 1 FROM Functions f WHERE f.module_id = m.module_id)
+        """, (esql_file_id,))
+        for key in cursor.fetchall():
+            self.id_caches["Modules"].discard(tuple(key))
+        cursor.execute("""
+            DELETE FROM Modules
+            WHERE esql_file_id = ?
+              AND NOT EXISTS (SELECT 1 FROM Expressions e WHERE e.module_id = Modules.module_id)
+              AND NOT EXISTS (SELECT 1 FROM Functions f WHERE f.module_id = Modules.module_id)
+        """, (esql_file_id,))
+        conn.commit()
+
+    def delete_msgflow_rows(self, conn, msgflow_name, project_id):
+        """Deletes the nodes, expressions and user-defined properties of a message flow so that it can be parsed again."""
+        cursor = conn.cursor()
+        cursor.execute("SELECT msgflow_id FROM MsgFlows WHERE msgflow_name = ? AND project_id = ?", (msgflow_name, project_id))
+        result = cursor.fetchone()
+        if not result:
+            return
+        msgflow_id = result[0]
+
+        cursor.execute("""
+            SELECT e.node_id, e.module_id, e.function_id, e.code_type, e.datasource
+            FROM Expressions e JOIN Nodes n ON e.node_id = n.node_id WHERE n.msgflow_id = ?
+        """, (msgflow_id,))
+        for key in cursor.fetchall():
+            self.id_caches["Expressions"].discard(tuple(key))
+        cursor.execute("DELETE FROM Expressions WHERE node_id IN (SELECT node_id FROM Nodes WHERE msgflow_id = ?)", (msgflow_id,))
+
+        cursor.execute("SELECT node_name, msgflow_id FROM Nodes WHERE msgflow_id = ?", (msgflow_id,))
+        for key in cursor.fetchall():
+            self.id_caches["Nodes"].discard(tuple(key))
+        cursor.execute("DELETE FROM Nodes WHERE msgflow_id = ?", (msgflow_id,))
+        cursor.execute("DELETE FROM UserDefinedProperties WHERE msgflow_id = ?", (msgflow_id,))
+        conn.commit()
+
     def get_primary_key_columns(self, conn, table_name):
-    cursor = conn.cursor()
-    cursor.execute(f"PRAGMA table_info({table_name})")
-    table_info = cursor.fetchall()
-    return [info[1] for info in table_info if info[5] > 0]
+        cursor = conn.cursor()
+        cursor.execute(f"PRAGMA table_info({table_name})")
+        table_info = cursor.fetchall()
+        return [info[1] for info in table_info if info[5] > 0]
+
     def upsert_data(self, conn, base_insert_query, query_values):
-    cursor = conn.cursor()
-    cursor.execute(base_insert_query, query_values)
-    conn.commit()
+        cursor = conn.cursor()
+        cursor.execute(base_insert_query, query_values)
+        conn.commit()
+
     # Insert methods with existing record checks
 
-    def insert_pap(self, pap_name, description=None):
-        conn = sqlite3.connect(self.db_path)
+    def insert_pap(self, conn, pap_name, description=None):
+        key = (pap_name,)
+        cached_id = self.id_caches["PAP"].get(key)
+        if cached_id is not None:
+            return cached_id
+
         cursor = conn.cursor()
         
         cursor.execute("SELECT pap_id FROM PAP WHERE pap_name = ?", (pap_name,))
         result = cursor.fetchone()
         
         if result:
-            conn.close()
-            return result[0]
+            return self.id_caches["PAP"].put(key, result[0])
 
         cursor.execute("""
             INSERT INTO PAP (pap_name, description) VALUES (?, ?)
         """, (pap_name, description))
         conn.commit()
         pap_id = cursor.lastrowid
-        conn.close()
-        return pap_id
+        return self.id_caches["PAP"].put(key, pap_id)
+
+    def insert_property_file(self, conn, pap_id, pf_id, file_name):
+        key = (pap_id, pf_id, file_name)
+        cached_id = self.id_caches["PropertyFiles"].get(key)
+        if cached_id is not None:
+            return cached_id
 
-    def insert_property_file(self, pap_id, pf_id, file_name):
-        conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("SELECT file_id FROM PropertyFiles WHERE pap_id = ? AND pf_id = ? AND file_name = ?", (pap_id, pf_id, file_name))
         result = cursor.fetchone()
         
         if result:
-            conn.close()
-            return result[0]
+            return self.id_caches["PropertyFiles"].put(key, result[0])
 
         cursor.execute("""
             INSERT INTO PropertyFiles (pap_id, pf_id, file_name) VALUES (?, ?, ?)
         """, (pap_id, pf_id, file_name))
         conn.commit()
         file_id = cursor.lastrowid
-        conn.close()
-        return file_id
+        return self.id_caches["PropertyFiles"].put(key, file_id)
+
+    def insert_queue(self, conn, queue_name, queue_type):
+        key = (queue_name, queue_type)
+        cached_id = self.id_caches["Queues"].get(key)
+        if cached_id is not None:
+            return cached_id
 
-    def insert_queue(self, queue_name, queue_type):
-        conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("SELECT queue_id FROM Queues WHERE queue_name = ? AND queue_type = ?", (queue_name, queue_type))
         result = cursor.fetchone()
         
         if result:
-            conn.close()
-            return result[0]
+            return self.id_caches["Queues"].put(key, result[0])
 
         cursor.execute("""
             INSERT INTO Queues (queue_name, queue_type) VALUES (?, ?)
         """, (queue_name, queue_type))
         conn.commit()
         queue_id = cursor.lastrowid
-        conn.close()
-        return queue_id
+        return self.id_caches["Queues"].put(key, queue_id)
 
-    def insert_pap_queue(self, pap_id, queue_id):
-        conn = sqlite3.connect(self.db_path)
+    def insert_pap_queue(self, conn, pap_id, pf_id, queue_id):
         cursor = conn.cursor()
         
         cursor.execute("SELECT pap_queue_id FROM PAP_Queues WHERE pap_id = ? AND pf_id = ? AND queue_id = ?", (pap_id, pf_id, queue_id))
         result = cursor.fetchone()
         
         if result:
-            conn.close()
             return result[0]
 
         cursor.execute("""
@@ -566,18 +1260,15 @@ class DatabaseManager:
         """, (pap_id, pf_id, queue_id))
         conn.commit()
         pap_queue_id = cursor.lastrowid
-        conn.close()
         return pap_queue_id
 
-    def insert_database_property(self, file_id, db_name, environment, value):
-        conn = sqlite3.connect(self.db_path)
+    def insert_database_property(self, conn, file_id, db_name, environment, value):
         cursor = conn.cursor()
         
         cursor.execute("SELECT db_property_id FROM DatabaseProperties WHERE file_id = ? AND db_name = ? AND environment = ?", (file_id, db_name, environment))
         result = cursor.fetchone()
         
         if result:
-            conn.close()
             return result[0]
 
         cursor.execute("""
@@ -585,18 +1276,15 @@ class DatabaseManager:
         """, (file_id, db_name, environment, value))
         conn.commit()
         db_property_id = cursor.lastrowid
-        conn.close()
         return db_property_id
 
-    def insert_web_service(self, file_id, ws_name, environment, url):
-        conn = sqlite3.connect(self.db_path)
+    def insert_web_service(self, conn, file_id, ws_name, environment, url):
         cursor = conn.cursor()
         
         cursor.execute("SELECT ws_property_id FROM WebServices WHERE file_id = ? AND ws_name = ? AND environment = ?", (file_id, ws_name, environment))
         result = cursor.fetchone()
         
         if result:
-            conn.close()
             return result[0]
 
         cursor.execute("""
@@ -604,38 +1292,37 @@ class DatabaseManager:
         """, (file_id, ws_name, environment, url))
         conn.commit()
         ws_property_id = cursor.lastrowid
-        conn.close()
         return ws_property_id
-    def insert_integration_server(self, server_name):
+    def insert_integration_server(self, conn, server_name):
         """Inserts or retrieves an integration server entry."""
-        conn = sqlite3.connect(self.db_path)
+        key = (server_name,)
+        cached_id = self.id_caches["IntegrationServers"].get(key)
+        if cached_id is not None:
+            return cached_id
+
         cursor = conn.cursor()
         
         cursor.execute("SELECT server_id FROM IntegrationServers WHERE server_name = ?", (server_name,))
         result = cursor.fetchone()
         
         if result:
-            conn.close()
-            return result[0]
+            return self.id_caches["IntegrationServers"].put(key, result[0])
 
         cursor.execute("""
             INSERT INTO IntegrationServers (server_name) VALUES (?)
         """, (server_name,))
         conn.commit()
         server_id = cursor.lastrowid
-        conn.close()
-        return server_id
+        return self.id_caches["IntegrationServers"].put(key, server_id)
 
-    def insert_pap_integration_server(self, pap_id, server_id):
+    def insert_pap_integration_server(self, conn, pap_id, server_id):
         """Links a PAP with an integration server, if not already linked."""
-        conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("SELECT pap_server_id FROM PAP_IntegrationServers WHERE pap_id = ? AND server_id = ?", (pap_id, server_id))
         result = cursor.fetchone()
         
         if result:
-            conn.close()
             return result[0]
 
         cursor.execute("""
@@ -643,11 +1330,9 @@ class DatabaseManager:
         """, (pap_id, server_id))
         conn.commit()
         pap_server_id = cursor.lastrowid
-        conn.close()
         return pap_server_id
-    def insert_other_property(self, property_file_id, property_name, environment, value):
+    def insert_other_property(self, conn, property_file_id, property_name, environment, value):
         """Inserts or retrieves an 'other' property entry."""
-        conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         # Check if the property already exists
@@ -659,7 +1344,6 @@ class DatabaseManager:
         result = cursor.fetchone()
         
         if result:
-            conn.close()
             return result[0]
 
         # Insert the property if it doesn't already exist
@@ -669,14 +1353,17 @@ class DatabaseManager:
         """, (property_file_id, property_name, environment, value))
         conn.commit()
         other_property_id = cursor.lastrowid
-        conn.close()
         return other_property_id
         
     
 
-    def insert_definition(self, type, name):
+    def insert_definition(self, conn, type, name):
         """Inserts a new definition entry or retrieves the existing definition_id."""
-        conn = sqlite3.connect(self.db_path)
+        key = (type, name)
+        cached_id = self.id_caches["Definitions"].get(key)
+        if cached_id is not None:
+            return cached_id
+
         cursor = conn.cursor()
         
         # Check if the definition already exists
@@ -684,19 +1371,16 @@ class DatabaseManager:
         result = cursor.fetchone()
         
         if result:
-            conn.close()
-            return result[0]  # Return existing definition_id
+            return self.id_caches["Definitions"].put(key, result[0])  # Return existing definition_id
 
         # Insert new definition
         cursor.execute("INSERT INTO Definitions (type, name) VALUES (?, ?)", (type, name))
         conn.commit()
         definition_id = cursor.lastrowid
-        conn.close()
-        return definition_id
+        return self.id_caches["Definitions"].put(key, definition_id)
 
-    def insert_attribute(self, definition_id, attribute_key, attribute_value):
+    def insert_attribute(self, conn, definition_id, attribute_key, attribute_value):
         """Inserts a new attribute for a definition or updates it if it exists."""
-        conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         # Check if the attribute already exists for this definition
@@ -720,11 +1404,9 @@ class DatabaseManager:
             """, (definition_id, attribute_key, attribute_value))
         
         conn.commit()
-        conn.close()
 
-    def insert_relationship(self, definition_id, related_definition_id, relationship_type):
+    def insert_relationship(self, conn, definition_id, related_definition_id, relationship_type):
         """Inserts a new relationship between definitions."""
-        conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -733,4 +1415,3 @@ class DatabaseManager:
         """, (definition_id, related_definition_id, relationship_type))
         
         conn.commit()
-        conn.close()
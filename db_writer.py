@@ -1,26 +1,230 @@
+import asyncio
+import concurrent.futures
+import logging
+import queue
+import threading
+
+
+def submit_db_operation(db_queue, func, *args):
+    """Queues func(conn, *args) for the writer thread and returns a concurrent.futures.Future for its result.
+
+    The caller only blocks when it calls future.result(), and an exception raised by the
+    writer is re-raised there instead of leaving the caller waiting forever.
+    """
+    future = concurrent.futures.Future()
+    db_queue.put((func, args, future, None))
+    return future
+
+
+def submit_db_operation_async(db_queue, func, *args):
+    """Like submit_db_operation, but returns an asyncio future; must be called from a running event loop."""
+    return asyncio.wrap_future(submit_db_operation(db_queue, func, *args))
+
+
+def wait_for_db_operations(futures):
+    """Waits for all queued operations and re-raises the first failure, if any."""
+    concurrent.futures.wait(futures)
+    for future in futures:
+        future.result()
+
+
+class BulkRowBuffer:
+    """Accumulates leaf rows per table and writes them through DatabaseManager.insert_rows_bulk.
+
+    A table is flushed to the writer queue as one executemany batch once batch_size rows
+    have accumulated. flush() sends whatever is left and waits for every batch, re-raising
+    the first failure; operations queued with add_after run only once all rows have been
+    written. Safe to share between worker threads.
+    """
+
+    def __init__(self, db_queue, db_manager, batch_size=5000):
+        self.db_queue = db_queue
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self._rows = {}
+        self._futures = []
+        self._after = []
+        self._lock = threading.Lock()
+
+    def add(self, table, row):
+        with self._lock:
+            rows = self._rows.setdefault(table, [])
+            rows.append(row)
+            if len(rows) >= self.batch_size:
+                self._submit(table)
+
+    def add_after(self, func, *args):
+        """Queues func(conn, *args) to run at the next flush(), after the rows added so far are written."""
+        with self._lock:
+            self._after.append((func, args))
+
+    def flush(self):
+        with self._lock:
+            for table in list(self._rows):
+                self._submit(table)
+            futures, self._futures = self._futures, []
+            after, self._after = self._after, []
+        wait_for_db_operations(futures)
+        # Not reached if a batch failed, so these never claim rows that were not written
+        wait_for_db_operations([submit_db_operation(self.db_queue, func, *args) for func, args in after])
+
+    def _submit(self, table):
+        rows = self._rows.pop(table)
+        if rows:
+            self._futures.append(submit_db_operation(self.db_queue, self.db_manager.insert_rows_bulk, table, rows))
+
+
+class _DeferredCommitConnection:
+    """Wraps a connection so that commits issued by insert methods are deferred to the writer.
+
+    The writer commits after each item or batch and rolls back one that raised, so a
+    failing operation leaves none of its rows behind.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def commit(self):
+        # The writer commits once for the whole batch
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
 class DBWriterThread(threading.Thread):
-    """Manages a single writer thread that processes database operations from the queue."""
+    """Manages a single writer thread that processes database operations from the queue.
 
-    def __init__(self, db_queue, db_manager):
+    With the default batch_size of 1 every queued callable runs and commits on its own.
+    A larger batch_size switches to batched mode: the queue is drained into batches of at
+    most batch_size items, or whatever was waiting when the queue ran empty, each batch runs
+    in one transaction and is committed once. Results are only handed to waiting callers
+    after the batch has been committed. If a batch fails it is rolled back and its items are
+    retried one at a time, so a single bad row cannot take the rest of the batch with it.
+
+    Queue items are (func, args, callback_event, result_container) tuples. callback_event
+    may also be a concurrent.futures.Future (see submit_db_operation), in which case the
+    result or the exception is set on the future.
+    """
+
+    def __init__(self, db_queue, db_manager, batch_size=1):
         super().__init__()
         self.db_queue = db_queue
         self.db_manager = db_manager
+        self.batch_size = max(1, batch_size)
 
     def run(self):
-        conn = sqlite3.connect(self.db_manager.db_path)
-        conn.execute("PRAGMA foreign_keys = 1")
+        # The connection belongs to the manager and stays open for the whole run
+        conn = self.db_manager.connect()
+        if self.batch_size == 1:
+            self._run_single(conn)
+        else:
+            self._run_batched(conn)
+
+    def _run_single(self, conn):
         while True:
             item = self.db_queue.get()
             if item is None:  # Exit signal
+                self.db_queue.task_done()
                 break
             func, args, callback_event, result_container = item
             try:
-                result = func(conn, *args)
-                if result_container is not None:
-                    result_container["result"] = result
-                if callback_event is not None:
-                    callback_event.set()
+                # Deferred so that a failing item is rolled back as a whole
+                result = func(_DeferredCommitConnection(conn), *args)
+                conn.commit()
+                self._deliver(callback_event, result_container, result)
             except Exception as e:
+                conn.rollback()
+                self._discard_cached_ids()
                 logging.error(f"Error in db_writer: {e}")
+                self._fail(callback_event, result_container, e)
             self.db_queue.task_done()
-        conn.close()
\ No newline at end of file
+
+    def _run_batched(self, conn):
+        running = True
+        while running:
+            batch, running = self._next_batch()
+            if batch:
+                self._execute_batch(conn, batch)
+            for _ in range(len(batch) + (0 if running else 1)):
+                self.db_queue.task_done()
+
+    def _next_batch(self):
+        """Blocks for the first item, then drains the queue until the batch is full or the queue is empty.
+
+        Callers waiting on a result get it as soon as the writer has caught up; under load the
+        queue fills while a batch runs, so the next batch is larger.
+        """
+        item = self.db_queue.get()
+        if item is None:  # Exit signal
+            return [], False
+
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = self.db_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, False
+            batch.append(item)
+        return batch, True
+
+    def _execute_batch(self, conn, batch):
+        """Runs a batch in a single transaction, falling back to one item at a time if it fails."""
+        deferred_conn = _DeferredCommitConnection(conn)
+        results = []
+        try:
+            for func, args, _, _ in batch:
+                results.append(func(deferred_conn, *args))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            self._discard_cached_ids()
+            logging.warning(f"Batch of {len(batch)} operations failed ({e}), retrying items individually")
+            self._run_items_individually(conn, batch)
+            return
+
+        for (_, _, callback_event, result_container), result in zip(batch, results):
+            self._deliver(callback_event, result_container, result)
+
+    def _run_items_individually(self, conn, batch):
+        for func, args, callback_event, result_container in batch:
+            try:
+                result = func(_DeferredCommitConnection(conn), *args)
+                conn.commit()
+                self._deliver(callback_event, result_container, result)
+            except Exception as e:
+                conn.rollback()
+                self._discard_cached_ids()
+                logging.error(f"Error in db_writer: {e}")
+                self._fail(callback_event, result_container, e)
+
+    def _discard_cached_ids(self):
+        # IDs handed out inside a rolled back batch no longer exist
+        clear_id_cache = getattr(self.db_manager, "clear_id_cache", None)
+        if clear_id_cache is not None:
+            clear_id_cache()
+
+    @staticmethod
+    def _deliver(callback_event, result_container, result):
+        if isinstance(callback_event, concurrent.futures.Future):
+            if not callback_event.cancelled():
+                callback_event.set_result(result)
+            return
+        if result_container is not None:
+            result_container["result"] = result
+        if callback_event is not None:
+            callback_event.set()
+
+    @staticmethod
+    def _fail(callback_event, result_container, error):
+        if isinstance(callback_event, concurrent.futures.Future):
+            if not callback_event.cancelled():
+                callback_event.set_exception(error)
+            return
+        # Wake up Event-based callers too; they find "error" instead of "result"
+        if result_container is not None:
+            result_container["error"] = error
+        if callback_event is not None:
+            callback_event.set()
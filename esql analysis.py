@@ -8,6 +8,7 @@ import base64
 import queue
 import threading
 from ssh_executor import SSHExecutor  # Assuming SSHExecutor class is in ssh_executor.py
+from binary_transfer import decode_text, read_stream
 
 # Set up logging
 logging.basicConfig(
@@ -135,6 +136,22 @@ def get_remote_file_base64(ssh_executor, file_path):
     
     return binary_content.decode('utf-8', errors='replace')
 
+def get_remote_file_content(ssh_executor, file_path):
+    """Retrieve file content from the remote server as raw bytes and decode it with the detected encoding.
+
+    Falls back to get_remote_file_base64 when the executor cannot stream command output.
+    """
+    if not hasattr(ssh_executor, "open_command_stream"):
+        return get_remote_file_base64(ssh_executor, file_path)
+    stream = ssh_executor.open_command_stream(f"cat {file_path}")
+    try:
+        # Decoded straight from the reusable transfer buffer, without an intermediate bytes copy
+        file_content, encoding = decode_text(read_stream(stream))
+    finally:
+        stream.close()
+    logging.debug(f"Read {file_path} as {encoding}")
+    return file_content
+
 def get_esql_definitions_and_calls(file_content, db_queue, file_name, folder_name):
     """Process the file content and add database operations to the queue."""
     # Define patterns for modules, functions, SQL operations, and function calls
@@ -225,7 +242,7 @@ def analyze_folder(ssh_executor, folder, db_queue):
 
     for esql_file in esql_files:
         logging.info(f"Processing file: {esql_file}")
-        file_content = get_remote_file_base64(ssh_executor, esql_file)
+        file_content = get_remote_file_content(ssh_executor, esql_file)
         get_esql_definitions_and_calls(file_content, db_queue, esql_file, folder)
 
 def main():
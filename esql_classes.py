@@ -6,7 +6,9 @@ import logging
 import base64
 import queue
 import threading
+from db_writer import DBWriterThread
 from ssh_executor import SSHExecutor  # Assuming SSHExecutor class is in ssh_executor.py
+from connection_profiles import DEFAULT_PROFILE, apply_connection_profile
 
 # Set up logging
 logging.basicConfig(
@@ -21,15 +23,29 @@ logging.basicConfig(
 class DatabaseManager:
     """Manages database setup, table creation, and data insertion."""
     
-    def __init__(self, db_path="esql_analysis.db"):
+    def __init__(self, db_path="esql_analysis.db", profile=DEFAULT_PROFILE):
         self.db_path = db_path
+        self.profile = profile
+        self._writer_conn = None
         self.create_database()
 
+    def connect(self):
+        """Returns the write connection DBWriterThread hands to the insert methods, opening it on first use."""
+        if self._writer_conn is None:
+            self._writer_conn = apply_connection_profile(
+                sqlite3.connect(self.db_path, check_same_thread=False), self.profile
+            )
+        return self._writer_conn
+
+    def close(self):
+        """Closes the write connection once the writer has stopped."""
+        if self._writer_conn is not None:
+            self._writer_conn.close()
+            self._writer_conn = None
+
     def create_database(self):
         """Initialize the SQLite database, tables, and views."""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("PRAGMA foreign_keys = 1")
-        conn.execute("PRAGMA journal_mode=WAL")
+        conn = apply_connection_profile(sqlite3.connect(self.db_path), self.profile)
         cursor = conn.cursor()
         
         # Tables for modules, functions, SQL operations, and calls
@@ -216,12 +232,37 @@ class RemoteFileHandler:
         return result
 
     @staticmethod
-    def read_latest_file_content(ssh_executor, cvsroot, file_path, repo_directory):
-        """Retrieve the latest version of a file in base64, then decode and return as UTF-8 content."""
-        try:
+    def get_head_revision(ssh_executor, cvsroot, file_path):
+        """Cheap revision probe: the head revision of a versioned file from cvs rlog, or None."""
+        file_path = file_path[:-2] if file_path.endswith(',v') else file_path
+        output = ssh_executor.execute_command(f"CVSROOT={cvsroot} cvs -Q rlog -h {file_path}")
+        for line in output.splitlines():
+            if line.startswith("head:"):
+                return line[len("head:"):].strip()
+        return None
+
+    @staticmethod
+    def read_latest_file_content(ssh_executor, cvsroot, file_path, repo_directory, content_cache=None):
+        """Retrieve the latest version of a file in base64, then decode and return as UTF-8 content.
+
+        With a content_cache (see ContentCache) the file is only downloaded when its head
+        revision is not cached yet.
+        """
+        def download():
             base64_content = RemoteFileHandler.get_latest_file_version_base64(ssh_executor, cvsroot, file_path, repo_directory)
+            return base64.b64decode(base64_content)
+
+        try:
+            if content_cache is None:
+                content = download()
+            else:
+                cache_path = file_path[:-2] if file_path.endswith(',v') else file_path
+                probe = lambda: RemoteFileHandler.get_head_revision(ssh_executor, cvsroot, file_path)
+                content = content_cache.fetch(cvsroot, cache_path, download, probe=probe)
+                if content is None:
+                    raise LookupError("not in the offline content cache")
             # Decode base64 to get file content as UTF-8 string
-            decoded_content = base64.b64decode(base64_content).decode('utf-8', errors='ignore')
+            decoded_content = content.decode('utf-8', errors='ignore')
             return decoded_content
         except Exception as e:
             logging.error(f"Error retrieving or decoding latest version of {file_path}: {e}")
@@ -333,33 +374,6 @@ class ESQLProcessor:
     def _queue_insert_call(self, function_id, call_name):
         self.db_queue.put((self.db_manager.insert_call, (function_id, call_name), None, {}))
 
-class DBWriterThread(threading.Thread):
-    """Manages a single writer thread that processes database operations from the queue."""
-
-    def __init__(self, db_queue, db_manager):
-        super().__init__()
-        self.db_queue = db_queue
-        self.db_manager = db_manager
-
-    def run(self):
-        conn = sqlite3.connect(self.db_manager.db_path)
-        conn.execute("PRAGMA foreign_keys = 1")
-        while True:
-            item = self.db_queue.get()
-            if item is None:  # Exit signal
-                break
-            func, args, callback_event, result_container = item
-            try:
-                result = func(conn, *args)
-                if result_container is not None:
-                    result_container["result"] = result
-                if callback_event is not None:
-                    callback_event.set()
-            except Exception as e:
-                logging.error(f"Error in db_writer: {e}")
-            self.db_queue.task_done()
-        conn.close()
-
 
 # Usage example
 def main():
@@ -381,6 +395,7 @@ def main():
 
     db_queue.put(None)  # Signal db_writer to stop
     db_writer.join()
+    db_manager.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
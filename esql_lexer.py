@@ -0,0 +1,203 @@
+"""Single-pass ESQL lexer and block parser.
+
+parse_esql() walks a file once, token by token, and tracks comments, string literals,
+BEGIN/END (and CASE/END) nesting and module boundaries as it goes. Modules, routines, the
+tables they SELECT from or INSERT INTO and the routines they call are collected in the same
+traversal, so the cost is linear in the size of the file.
+"""
+import re
+from collections import namedtuple
+
+# Plain, picklable parse results so that files can be parsed in worker processes.
+# name is None for standalone routines and for module blocks without a readable name.
+EsqlModule = namedtuple("EsqlModule", ["name", "routines"])
+EsqlRoutine = namedtuple("EsqlRoutine", ["name", "sql_operations", "calls"])
+
+# Comments and literals are matched as a whole so nothing inside them is mistaken for code.
+# Keywords preceded by a dot are field names (InputRoot.XMLNSC.Begin) and are not keywords.
+# Other identifiers are matched by the unnamed alternative only to step over them; the
+# leading lookahead lets the regex engine skip whitespace and operators without trying
+# every alternative.
+TOKEN_PATTERN = re.compile(
+    r"""
+    (?=[-/'"A-Za-z_;])
+    (?:
+        (?P<comment>--[^\n]*|/\*[\s\S]*?(?:\*/|\Z))
+      | (?P<string>'[^']*(?:''[^']*)*'?)
+      | (?P<quoted>"[^"]*"?)
+      | (?<![\w.])(?P<keyword>(?i:BEGIN|END|CASE|CREATE|SELECT|FROM|INSERT\s+INTO))\b
+      | (?P<call>[A-Za-z_]\w*)(?=\()
+      | [A-Za-z_]\w*
+      | (?P<semicolon>;)
+    )
+    """,
+    re.VERBOSE,
+)
+# What follows CREATE at module level, and what follows END
+CREATE_HEADER_PATTERN = re.compile(r"\s+(?:(?:COMPUTE|DATABASE|FILTER)\s+)?(MODULE|FUNCTION|PROCEDURE)\s+(\w+)", re.IGNORECASE)
+END_SUFFIX_PATTERN = re.compile(r"\s+(MODULE|CASE|IF|WHILE|LOOP|REPEAT|FOR)\b", re.IGNORECASE)
+# The table reference after FROM / INSERT INTO, read straight from the source text
+TABLE_REF_PATTERN = re.compile(r"\s*([\w.\{\}\(\)\[\]\|\-\+\:\'\"]+)")
+# Routine names the legacy parser recorded as calls: at least one lower case letter or underscore
+CALL_NAME_PATTERN = re.compile(r"[A-Z]*[a-z_]+[A-Za-z0-9_]*")
+# Calls inside a {schema} expression of a table reference, e.g. Database.{getSchema(env)}.T
+REF_CALL_PATTERN = re.compile(r"([A-Za-z_]\w*)\(")
+# SQL held in string literals, e.g. PASSTHRU('SELECT ... FROM ...')
+STRING_SQL_PATTERN = re.compile(
+    r"\bSELECT\b.*?\bFROM\s+([\w.\{\}\[\]\|\-\+\:\"]+)|\bINSERT\s+INTO\s+([\w.\{\}\[\]\|\-\+\:\"]+)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+class _Routine:
+    __slots__ = ("name", "base_depth", "body_begun", "sql_operations", "calls", "pending_selects")
+
+    def __init__(self, name, base_depth):
+        self.name = name
+        self.base_depth = base_depth
+        self.body_begun = False
+        self.sql_operations = []
+        self.calls = {}
+        self.pending_selects = 0
+
+    def record(self):
+        return EsqlRoutine(self.name, tuple(self.sql_operations), tuple(self.calls))
+
+
+def _table_ref(text, pos):
+    """Returns (table reference, end position) for the name that starts after pos, or (None, pos)."""
+    match = TABLE_REF_PATTERN.match(text, pos)
+    if not match:
+        return None, pos
+    ref = match.group(1)
+    # The name ends at the first parenthesis outside a {schema} expression: what follows is an
+    # INSERT INTO column list, T(A, B), or belongs to the surrounding expression
+    depth = 0
+    for index, char in enumerate(ref):
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        elif char in "()" and depth <= 0:
+            ref = ref[:index]
+            break
+    ref = ref.rstrip(",")
+    return ref or None, match.start(1) + len(ref)
+
+
+def parse_esql(text):
+    """Parses ESQL source into a list of EsqlModule records in one pass over the text.
+
+    Named modules come first in file order, followed by one EsqlModule(None, ...) holding the
+    routines declared outside any module. Comments are ignored; SQL in string literals (dynamic
+    SQL passed to PASSTHRU and the like) is still recorded.
+    """
+    modules = []
+    standalone = []
+    module_name = None
+    module_routines = None  # None while outside a module
+    routine = None
+    stack = []  # open BEGIN / CASE blocks
+
+    search = TOKEN_PATTERN.search
+    pos = 0
+    while True:
+        match = search(text, pos)
+        if match is None:
+            break
+        pos = match.end()
+        kind = match.lastgroup
+
+        if kind == "call":
+            word = match.group()
+            if routine is not None and CALL_NAME_PATTERN.fullmatch(word):
+                routine.calls[word] = None
+
+        elif kind == "keyword":
+            keyword = match.group().upper()
+            if keyword == "BEGIN":
+                if routine is not None and len(stack) == routine.base_depth:
+                    routine.body_begun = True
+                stack.append("BEGIN")
+            elif keyword == "CASE":
+                stack.append("CASE")
+            elif keyword == "END":
+                suffix = END_SUFFIX_PATTERN.match(text, pos)
+                block = suffix.group(1).upper() if suffix else None
+                if block is not None:
+                    pos = suffix.end()
+                if block == "MODULE":
+                    if routine is not None:
+                        _close_routine(routine, module_routines, standalone)
+                        routine = None
+                    if module_routines is not None:
+                        modules.append(EsqlModule(module_name, module_routines))
+                    module_name, module_routines = None, None
+                    stack.clear()
+                elif block is None or block == "CASE":
+                    # IF, WHILE, LOOP, REPEAT and FOR blocks are not tracked on the stack
+                    popped = stack.pop() if stack else None
+                    if routine is not None and popped == "BEGIN" and len(stack) == routine.base_depth:
+                        _close_routine(routine, module_routines, standalone)
+                        routine = None
+            elif keyword == "CREATE":
+                # CREATE FIELD / LASTCHILD OF ... in routine bodies do not match the header
+                header = CREATE_HEADER_PATTERN.match(text, pos)
+                if header is not None:
+                    pos = header.end()
+                    if routine is not None:
+                        # The previous routine's blocks did not balance; it ends here at the latest
+                        _close_routine(routine, module_routines, standalone)
+                        del stack[routine.base_depth:]
+                        routine = None
+                    if header.group(1).upper() == "MODULE":
+                        module_name, module_routines = header.group(2), []
+                    else:
+                        routine = _Routine(header.group(2), len(stack))
+            elif routine is not None:
+                if keyword == "SELECT":
+                    routine.pending_selects += 1
+                elif keyword == "FROM":
+                    if routine.pending_selects:
+                        routine.pending_selects -= 1
+                        table, pos = _table_ref(text, pos)
+                        if table:
+                            _record_table(routine, "SELECT", table)
+                else:  # INSERT INTO
+                    table, pos = _table_ref(text, pos)
+                    if table:
+                        _record_table(routine, "INSERT", table)
+
+        elif kind == "semicolon":
+            if routine is not None and not routine.body_begun and len(stack) == routine.base_depth:
+                # External routines and single statement bodies end at their semicolon
+                _close_routine(routine, module_routines, standalone)
+                routine = None
+
+        elif kind == "string":
+            if routine is not None:
+                for sql_match in STRING_SQL_PATTERN.finditer(match.group()):
+                    sql_type = "SELECT" if sql_match.group(1) else "INSERT"
+                    routine.sql_operations.append((sql_type, sql_match.group(1) or sql_match.group(2)))
+        # comments, quoted identifiers and other identifiers need no handling
+
+    if routine is not None:
+        _close_routine(routine, module_routines, standalone)
+    if module_routines is not None:
+        modules.append(EsqlModule(module_name, module_routines))
+    if standalone:
+        modules.append(EsqlModule(None, standalone))
+    return modules
+
+
+def _record_table(routine, sql_type, table):
+    routine.sql_operations.append((sql_type, table))
+    if "(" in table:
+        # The reference was read past the token scan, so its calls are picked up here
+        for word in REF_CALL_PATTERN.findall(table):
+            if CALL_NAME_PATTERN.fullmatch(word):
+                routine.calls[word] = None
+
+
+def _close_routine(routine, module_routines, standalone):
+    (module_routines if module_routines is not None else standalone).append(routine.record())
@@ -0,0 +1,127 @@
+"""Local stand-in for SSHExecutor, answering the commands RemoteFileHandler sends from an in-memory file tree.
+
+Used to exercise SSHSessionPool and RemoteFileHandler offline and to measure their throughput:
+every command waits latency seconds (plus size / bandwidth for file transfers) like a remote
+round trip would, and can be made to fail at a given rate.
+
+    files = {"/repo/P/a.esql": b"CREATE FUNCTION ...", ...}
+    pool = SSHSessionPool(lambda: FakeSSHExecutor(files, latency=0.02), size=8)
+    handler = RemoteFileHandler(pool)
+"""
+import base64
+import fnmatch
+import io
+import random
+import re
+import shlex
+import tarfile
+import threading
+import time
+
+FIND_PATTERN = re.compile(r"find (\S+) -type f")
+NAME_PATTERN = re.compile(r"-name '([^']+)'")
+CHECKOUT_PATTERN = re.compile(r"cvs checkout -p (\S+)")
+RLOG_PATTERN = re.compile(r"cvs -Q rlog -h (\S+)")
+EXPORT_PATTERN = re.compile(r"cvs -Q export -r HEAD -d export (\S+)")
+
+
+class FakeSSHExecutor:
+    def __init__(self, files, revisions=None, latency=0.02, bandwidth=None, failure_rate=0.0, seed=None, working_tree=None):
+        self.files = files
+        # What find reads from disk; the checked in head revisions (files) unless given
+        self.working_tree = working_tree if working_tree is not None else files
+        self.revisions = revisions or {}
+        self.latency = latency
+        self.bandwidth = bandwidth  # bytes per second, None for unlimited
+        self.failure_rate = failure_rate
+        self.commands = []
+        self._random = random.Random(seed)
+        self._busy = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        pass
+
+    def execute_command(self, command, timeout=None):
+        # One command at a time per session, like a single SSH channel
+        with self._busy:
+            self.commands.append(command)
+            checkout = CHECKOUT_PATTERN.search(command)
+            if checkout:
+                content = self.files.get(checkout.group(1), b"")
+                self._wait(len(content), timeout)
+                return base64.encodebytes(content).decode("ascii") if content else ""
+
+            rlog = RLOG_PATTERN.search(command)
+            if rlog:
+                self._wait(0, timeout)
+                return "".join(
+                    f"\nRCS file: {path},v\nhead: {self.revisions.get(path, '1.1')}\n"
+                    for path in self._select(rlog.group(1))
+                )
+
+            find = FIND_PATTERN.search(command)
+            if find:
+                self._wait(0, timeout)
+                return "\n".join(self._select(find.group(1), NAME_PATTERN.findall(command))) + "\n"
+
+            raise ValueError(f"FakeSSHExecutor does not understand: {command}")
+
+    def open_command_stream(self, command):
+        """Answers the raw cvs checkout -p, find | tar czf - and cvs export | tar czf - commands of RemoteFileHandler."""
+        with self._busy:
+            self.commands.append(command)
+            checkout = CHECKOUT_PATTERN.search(command)
+            if checkout and "base64" not in command:
+                content = self.files.get(checkout.group(1), b"")
+                self._wait(len(content), None)
+                return io.BytesIO(content)
+
+            find = FIND_PATTERN.search(command)
+            if not find or "tar czf -" not in command:
+                raise ValueError(f"FakeSSHExecutor cannot stream: {command}")
+            export = EXPORT_PATTERN.search(command)
+            if export:
+                # The head revisions of the folder, archived relative to the export directory
+                folder = export.group(1).rstrip("/")
+                members = [(self.files[path], "./" + path[len(folder) + 1:])
+                           for path in self._select(folder, NAME_PATTERN.findall(command))]
+            else:
+                members = [(self.working_tree[path], path.lstrip("/"))
+                           for path in self._select(find.group(1), NAME_PATTERN.findall(command), self.working_tree)]
+            buffer = io.BytesIO()
+            with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+                for content, name in members:
+                    info = tarfile.TarInfo(name)
+                    info.size = len(content)
+                    archive.addfile(info, io.BytesIO(content))
+            self._wait(buffer.tell(), None)
+            buffer.seek(0)
+            return buffer
+
+    def _select(self, folder, names=("*",), files=None):
+        files = self.files if files is None else files
+        folder = shlex.split(folder)[0]
+        if folder in files:
+            return [folder]  # rlog of a single file
+        folder = folder.rstrip("/") + "/"
+        return sorted(
+            path for path in files
+            if path.startswith(folder) and "/Attic/" not in path
+            and any(fnmatch.fnmatch(path.rsplit("/", 1)[-1], name) for name in names)
+        )
+
+    def _wait(self, size, timeout):
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            time.sleep(self.latency)
+            raise ConnectionError("Simulated SSH channel failure")
+        duration = self.latency + (size / self.bandwidth if self.bandwidth else 0)
+        if timeout is not None and duration > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Simulated command timed out after {timeout} s")
+        time.sleep(duration)
@@ -0,0 +1,145 @@
+import hashlib
+import logging
+import threading
+from db_writer import submit_db_operation, wait_for_db_operations
+
+
+def content_hash(file_content):
+    """SHA-256 of the raw file bytes, as stored in FileManifest.content_hash."""
+    return hashlib.sha256(file_content).hexdigest()
+
+
+class FileManifest:
+    """Decides which files of a folder have to be analysed, based on the FileManifest table.
+
+    In incremental mode a file is skipped without being fetched when its CVS head revision is
+    the one it was last analysed at, and skipped after fetching when its content hash did not
+    change. Every file that is handed out comes with a manifest entry; passing that entry to
+    the processor makes it replace the rows previously derived from the file and record the
+    entry in the same write. Files that disappeared from a folder have their rows removed.
+
+    In full mode (incremental=False) every file is handed out, but the manifest is still
+    recorded so that the next incremental run has something to compare against.
+
+    files_to_fetch and check_content are the two halves of changed_files for callers that fetch
+    the files themselves (see pipeline.Pipeline); they are safe to call from several threads.
+    """
+
+    def __init__(self, db_queue, db_manager, file_handler, cvsroot, incremental=True):
+        self.db_queue = db_queue
+        self.db_manager = db_manager
+        self.file_handler = file_handler
+        self.cvsroot = cvsroot
+        self.incremental = incremental
+        self.entries = db_manager.get_file_manifest()
+        self.stats = {"unchanged": 0, "changed": 0, "new": 0, "removed": 0}
+        self._pending = []
+        self._revisions = {}
+        self._lock = threading.Lock()
+
+    def changed_files(self, folder, file_type, project_id):
+        """Yields (file_path, file_content, manifest_entry) for each file of folder that needs analysing.
+
+        Files are fetched individually, concurrently when the file handler runs on a session
+        pool, and handed out in the order the fetches complete; file_content is the raw bytes.
+        """
+        to_fetch = self.files_to_fetch(folder, file_type, project_id)
+        revisions = self._folder_revisions(folder)
+        for file_path, file_content in self.file_handler.fetch_files(self.cvsroot, to_fetch, revisions=revisions):
+            if file_content is None:
+                continue  # Already logged by the file handler
+            manifest_entry = self.check_content(folder, file_path, project_id, file_type, file_content)
+            if manifest_entry is not None:
+                yield file_path, file_content, manifest_entry
+
+    def fetched_files(self, folder, file_type, project_id, files, versioned=True):
+        """Like changed_files, for (file_path, file_content bytes) pairs that were already fetched in bulk."""
+        for file_path, file_content in files:
+            manifest_entry = self.check_content(folder, file_path, project_id, file_type, file_content, versioned)
+            if manifest_entry is not None:
+                yield file_path, file_content, manifest_entry
+
+    def files_to_fetch(self, folder, file_type, project_id):
+        """Returns the paths of the file_type files of folder that have to be fetched.
+
+        In incremental mode files still at the revision they were analysed at are left out and
+        files that disappeared from the folder are forgotten.
+        """
+        revisions = self._folder_revisions(folder)
+        seen = set()
+        to_fetch = []
+        for file_path in self.file_handler.find_files(folder, file_type):
+            seen.add(file_path)
+            previous = self.entries.get(file_path)
+            revision = self._revision(revisions, file_path)
+            if self.incremental and previous and revision is not None and previous[0] == revision:
+                self._count("unchanged")
+                continue
+            to_fetch.append(file_path)
+
+        if self.incremental:
+            self._forget_removed(project_id, file_type, seen)
+        return to_fetch
+
+    def check_content(self, folder, file_path, project_id, file_type, file_content, versioned=True):
+        """Returns the manifest entry of a fetched file, or None if its content did not change.
+
+        versioned=False is for contents read from a working tree rather than from CVS: they
+        may not be the head revision, so the entry records no revision and the next
+        incremental run fetches the file again.
+        """
+        revision = self.revision(folder, file_path) if versioned else None
+        return self._changed_entry(file_path, project_id, file_type, revision, file_content)
+
+    def flush(self):
+        """Waits for the manifest updates and removals queued so far."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        wait_for_db_operations(pending)
+        logging.info(
+            f"File manifest: {self.stats['new']} new, {self.stats['changed']} changed, "
+            f"{self.stats['unchanged']} unchanged, {self.stats['removed']} removed files"
+        )
+
+    def _changed_entry(self, file_path, project_id, file_type, revision, file_content):
+        """Returns the manifest entry of a fetched file, or None if its content did not change."""
+        previous = self.entries.get(file_path)
+        manifest_entry = (file_path, project_id, file_type, revision, content_hash(file_content))
+        if self.incremental and previous and previous[1] == manifest_entry[4]:
+            # Same content under a new revision: only the manifest needs updating
+            self._count("unchanged")
+            self._submit(self.db_manager.record_file, *manifest_entry)
+            return None
+        self._count("changed" if previous else "new")
+        return manifest_entry
+
+    def revision(self, folder, file_path):
+        """CVS head revision of a file of folder, or None if CVS did not report one."""
+        return self._revision(self._folder_revisions(folder), file_path)
+
+    @staticmethod
+    def _revision(revisions, file_path):
+        return revisions.get(file_path[:-2] if file_path.endswith(",v") else file_path)
+
+    def _folder_revisions(self, folder):
+        # One cvs rlog per folder, shared by the esql and msgflow passes
+        revisions = self._revisions.get(folder)
+        if revisions is None:
+            revisions = self.file_handler.get_folder_revisions(self.cvsroot, folder)
+            revisions = self._revisions.setdefault(folder, revisions)
+        return revisions
+
+    def _forget_removed(self, project_id, file_type, seen):
+        for file_path, (_, _, entry_project_id, entry_file_type) in self.entries.items():
+            if entry_project_id == project_id and entry_file_type == file_type and file_path not in seen:
+                self._count("removed")
+                self._submit(self.db_manager.forget_file, file_path, project_id, file_type)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _submit(self, func, *args):
+        future = submit_db_operation(self.db_queue, func, *args)
+        with self._lock:
+            self._pending.append(future)
@@ -1,51 +1,139 @@
+import logging
+import os
 import queue
-import threading
 import concurrent.futures
+from binary_transfer import decode_text
+from content_cache import ContentCache
+from db_writer import DBWriterThread, submit_db_operation
+from esql_processor import ESQLProcessor, parse_esql_file
+from file_manifest import FileManifest
+from pipeline import Pipeline
+from ssh_pool import SSHSessionPool
 
 # Assuming you have DatabaseManager, SSHExecutor, and RemoteFileHandler classes defined elsewhere
 
-def main():
+def main(db_batch_size=500, db_profile="bulk-load", esql_workers=None,
+         incremental=False, bulk_fetch=True, cvsroot="...", ssh_sessions=8, ssh_timeout=300,
+         queue_size=200, stage_workers=None, stats_interval=30, content_cache_dir=None,
+         content_cache_size=2 * 1024 ** 3, offline=False, working_tree=False):
+    """Loads all projects.
+
+    Files flow through a pipeline of stages connected by queues of at most queue_size items:
+    discover (find the files of a folder), fetch, decode, parse and write. stage_workers maps
+    stage names to thread counts and overrides the defaults below; per-stage throughput is
+    logged every stats_interval seconds and at the end (see pipeline.Pipeline).
+
+    ESQL files are parsed in a pool of esql_workers processes (default: one per CPU);
+    esql_workers=0 parses them on the parse threads instead. Message flows are parsed and
+    written by the parse threads. With incremental=True only files whose CVS revision and
+    content changed since the last run are fetched and parsed, and only their rows are
+    replaced (see FileManifest). Full runs with bulk_fetch fetch the head revisions of each
+    folder as one tar stream (cvs export) instead of one SSH command per file; working_tree=True
+    reads the folders as they are on disk instead, and their manifest entries record no
+    revision so that the next incremental run fetches them again. Remote commands run on a pool of up to ssh_sessions
+    SSH sessions, each command limited to ssh_timeout seconds.
+
+    With a content_cache_dir, fetched file contents are kept in a local ContentCache of at most
+    content_cache_size bytes and only downloaded again when their CVS revision changed;
+    offline=True runs entirely from that cache without contacting the server.
+    """
     db_queue = queue.Queue()
-    db_manager = DatabaseManager("path_to_your_database.db")
-    db_writer = DBWriterThread(db_queue, db_manager)
+    db_manager = DatabaseManager("path_to_your_database.db", profile=db_profile)
+    db_manager.begin_run(drop_indexes=not incremental)
+    db_writer = DBWriterThread(db_queue, db_manager, batch_size=db_batch_size)
     db_writer.start()
 
+    parse_processes = esql_workers if esql_workers is not None else os.cpu_count() or 1
+    workers = {
+        "discover": 2,
+        "fetch": ssh_sessions,
+        "decode": 2,
+        # One ESQL file in flight per process, plus room for message flows waiting on the writer
+        "parse": max(parse_processes * 2, 4),
+        "write": 1,
+    }
+    workers.update(stage_workers or {})
+    bulk = bulk_fetch and not incremental
+    versioned = not (bulk and working_tree)
+
     # Connect to remote server and retrieve folder names
-    with SSHExecutor(hostname="...", private_key_path="...") as ssh_executor:
-        file_handler = RemoteFileHandler(ssh_executor)
+    ssh_pool = SSHSessionPool(
+        lambda: SSHExecutor(hostname="...", private_key_path="..."), size=ssh_sessions, command_timeout=ssh_timeout
+    )
+    content_cache = ContentCache(content_cache_dir, max_bytes=content_cache_size, offline=offline) if content_cache_dir else None
+    with ssh_pool, concurrent.futures.ProcessPoolExecutor(max_workers=parse_processes or 1) as esql_pool:
+        file_handler = RemoteFileHandler(ssh_pool, content_cache=content_cache)
         folders = file_handler.get_folders()  # Implement this method in RemoteFileHandler to get remote folders
 
-        # Insert each folder as a project and store project_id for later use
-        project_ids = {}
-        for folder in folders:
-            callback_event = threading.Event()
-            result_container = {}
-            db_queue.put((db_manager.insert_project, (folder,), callback_event, result_container))
-            callback_event.wait()
-            project_ids[folder] = result_container["result"]
+        # Insert each folder as a project; the IDs are only waited for when a folder is discovered
+        project_futures = {folder: submit_db_operation(db_queue, db_manager.insert_project, folder) for folder in folders}
 
-        # Start processing files in each folder
         esql_processor = ESQLProcessor(db_queue, db_manager)
         msgflow_processor = MsgFlowProcessor(db_queue, db_manager)
+        manifest = FileManifest(db_queue, db_manager, file_handler, cvsroot, incremental=incremental)
+
+        def discover(task):
+            folder, file_type = task
+            project_id = project_futures[folder].result()
+            if bulk:
+                yield folder, file_type, project_id, None  # The whole folder is fetched as one stream
+                return
+            for file_path in manifest.files_to_fetch(folder, file_type, project_id):
+                yield folder, file_type, project_id, file_path
+
+        def fetch(task):
+            folder, file_type, project_id, file_path = task
+            if file_path is None:
+                for file_path, file_content in file_handler.iter_folder_files(cvsroot, folder, (file_type,), cvs_export=versioned):
+                    yield folder, file_type, project_id, file_path, file_content
+                return
+            file_content = file_handler.get_file_content(cvsroot, file_path, manifest.revision(folder, file_path))
+            if file_content is not None:  # Failures are logged by the file handler
+                yield folder, file_type, project_id, file_path, file_content
 
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            for folder in folders:
-                project_id = project_ids[folder]
-                
-                # Process .esql files
-                esql_files = file_handler.find_files(folder, "esql")
-                for esql_file in esql_files:
-                    file_content = file_handler.get_file_content_base64(ssh_executor, esql_file)
-                    executor.submit(esql_processor.process_file, file_content, esql_file, project_id)
-
-                # Process .msgflow files
-                msgflow_files = file_handler.find_files(folder, "msgflow")
-                for msgflow_file in msgflow_files:
-                    file_content = file_handler.get_file_content_base64(ssh_executor, msgflow_file)
-                    executor.submit(msgflow_processor.process_file, file_content, msgflow_file, project_id)
+        def decode(task):
+            folder, file_type, project_id, file_path, file_content = task
+            manifest_entry = manifest.check_content(folder, file_path, project_id, file_type, file_content, versioned)
+            if manifest_entry is not None:
+                yield file_type, file_path, project_id, decode_text(file_content)[0], manifest_entry
+
+        def parse(task):
+            file_type, file_path, project_id, file_content, manifest_entry = task
+            if file_type == "msgflow":
+                msgflow_processor.process_file(file_content, file_path, project_id, manifest_entry)
+                return
+            job = (file_content, file_path, project_id)
+            # Regex scanning is CPU bound: parse in worker processes, write from this process
+            _, _, modules = esql_pool.submit(parse_esql_file, job).result() if esql_workers != 0 else parse_esql_file(job)
+            yield file_path, project_id, modules, manifest_entry
+
+        def write(task):
+            esql_file, project_id, modules, manifest_entry = task
+            esql_processor.write_records(esql_file, project_id, modules, manifest_entry)
+            return ()
+
+        pipeline = Pipeline(queue_size=queue_size, log_interval=stats_interval)
+        for name, func in (("discover", discover), ("fetch", fetch), ("decode", decode), ("parse", parse), ("write", write)):
+            pipeline.add_stage(name, func, workers[name])
+        pipeline.run((folder, file_type) for file_type in ("esql", "msgflow") for folder in folders)
+
+        # Wait for the queued ESQL files and write the leaf rows still buffered by the processors
+        esql_processor.flush()
+        msgflow_processor.flush()
+        manifest.flush()
+
+    if content_cache is not None:
+        stats = content_cache.stats
+        logging.info(f"Content cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions")
+        content_cache.close()
 
     db_queue.put(None)  # Signal db_writer to stop
     db_writer.join()
+    db_manager.end_run()
+    db_manager.close()
+
+    for table, stats in db_manager.id_cache_stats().items():
+        logging.info(f"ID cache {table}: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%})")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
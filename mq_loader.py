@@ -1,7 +1,7 @@
 import re
-import threading
 import concurrent.futures
 from database_manager import DatabaseManager
+from db_writer import BulkRowBuffer, submit_db_operation
 
 class MQDataLoader:
     def __init__(self, db_queue, db_manager, file_content, max_workers=5):
@@ -18,6 +18,8 @@ class MQDataLoader:
         self.db_manager = db_manager
         self.file_content = file_content
         self.max_workers = max_workers
+        # Attributes are leaf rows and are written in bulk
+        self.leaf_rows = BulkRowBuffer(db_queue, db_manager)
 
     def parse_and_load(self):
         """Parses the file content and loads data into the database using concurrent futures."""
@@ -40,22 +42,19 @@ class MQDataLoader:
             for future in concurrent.futures.as_completed(futures):
                 future.result()  # To catch exceptions, if any
 
+        # Write the buffered attributes
+        self.leaf_rows.flush()
+
     def _process_definition(self, definition_type, definition_name, attributes_str):
         """Processes a single definition and its attributes."""
         # Queue the insertion of the main definition
-        definition_id = self._queue_insert_definition(definition_type, definition_name)
+        definition_id = self._queue_insert_definition(definition_type, definition_name).result()
 
         # If attributes are found, parse and queue their insertion
         if attributes_str:
             attributes = self._parse_attributes(attributes_str)
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # Submit each attribute insertion as a separate task
-                futures = [
-                    executor.submit(self._queue_insert_attribute, definition_id, key, value)
-                    for key, value in attributes.items()
-                ]
-                for future in concurrent.futures.as_completed(futures):
-                    future.result()  # Catch exceptions if any
+            for key, value in attributes.items():
+                self.leaf_rows.add("Attributes", (definition_id, key, value))
 
     def _parse_attributes(self, attributes_str):
         """Parses attributes from a definition string and returns them as a dictionary."""
@@ -71,25 +70,9 @@ class MQDataLoader:
 
     def _queue_insert_definition(self, definition_type, definition_name):
         """Queues the insertion of a definition into the database."""
-        callback_event = threading.Event()
-        result_container = {}
-        self.db_queue.put((
+        return submit_db_operation(
+            self.db_queue,
             self.db_manager.insert_definition,
-            (definition_type, definition_name),
-            callback_event,
-            result_container
-        ))
-        callback_event.wait()
-        return result_container["result"]
-
-    def _queue_insert_attribute(self, definition_id, attribute_key, attribute_value):
-        """Queues the insertion of an attribute for a definition into the database."""
-        callback_event = threading.Event()
-        result_container = {}
-        self.db_queue.put((
-            self.db_manager.insert_attribute,
-            (definition_id, attribute_key, attribute_value),
-            callback_event,
-            result_container
-        ))
-        callback_event.wait()
\ No newline at end of file
+            definition_type,
+            definition_name
+        )
@@ -1,66 +1,189 @@
-import json
 import os
 import glob
+import concurrent.futures
+import contextlib
+import logging
+import time
 import xml.etree.ElementTree as ET
 import re
-import copy
 from Input_Node_replacement import replace_subflow_nodes
+from subflow_repository import SubflowRepository
+import config_registry
 
-increment_tracker = {}
-name_increment_tracker = {}  # Tracks names and IDs for all elements.
-group_name_tracker = {}  # Tracker for group names
-described_attribute_tracker = {}
+# Named after the module also when it runs as a script, so that module_levels apply to the pool workers
+logger = logging.getLogger('msgflow_manipulation')
 
+subflow_repository = SubflowRepository()  # Parsed subflows, shared by all msgflows of a process
 
-def find_and_read_msgflow_files(directory):
-    msgflow_files = glob.glob(os.path.join(directory, '**', '*.msgflow'), recursive=True)
-    print(f"Found {len(msgflow_files)} .msgflow files in {directory}")
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(processName)s %(name)s: %(message)s"
+_logging_config = None  # The arguments of the last configure_logging call, repeated in the pool workers
 
-    if msgflow_files:
-        for file in msgflow_files:
-            read_msgflow_file(file)
+
+def configure_logging(level=logging.INFO, module_levels=None):
+    """
+    Sets up logging for a msgflow rewrite: records of level and above go to stderr, one summary
+    record per msgflow at INFO and the details of every element at DEBUG. module_levels sets other
+    levels per module, e.g. {'Input_Node_replacement': logging.DEBUG}. The pool workers of
+    find_and_read_msgflow_files are set up the same way.
+    """
+    global _logging_config
+    _logging_config = (level, dict(module_levels or {}))
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+    for name, module_level in _logging_config[1].items():
+        logging.getLogger(name).setLevel(module_level)
+
+
+def _init_worker(logging_config):
+    # Workers that are not forked start without the logging setup of the parent
+    if logging_config is not None:
+        configure_logging(*logging_config)
+
+
+class RewriteContext:
+    """
+    The numbering state of one msgflow rewrite. Every file starts from a fresh context,
+    so its output does not depend on which files were rewritten before it. The context
+    also collects the counts and timings of the file's summary record (see summary).
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.name_increment_tracker = {}  # Tracks names and IDs for all elements.
+        self.group_name_tracker = {}  # Tracker for group names
+        self.subflow_nodes = 0
+        self.missing_subflows = 0  # Subflow nodes without a namespace URI
+        self.timings = {}  # Step -> seconds
+
+    @contextlib.contextmanager
+    def timed(self, step):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[step] = self.timings.get(step, 0.0) + time.perf_counter() - start
+
+    def summary(self, **fields):
+        """The summary record of the file as a dict: the counts, the given fields and the seconds per step."""
+        summary = {
+            "file": self.file_path,
+            "subflow_nodes": self.subflow_nodes,
+            "missing_subflows": self.missing_subflows,
+        }
+        summary.update(fields)
+        for step in ("load", "subflows", "write"):
+            summary[f"{step}_seconds"] = self.timings.get(step, 0.0)
+        summary["seconds"] = sum(self.timings.values())
+        return summary
+
+
+SUMMARY_COUNTS = ("subflow_nodes", "missing_subflows", "features", "property_descriptors", "attribute_links")
+
+
+def find_and_read_msgflow_files(directory, workers=None, chunksize=4):
+    """
+    Rewrites every .msgflow file below directory, in a pool of workers processes
+    (default: one per CPU; 0 rewrites them one after the other in this process).
+    Returns the summaries of the files (see read_msgflow_file) and logs their totals.
+    """
+    msgflow_files = sorted(glob.glob(os.path.join(directory, '**', '*.msgflow'), recursive=True))
+    logger.info("Found %d .msgflow files in %s", len(msgflow_files), directory)
+
+    if not msgflow_files:
+        logger.warning("No .msgflow files found in %s", directory)
+        return []
+
+    start = time.perf_counter()
+    if workers == 0:
+        summaries = list(map(_rewrite_msgflow_file, msgflow_files))
     else:
-        print(f"No .msgflow files found in {directory}")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                    initargs=(_logging_config,)) as executor:
+            summaries = list(executor.map(_rewrite_msgflow_file, msgflow_files, chunksize=chunksize))
+    totals = {key: sum(summary[key] for summary in summaries) for key in SUMMARY_COUNTS}
+    logger.info(
+        "Rewrote %d of %d msgflow files in %.2f s (%d errors): %d subflow nodes (%d without namespace URI), "
+        "%d eStructuralFeatures, %d propertyDescriptors, %d attributeLinks; subflow repository: %d hits, %d misses",
+        sum(1 for summary in summaries if summary["output"]), len(summaries), time.perf_counter() - start,
+        sum(1 for summary in summaries if summary["error"]), totals["subflow_nodes"], totals["missing_subflows"],
+        totals["features"], totals["property_descriptors"], totals["attribute_links"],
+        sum(summary["subflow_hits"] for summary in summaries), sum(summary["subflow_misses"] for summary in summaries),
+    )
+    return summaries
+
+
+def _rewrite_msgflow_file(file_path):
+    """Pool entry point: rewrites one msgflow and returns its summary with its subflow repository hits and misses."""
+    before = subflow_repository.stats()
+    summary = read_msgflow_file(file_path)
+    after = subflow_repository.stats()
+    summary["subflow_hits"] = after["hits"] - before["hits"]
+    summary["subflow_misses"] = after["misses"] - before["misses"]
+    return summary
 
 
 def read_msgflow_file(file_path):
-    print(f"\nProcessing msgflow file: {file_path}")
+    """
+    Rewrites one msgflow and logs its summary record at INFO. The summary is also passed to
+    handlers as the record attribute rewrite_summary and returned: a dict with the counts of
+    the subflow nodes and inserted elements, the output path (None if nothing was written),
+    the error if the rewrite failed and the seconds spent per step.
+    """
+    logger.debug("Processing msgflow file: %s", file_path)
+    context = RewriteContext(file_path)
+    eStructuralFeatures_data_accum = []
+    property_descriptor_data_accum = []
+    attribute_links_data_accum = []
+    new_file_path = error = None
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            root = ET.fromstring(content)
-            namespaces = extract_namespaces(content)
+        with context.timed("load"):
+            # The flow is parsed into one tree, which is rewritten in place and written out
+            root, namespaces, epackage_attributes = load_msgflow(file_path)
             namespaces = update_namespaces_with_replacements(namespaces)
             for prefix, uri in namespaces.items():
                 ET.register_namespace(prefix, uri)
 
+        with context.timed("subflows"):
             # Initialize name_increment_tracker with existing names in the msgflow
-            initialize_name_increment_tracker(root)
+            initialize_name_increment_tracker(root, context)
 
             # Call the subflow replacement function here
             replace_subflow_nodes(root)
-            # Convert the modified root back to a string to use in create_new_msgflow
-            modified_content = ET.tostring(root, encoding='utf-8').decode('utf-8')
-            eStructuralFeatures_data_accum = []
-            property_descriptor_data_accum = []
-            attribute_links_data_accum = []
 
-            find_subflow_nodes(root, namespaces, file_path, content,
+            find_subflow_nodes(root, namespaces, file_path,
                                eStructuralFeatures_data_accum,
                                property_descriptor_data_accum,
-                               attribute_links_data_accum)
-            if eStructuralFeatures_data_accum or property_descriptor_data_accum or attribute_links_data_accum:
-                create_new_msgflow(file_path, eStructuralFeatures_data_accum, property_descriptor_data_accum,
-                                   attribute_links_data_accum, modified_content, content)
+                               attribute_links_data_accum, context)
+        if eStructuralFeatures_data_accum or property_descriptor_data_accum or attribute_links_data_accum:
+            with context.timed("write"):
+                new_file_path = create_new_msgflow(file_path, eStructuralFeatures_data_accum,
+                                                   property_descriptor_data_accum, attribute_links_data_accum,
+                                                   root, epackage_attributes)
     except Exception as e:
-        print(f"Error reading file {file_path}: {e}")
-
-
-def initialize_name_increment_tracker(root):
+        error = str(e)
+        logger.error("Error reading file %s: %s", file_path, e)
+
+    summary = context.summary(features=len(eStructuralFeatures_data_accum),
+                              property_descriptors=len(property_descriptor_data_accum),
+                              attribute_links=len(attribute_links_data_accum),
+                              output=new_file_path, error=error)
+    logger.info(
+        "%s: %d subflow nodes, %d eStructuralFeatures, %d propertyDescriptors, %d attributeLinks%s "
+        "in %.1f ms (load %.1f, subflows %.1f, write %.1f)",
+        file_path, summary["subflow_nodes"], summary["features"], summary["property_descriptors"],
+        summary["attribute_links"], "" if new_file_path else ", nothing written", summary["seconds"] * 1000,
+        summary["load_seconds"] * 1000, summary["subflows_seconds"] * 1000, summary["write_seconds"] * 1000,
+        extra={"rewrite_summary": summary},
+    )
+    return summary
+
+
+def initialize_name_increment_tracker(root, context):
     """
-    Initialize the name_increment_tracker with existing names in the msgflow.
+    Initialize the name_increment_tracker of the context with existing names in the msgflow.
     Ensures that names and IDs already present in the msgflow are accounted for.
     """
+    name_increment_tracker = context.name_increment_tracker
+
     # Extract eStructuralFeatures names and IDs
     for feature in root.findall(".//eClassifiers/eStructuralFeatures"):
         name = feature.attrib.get('name')
@@ -101,7 +224,41 @@ def initialize_name_increment_tracker(root):
                 else:
                     name_increment_tracker[base_name] = num
 
-    print(f"Initialized name_increment_tracker: {name_increment_tracker}")
+    logger.debug("Initialized name_increment_tracker: %s", name_increment_tracker)
+
+
+def load_msgflow(file_path):
+    """
+    Parses a msgflow file into a tree, collecting its namespace declarations in the same pass.
+    Returns (root, namespaces, epackage_attributes); epackage_attributes is the original text
+    of the <ecore:EPackage> start tag after the tag name (see read_epackage_attributes).
+    """
+    namespaces = {}
+    events = ET.iterparse(file_path, events=('start-ns',))
+    for _, (prefix, uri) in events:
+        if prefix:
+            namespaces[prefix] = uri
+    return events.root, namespaces, read_epackage_attributes(file_path)
+
+
+def read_epackage_attributes(file_path, chunk_size=64 * 1024):
+    """
+    Returns the text between '<ecore:EPackage' and the end of its start tag, '>' included,
+    reading only the head of the file, or None if the file has no such tag.
+    """
+    head = ''
+    with open(file_path, 'r', encoding='utf-8') as file:
+        while True:
+            chunk = file.read(chunk_size)
+            head += chunk
+            start_index = head.find('<ecore:EPackage')
+            if start_index >= 0:
+                start_index += len('<ecore:EPackage')
+                end_index = head.find('>', start_index)
+                if end_index >= 0:
+                    return head[start_index:end_index + 1]
+            if not chunk:
+                return None
 
 
 def extract_namespaces(xml_content):
@@ -114,76 +271,83 @@ def extract_namespaces(xml_content):
 
 
 # Modify the find_subflow_nodes function to call process_subflow_data
-def find_subflow_nodes(root, namespaces, original_file_path, msgflow_content, eStructuralFeatures_accum,
-                       property_descriptor_accum, attribute_links_accum):
+def find_subflow_nodes(root, namespaces, original_file_path, eStructuralFeatures_accum,
+                       property_descriptor_accum, attribute_links_accum, context):
     subflow_found = False
     for node in root.findall(".//composition/nodes"):
         node_type = node.attrib.get('{http://www.omg.org/XMI}type', '')
         if "subflow" in node_type:
             subflow_found = True
+            context.subflow_nodes += 1
             subflow_namespace = node_type.split(':')[0]
             subflow_file_path = namespaces.get(subflow_namespace)
             subflow_node_id = node.attrib.get('{http://www.omg.org/XMI}id', '')
 
             if subflow_file_path:
                 full_subflow_path = os.path.join('/Users/viniththomas/IBM/ACET12/workspace/STD_MFP', subflow_file_path)
-                print(f"Identified subflow: {subflow_file_path}")
-                print(f"Full subflow path: {full_subflow_path}")
+                logger.debug("Identified subflow: %s", subflow_file_path)
+                logger.debug("Full subflow path: %s", full_subflow_path)
                 subflow_data = read_subflow_file(full_subflow_path)
                 if subflow_data is not None:
                     # Use process_subflow_data to get incremented data
                     eStructuralFeatures_data, property_descriptor_data, attribute_links_data = process_subflow_data(
-                        subflow_data, subflow_namespace, subflow_file_path, subflow_node_id)
+                        subflow_data, subflow_namespace, subflow_file_path, subflow_node_id, context)
 
                     # Accumulate the processed data
                     eStructuralFeatures_accum.extend(eStructuralFeatures_data)
                     property_descriptor_accum.extend(property_descriptor_data)
                     attribute_links_accum.extend(attribute_links_data)
             else:
-                print(f"No namespace URI found for prefix: {subflow_namespace}")
+                context.missing_subflows += 1
+                logger.warning("%s: no namespace URI found for prefix: %s", original_file_path, subflow_namespace)
     if not subflow_found:
-        print("No subflow nodes found in this msgflow file.")
+        logger.debug("No subflow nodes found in this msgflow file.")
 
 
 def read_subflow_file(file_path):
-    print(f"Reading subflow file: {file_path}")
+    """
+    Returns the parsed template of a subflow (see SubflowRepository), or None if it cannot be read.
+    The file is only parsed again when it has changed since it was last read.
+    """
+    logger.debug("Reading subflow file: %s", file_path)
     if not os.path.exists(file_path):
-        print(f"Subflow file does not exist: {file_path}")
+        logger.warning("Subflow file does not exist: %s", file_path)
         return None
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            return ET.fromstring(content)
+        return subflow_repository.get(file_path)
     except Exception as e:
-        print(f"Error reading subflow file {file_path}: {e}")
+        logger.error("Error reading subflow file %s: %s", file_path, e)
         return None
 
 
-def process_subflow_data(subflow_data, subflow_namespace, subflow_file_path, subflow_node_id):
+def process_subflow_data(subflow_data, subflow_namespace, subflow_file_path, subflow_node_id, context):
     """
     Process eStructuralFeatures, propertyDescriptor, and attributeLinks from subflow data,
-    and perform incrementing of attributes as needed.
+    and perform incrementing of attributes as needed. subflow_data is a SubflowTemplate;
+    the returned elements are copies and can be modified freely.
     """
     eStructuralFeatures_data = extract_eStructuralFeatures(subflow_data)
-    property_descriptor_data = extract_propertyDescriptors(subflow_data, eStructuralFeatures_data, subflow_namespace)
+    property_descriptor_data = extract_propertyDescriptors(subflow_data, eStructuralFeatures_data, subflow_namespace,
+                                                           context)
     attribute_links_data = extract_attributeLinks(subflow_data, eStructuralFeatures_data, subflow_file_path, subflow_node_id)
 
+    # Index the related elements by the xmi:id of their feature before any of them is renamed
+    related_elements = index_related_elements(property_descriptor_data, attribute_links_data)
+
     # For each eStructuralFeature, increment and update related elements
     for feature in eStructuralFeatures_data:
-        increment_name_and_id(feature, property_descriptor_data, attribute_links_data)
+        increment_name_and_id(feature, related_elements, context)
 
     return eStructuralFeatures_data, property_descriptor_data, attribute_links_data
 
 
 def extract_eStructuralFeatures(subflow_data):
-    extracted_features = []
-    for feature in subflow_data.findall(".//eClassifiers/eStructuralFeatures"):
-        extracted_features.append(feature)
-    print(f"Extracted {len(extracted_features)} eStructuralFeatures from subflow.")
+    extracted_features = subflow_data.features()
+    logger.debug("Extracted %d eStructuralFeatures from subflow.", len(extracted_features))
     return extracted_features
 
 
-def extract_propertyDescriptors(subflow_data, eStructuralFeatures_data, subflow_namespace):
+def extract_propertyDescriptors(subflow_data, eStructuralFeatures_data, subflow_namespace, context):
     extracted_property_descriptors = []
     match = re.search(r'de_it_eai_(.+)\.subflow', subflow_namespace)
     if match:
@@ -193,39 +357,36 @@ def extract_propertyDescriptors(subflow_data, eStructuralFeatures_data, subflow_
     group_name_prefix = f"Group.{subflow_name}"
 
     # Generate a unique group name for each subflow
-    group_name_prefix = generate_unique_group_name(group_name_prefix)
-    print(f"Using group name prefix: {group_name_prefix}")
-
-    property_descriptor_map = {}
-    for pd in subflow_data.iter('propertyDescriptor'):
-        described_attr = pd.attrib.get('describedAttribute')
-        if described_attr:
-            property_descriptor_map[described_attr] = pd
+    group_name_prefix = generate_unique_group_name(group_name_prefix, context)
+    logger.debug("Using group name prefix: %s", group_name_prefix)
+    debug = logger.isEnabledFor(logging.DEBUG)
 
     for feature in eStructuralFeatures_data:
         xmi_id = feature.attrib.get('{http://www.omg.org/XMI}id')
         if not xmi_id:
-            print("eStructuralFeature without xmi:id found, skipping.")
+            logger.warning("eStructuralFeature without xmi:id found, skipping.")
             continue
 
-        property_descriptor = property_descriptor_map.get(xmi_id)
+        property_descriptor = subflow_data.property_descriptor(xmi_id)
         if property_descriptor is not None:
-            clean_descriptor = clean_propertyDescriptor(copy.deepcopy(property_descriptor), group_name_prefix)
+            clean_descriptor = clean_propertyDescriptor(property_descriptor, group_name_prefix)
             if clean_descriptor is not None:
                 extracted_property_descriptors.append(clean_descriptor)
-                print(f"Extracted and cleaned propertyDescriptor for describedAttribute: {xmi_id}")
-        else:
-            print(f"No propertyDescriptor found for describedAttribute: {xmi_id}")
+                if debug:
+                    logger.debug("Extracted and cleaned propertyDescriptor for describedAttribute: %s", xmi_id)
+        elif debug:
+            logger.debug("No propertyDescriptor found for describedAttribute: %s", xmi_id)
 
-    print(f"Extracted {len(extracted_property_descriptors)} propertyDescriptors from subflow.")
+    logger.debug("Extracted %d propertyDescriptors from subflow.", len(extracted_property_descriptors))
     return extracted_property_descriptors
 
 
-def generate_unique_group_name(group_name):
+def generate_unique_group_name(group_name, context):
     """
-    Generates a unique group name by checking if the group name is already used.
+    Generates a unique group name by checking if the group name is already used in the msgflow.
     If it is, appends a number suffix to make it unique.
     """
+    group_name_tracker = context.group_name_tracker
     if group_name not in group_name_tracker:
         group_name_tracker[group_name] = 1
     else:
@@ -246,12 +407,12 @@ def clean_propertyDescriptor(descriptor, group_name_prefix):
     children_to_remove = [child for child in list(descriptor) if child.tag == 'propertyDescriptor']
     for child in children_to_remove:
         descriptor.remove(child)
-        print(f"Removed nested propertyDescriptor from groupName: {group_name_prefix}")
+        logger.debug("Removed nested propertyDescriptor from groupName: %s", group_name_prefix)
 
     # Ensure nested propertyDescriptors have the correct groupName
     for child in descriptor.findall(".//propertyDescriptor"):
         child.attrib['groupName'] = group_name_prefix
-        print(f"Updated nested propertyDescriptor groupName to: {group_name_prefix}")
+        logger.debug("Updated nested propertyDescriptor groupName to: %s", group_name_prefix)
 
     return descriptor
 
@@ -262,19 +423,18 @@ def extract_attributeLinks(subflow_data, eStructuralFeatures_data, subflow_file_
     If the attributeLink is not found and the property name is not in the not allowed list,
     constructs the attributeLinks dynamically.
     """
-    # Load the not allowed property names from a JSON file
-    with open('property_names.json', 'r') as file:
-        property_data = json.load(file)
-        not_allowed_properties = property_data.get("property_names", [])
+    # The not allowed property names from the JSON file, as a frozenset (see config_registry)
+    not_allowed_properties = config_registry.property_names()
 
     extracted_attribute_links = []
+    debug = logger.isEnabledFor(logging.DEBUG)
 
     for feature in eStructuralFeatures_data:
         xmi_id = feature.attrib.get('{http://www.omg.org/XMI}id')
         feature_name = feature.attrib.get('name')
 
         # Extract attributeLink matching the xmi:id
-        attribute_link = subflow_data.find(f".//attributeLinks[@promotedAttribute='{xmi_id}']")
+        attribute_link = subflow_data.attribute_link(xmi_id)
 
         if attribute_link is None:
             # If attributeLink not found, check if the feature name is in the not allowed property list
@@ -291,12 +451,13 @@ def extract_attributeLinks(subflow_data, eStructuralFeatures_data, subflow_file_
                     href_property = href_value.split('#')[-1]
                     new_href = f"{subflow_file_path}#{href_property}"
                     overridden_attribute.attrib['href'] = new_href
-            print(f"Extracted attributeLink for promotedAttribute: {xmi_id}")
+            if debug:
+                logger.debug("Extracted attributeLink for promotedAttribute: %s", xmi_id)
 
         if attribute_link is not None:
             extracted_attribute_links.append(attribute_link)
 
-    print(f"Extracted {len(extracted_attribute_links)} attributeLinks from subflow.")
+    logger.debug("Extracted %d attributeLinks from subflow.", len(extracted_attribute_links))
     return extracted_attribute_links
 
 
@@ -306,7 +467,7 @@ def create_dynamic_attribute_link(feature, subflow_file_path, subflow_node_id):
     """
     xmi_id = feature.attrib.get('{http://www.omg.org/XMI}id')
     if not xmi_id:
-        print("Cannot create attributeLink for eStructuralFeature without xmi:id.")
+        logger.warning("Cannot create attributeLink for eStructuralFeature without xmi:id.")
         return None
 
     # Create the root element for attributeLink
@@ -320,14 +481,31 @@ def create_dynamic_attribute_link(feature, subflow_file_path, subflow_node_id):
         "href": f"{subflow_file_path}#{xmi_id}"
     })
 
-    print(f"Created dynamic attributeLink for eStructuralFeature ID: {xmi_id}")
+    logger.debug("Created dynamic attributeLink for eStructuralFeature ID: %s", xmi_id)
     return attribute_link
 # Method to increment name and ID attributes of a feature
-def increment_name_and_id(feature, property_descriptor_data, attribute_links_data):
+def index_related_elements(property_descriptor_data, attribute_links_data):
+    """
+    Maps the xmi:id of each eStructuralFeature to ([propertyDescriptors], [attributeLinks]) that
+    describe and promote it, so that a rename updates them without scanning all the others.
+    """
+    related_elements = {}
+    for prop_desc in property_descriptor_data:
+        described_attribute = prop_desc.attrib.get('describedAttribute')
+        related_elements.setdefault(described_attribute, ([], []))[0].append(prop_desc)
+    for attr_link in attribute_links_data:
+        promoted_attribute = attr_link.attrib.get('promotedAttribute')
+        related_elements.setdefault(promoted_attribute, ([], []))[1].append(attr_link)
+    return related_elements
+
+
+def increment_name_and_id(feature, related_elements, context):
     """
     Increments the name and ID of eStructuralFeatures and updates corresponding
-    propertyDescriptor and attributeLink entries if the count is greater than 0.
+    propertyDescriptor and attributeLink entries (see index_related_elements)
+    if the count is greater than 0.
     """
+    name_increment_tracker = context.name_increment_tracker
     name = feature.attrib.get('name')
     xmi_id = feature.attrib.get('{http://www.omg.org/XMI}id')
 
@@ -358,36 +536,35 @@ def increment_name_and_id(feature, property_descriptor_data, attribute_links_dat
 
 
             # Update related propertyDescriptor and attributeLink elements using this count
-        update_related_elements(xmi_id, current_count, property_descriptor_data, attribute_links_data, modified_id)
+        property_descriptors, attribute_links = related_elements.get(xmi_id, ((), ()))
+        update_related_elements(xmi_id, current_count, property_descriptors, attribute_links, modified_id)
 
 
-def update_related_elements(original_id, count, property_descriptor_data, attribute_links_data, modified_id):
+def update_related_elements(original_id, count, property_descriptors, attribute_links, modified_id):
     """
-    Updates propertyDescriptor and attributeLink elements with the incremented count.
+    Updates the propertyDescriptor and attributeLink elements of a feature with the incremented count.
+    The elements are those indexed under the feature's original_id (see index_related_elements); IDs
+    renamed earlier can match the original_id of a later feature, so they are not looked up by ID here.
     """
     # Update propertyDescriptor entries
-    for prop_desc in property_descriptor_data:
-        described_attribute = prop_desc.attrib.get('describedAttribute')
-        if described_attribute == original_id:
-            # Increment describedAttribute and related propertyName key
-            prop_desc.attrib['describedAttribute'] = f"{modified_id}"
-            for property_name in prop_desc.findall('propertyName'):
-                key = property_name.attrib.get('key')
-                if key:
-                    property_name.attrib['key'] = f"{modified_id}"
-            print(f"Updated propertyDescriptor for describedAttribute: {prop_desc.attrib['describedAttribute']}")
+    for prop_desc in property_descriptors:
+        # Increment describedAttribute and related propertyName key
+        prop_desc.attrib['describedAttribute'] = f"{modified_id}"
+        for property_name in prop_desc.findall('propertyName'):
+            key = property_name.attrib.get('key')
+            if key:
+                property_name.attrib['key'] = f"{modified_id}"
+        logger.debug("Updated propertyDescriptor for describedAttribute: %s", modified_id)
 
     # Update attributeLink entries
-    for attr_link in attribute_links_data:
-        promoted_attribute = attr_link.attrib.get('promotedAttribute')
-        if promoted_attribute == original_id:
-            # Increment promotedAttribute
-            attr_link.attrib['promotedAttribute'] = f"{modified_id}"
-            for overridden_attribute in attr_link.findall('overriddenAttribute'):
-                href = overridden_attribute.get('href')
-                href_first_part = href.split('#')[0]
-                overridden_attribute.attrib['href'] = f"{href_first_part}#{original_id}"
-            print(f"Updated attributeLink for promotedAttribute: {attr_link.attrib['promotedAttribute']}")
+    for attr_link in attribute_links:
+        # Increment promotedAttribute
+        attr_link.attrib['promotedAttribute'] = f"{modified_id}"
+        for overridden_attribute in attr_link.findall('overriddenAttribute'):
+            href = overridden_attribute.get('href')
+            href_first_part = href.split('#')[0]
+            overridden_attribute.attrib['href'] = f"{href_first_part}#{original_id}"
+        logger.debug("Updated attributeLink for promotedAttribute: %s", modified_id)
 
 # Method to increment attributes in property descriptors to ensure uniqueness
 
@@ -402,23 +579,35 @@ def update_ecore_package_content(msgflow_content, json_filepath='replacement_map
     :return: The updated msgflow content as a string.
     """
     try:
-        # Load the replacement mapping from the JSON file
-        with open(json_filepath, 'r') as f:
-            replacement_data = json.load(f)
-
-        # Iterate through the replacement configurations and update msgflow content
-        for key, replacement_info in replacement_data.items():
-            # Iterate through each original and replacement namespace mapping
-            for original_namespace, replacement_namespace in replacement_info.items():
-                if original_namespace != "Name":  # Ignore the "Name" key
-                    # Replace in the <ecore:EPackage> string part of the msgflow_content
-                    msgflow_content = msgflow_content.replace(original_namespace, replacement_namespace)
+        # Replace in the <ecore:EPackage> string part of the msgflow_content
+        return config_registry.replacement_mapping(json_filepath).replace(msgflow_content)
 
+    except Exception as e:
+        logger.error("Error updating <ecore:EPackage> content: %s", e)
         return msgflow_content
 
+
+def update_tree_namespaces(root, json_filepath='replacement_mapping.json'):
+    """
+    Applies the namespace replacements of update_ecore_package_content to the attribute values,
+    text and tails of every element of a msgflow tree, as if the serialized document had been
+    updated (see tests/data/SubflowPrefixes.*). Element and attribute names are not rewritten:
+    their prefixes are written from the registered namespaces (update_namespaces_with_replacements),
+    and the <ecore:EPackage> start tag is replaced separately by create_new_msgflow.
+    """
+    try:
+        replace = config_registry.replacement_mapping(json_filepath).replace
+        for elem in root.iter():
+            for name, value in elem.attrib.items():
+                new_value = replace(value)
+                if new_value is not value:
+                    elem.attrib[name] = new_value
+            if elem.text:
+                elem.text = replace(elem.text)
+            if elem.tail:
+                elem.tail = replace(elem.tail)
     except Exception as e:
-        print(f"Error updating <ecore:EPackage> content: {e}")
-        return msgflow_content
+        logger.error("Error updating namespaces in msgflow: %s", e)
 
 def update_namespaces_with_replacements(namespaces):
     """
@@ -429,162 +618,200 @@ def update_namespaces_with_replacements(namespaces):
     :return: The updated namespaces dictionary.
     """
     try:
-        # Load the replacement mapping from the JSON file
-        with open('replacement_mapping.json', 'r') as f:
-            replacement_data = json.load(f)
-
-        # Iterate through the replacement configurations
-        for key, replacement_info in replacement_data.items():
+        # Iterate through the replacement configurations (see config_registry)
+        for original_namespace, replacement_namespace in config_registry.replacement_mapping().namespaces:
             # Replace namespace prefixes
-            for original_namespace, replacement_namespace in replacement_info.items():
-                if original_namespace in namespaces:
-                    # Replace the prefix key in the namespaces dictionary
-                    namespaces[replacement_namespace] = namespaces.pop(original_namespace)
-                    print(f"Replaced namespace prefix '{original_namespace}' with '{replacement_namespace}'")
-                else:
-                    # Check and replace the values (URIs) in the namespaces dictionary
-                    for prefix, uri in namespaces.items():
-                        if uri == original_namespace:
-                            namespaces[prefix] = replacement_namespace
-                            print(f"Replaced namespace URI '{original_namespace}' with '{replacement_namespace}'")
-                            break
+            if original_namespace in namespaces:
+                # Replace the prefix key in the namespaces dictionary
+                namespaces[replacement_namespace] = namespaces.pop(original_namespace)
+                logger.debug("Replaced namespace prefix '%s' with '%s'", original_namespace, replacement_namespace)
+            else:
+                # Check and replace the values (URIs) in the namespaces dictionary
+                for prefix, uri in namespaces.items():
+                    if uri == original_namespace:
+                        namespaces[prefix] = replacement_namespace
+                        logger.debug("Replaced namespace URI '%s' with '%s'", original_namespace, replacement_namespace)
+                        break
 
         return namespaces
     except Exception as e:
-        print(f"Error updating namespaces with replacements: {e}")
+        logger.error("Error updating namespaces with replacements: %s", e)
         return namespaces
 
 # Main method to create new msgflow with the updated logic
 def create_new_msgflow(original_file_path, eStructuralFeatures_data, property_descriptor_data, attribute_links_data,
-                       msgflow_content, unmodified_content):
+                       new_msgflow, epackage_attributes):
     """
-    Creates a new msgflow file based on the original content and the accumulated eStructuralFeatures,
-    propertyDescriptors, and attributeLinks data.
+    Creates a new msgflow file from the msgflow tree and the accumulated eStructuralFeatures,
+    propertyDescriptors, and attributeLinks data. The tree is updated in place and streamed
+    to the new file; its namespaces must already be registered (see read_msgflow_file).
     """
-    print(f"Creating new msgflow based on {original_file_path}")
-
-    # Parse the modified msgflow content into an XML tree
-    new_msgflow = ET.fromstring(msgflow_content)
-
-    # Extract and update namespaces as needed
-    namespaces = extract_namespaces(msgflow_content)
-    namespaces = update_namespaces_with_replacements(namespaces)
-    for prefix, uri in namespaces.items():
-        ET.register_namespace(prefix, uri)
+    logger.debug("Creating new msgflow based on %s", original_file_path)
+    debug = logger.isEnabledFor(logging.DEBUG)
 
     # Find all eClassifiers in the msgflow
     classifiers = new_msgflow.findall(".//eClassifiers")
 
     for classifier in classifiers:
+        # The insertion points are computed once, on the current children, and the new elements
+        # are spliced in with one rebuild of the child list (see splice_children)
+        children = list(classifier)
+        insertions = []
+        property_organizer = classifier.find(".//propertyOrganizer")
+        last_feature_index = eSuperTypes_index = property_organizer_index = None
+        for index, child in enumerate(children):
+            if child.tag == "eStructuralFeatures":
+                last_feature_index = index
+            elif child.tag == "eSuperTypes" and eSuperTypes_index is None:
+                eSuperTypes_index = index
+            if child is property_organizer:
+                property_organizer_index = index
+
         # Directly insert the eStructuralFeatures data
-        existing_features = classifier.findall("eStructuralFeatures")
-        if existing_features:
+        if last_feature_index is not None:
             # Insert after the last existing feature
-            last_feature = existing_features[-1]
-            last_index = list(classifier).index(last_feature)
-            print(f"Inserting {len(eStructuralFeatures_data)} eStructuralFeatures after index {last_index}")
+            logger.debug("Inserting %d eStructuralFeatures after index %d", len(eStructuralFeatures_data), last_feature_index)
+            insertions.append((last_feature_index + 1, eStructuralFeatures_data))
+        elif eSuperTypes_index is not None:
+            # If no existing eStructuralFeatures, insert after eSuperTypes
+            logger.debug("Inserting eStructuralFeatures after eSuperTypes at index %d", eSuperTypes_index)
+            insertions.append((eSuperTypes_index + 1, eStructuralFeatures_data))
+        else:
+            # Append at the end if no eSuperTypes found
+            logger.debug("No eSuperTypes found, appending eStructuralFeatures at the end.")
+            insertions.append((len(children), eStructuralFeatures_data))
+        if debug:
             for feature in eStructuralFeatures_data:
                 # No need to increment as it's already processed
-                classifier.insert(last_index + 1, feature)
-                last_index += 1
-                print(f"Inserted eStructuralFeature with xmi:id: {feature.attrib.get('xmi:id')}")
-        else:
-            # If no existing eStructuralFeatures, insert after eSuperTypes or at the end
-            eSuperTypes_elem = classifier.find("eSuperTypes")
-            if eSuperTypes_elem is not None:
-                index = list(classifier).index(eSuperTypes_elem)
-                print(f"Inserting eStructuralFeatures after eSuperTypes at index {index}")
-                for feature in eStructuralFeatures_data:
-                    classifier.insert(index + 1, feature)
-                    index += 1
-                    print(f"Inserted eStructuralFeature with xmi:id: {feature.attrib.get('xmi:id')}")
-            else:
-                # Append at the end if no eSuperTypes found
-                print("No eSuperTypes found, appending eStructuralFeatures at the end.")
-                for feature in eStructuralFeatures_data:
-                    classifier.append(feature)
-                    print(f"Appended eStructuralFeature with xmi:id: {feature.attrib.get('xmi:id')}")
+                logger.debug("Inserted eStructuralFeature with xmi:id: %s", feature.attrib.get('{http://www.omg.org/XMI}id'))
 
-        # Handle propertyDescriptor insertion inside propertyOrganizer
-        property_organizer = classifier.find(".//propertyOrganizer")
+        # Insert attributeLink elements directly after propertyOrganizer
         if property_organizer is None:
-            property_organizer = ET.SubElement(classifier, "propertyOrganizer")
-            print("Created new propertyOrganizer element.")
+            # A new propertyOrganizer goes at the end, after features appended there
+            property_organizer = classifier.makeelement("propertyOrganizer", {})
+            logger.debug("Created new propertyOrganizer element.")
+            insertions.append((len(children), [property_organizer, *attribute_links_data]))
+        elif property_organizer_index is None:
+            raise ValueError("propertyOrganizer is not a child of its eClassifiers element")
+        else:
+            insertions.append((property_organizer_index + 1, attribute_links_data))
+        if debug:
+            for link in attribute_links_data:
+                logger.debug("Inserted attributeLink with promotedAttribute: %s", link.attrib.get('promotedAttribute'))
 
-        for property_desc in property_descriptor_data:
-            # Directly insert without incrementing
-            insert_propertyDescriptor(property_organizer, property_desc)
+        splice_children(classifier, insertions)
 
-        # Insert attributeLink elements directly after propertyOrganizer
-        insert_attribute_links_after_property_organizer(classifier, property_organizer, attribute_links_data)
+        # Handle propertyDescriptor insertion inside propertyOrganizer, directly without incrementing
+        insert_propertyDescriptors(property_organizer, property_descriptor_data)
 
     # Shift the X-axis position of nodes to avoid overlap (if required)
     shift_nodes_x_axis(new_msgflow, 200)
 
     # Save the new msgflow file
     new_file_path = original_file_path.replace(".msgflow", "_new.msgflow")
-    print(f"Saving new msgflow to: {new_file_path}")
+    logger.debug("Saving new msgflow to: %s", new_file_path)
 
     try:
-        # Convert the modified ElementTree to a string
-        xml_string = ET.tostring(new_msgflow, encoding='utf-8').decode('utf-8')
-
-        # Retain the original namespace declarations for <ecore:EPackage>
-        start_index = unmodified_content.find('<ecore:EPackage') + len('<ecore:EPackage')
-        end_index = unmodified_content.find('>', start_index)
-        original_namespace_declaration = unmodified_content[start_index:end_index + 1]
-
-        # Replace the <ecore:EPackage> tag with the original namespace declaration
-        start_tag_index = xml_string.find('<ecore:EPackage') + len('<ecore:EPackage')
-        end_tag_index = xml_string.find('>', start_tag_index)
-        new_string = xml_string[:start_tag_index] + original_namespace_declaration + xml_string[end_tag_index + 1:]
+        # Update <ecore:EPackage> and the namespace references in the tree with replacements
+        update_tree_namespaces(new_msgflow)
+        if epackage_attributes is not None:
+            # Retain the original namespace declarations for <ecore:EPackage>
+            epackage_attributes = update_ecore_package_content(epackage_attributes)
 
-        # Add the correct XML declaration at the start
-        xml_declaration = '<?xml version="1.0" encoding="UTF-8"?>\n'
-        final_content = xml_declaration + new_string
-
-        # Update <ecore:EPackage> with replacements before saving the file
-        updated_msgflow_content = update_ecore_package_content(final_content)
-
-        # Write the final content to the file
+        # Stream the tree to the file, with the correct XML declaration at the start
         with open(new_file_path, 'w', encoding='utf-8') as file:
-            file.write(updated_msgflow_content)
-        print(f"Successfully created new msgflow at: {new_file_path}")
+            file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            ET.ElementTree(new_msgflow).write(_StartTagSplicer(file, epackage_attributes), encoding='unicode')
+        logger.debug("Successfully created new msgflow at: %s", new_file_path)
+        return new_file_path
     except Exception as e:
-        print(f"Error writing new msgflow: {e}")
+        logger.error("Error writing new msgflow %s: %s", new_file_path, e)
+        return None
 
 
-def insert_attribute_links_after_property_organizer(classifier, property_organizer, attribute_links_data):
+class _StartTagSplicer:
     """
-    Inserts the attributeLinks elements directly after the propertyOrganizer element in the classifier.
-    Ensures that each attributeLink is formatted correctly.
+    Writes through to a text file, replacing the attributes ElementTree writes for the root
+    start tag (everything after the tag name up to '>') with the given original text.
     """
-    # Find the index of the propertyOrganizer
-    property_organizer_index = list(classifier).index(property_organizer)
 
-    # Insert each attributeLink element directly after the propertyOrganizer
-    for link in attribute_links_data:
-        property_organizer_index += 1
-        classifier.insert(property_organizer_index, link)
-        print(f"Inserted attributeLink with promotedAttribute: {link.attrib.get('promotedAttribute')}")
+    def __init__(self, file, start_tag_attributes):
+        self.file = file
+        self.start_tag_attributes = start_tag_attributes
+        self.state = 'tag' if start_tag_attributes is not None else 'body'
+
+    def write(self, data):
+        if self.state == 'tag':
+            # ElementTree writes '<' + tag first, then each attribute and '>' separately
+            self.state = 'attributes'
+        elif self.state == 'attributes':
+            end_index = data.find('>')
+            if end_index < 0:
+                return len(data)
+            data = self.start_tag_attributes + data[end_index + 1:]
+            self.state = 'body'
+        return self.file.write(data)
+
+
+def splice_children(parent, insertions):
+    """
+    Inserts elements into parent in one pass. insertions is a list of (index, elements); each
+    inserts its elements before the child at index of the current children (len(parent) appends),
+    and insertions at the same index keep their order. The child list is rebuilt once instead of
+    being shifted by every single insert().
+    """
+    children = list(parent)
+    spliced = []
+    position = 0
+    for index, elements in sorted(insertions, key=lambda insertion: insertion[0]):
+        spliced.extend(children[position:index])
+        spliced.extend(elements)
+        position = index
+    spliced.extend(children[position:])
+    parent[:] = spliced
+
+
+def insert_propertyDescriptors(property_organizer, property_descriptors):
+    """
+    Appends the property descriptors to the end of the propertyDescriptor chain in the
+    propertyOrganizer element, each one nested in the one before. The end of the chain is
+    found once and then kept as a tail pointer, instead of walking the chain per descriptor.
+    """
+    debug = logger.isEnabledFor(logging.DEBUG)
+    tail = property_descriptor_chain_tail(property_organizer)
+    for new_property_desc in property_descriptors:
+        tail.append(new_property_desc)
+        if debug:
+            logger.debug("Inserted propertyDescriptor with describedAttribute: %s",
+                         new_property_desc.attrib.get('describedAttribute'))
+        tail = property_descriptor_chain_tail(new_property_desc)
 
 
 def insert_propertyDescriptor(property_organizer, new_property_desc):
     """
-    Inserts the new_property_desc into the propertyOrganizer element.
+    Inserts the new_property_desc into the propertyOrganizer element (see insert_propertyDescriptors).
     """
-    current = property_organizer
+    insert_propertyDescriptors(property_organizer, [new_property_desc])
+
+
+def property_descriptor_chain_tail(element):
+    """
+    Returns the last propertyDescriptor of the chain nested below element, following the last
+    propertyDescriptor child at every level, or element itself if it has none.
+    """
+    current = element
     while True:
-        last_pd = current.findall("propertyDescriptor")
-        if not last_pd:
-            break
-        last_pd = last_pd[-1]
+        last_pd = None
+        for child in current:
+            if child.tag == "propertyDescriptor":
+                last_pd = child
+        if last_pd is None:
+            return current
         current = last_pd
-    current.append(new_property_desc)
-    print(f"Inserted propertyDescriptor with describedAttribute: {new_property_desc.attrib.get('describedAttribute')}")
 
 
 def shift_nodes_x_axis(root, shift_value):
+    debug = logger.isEnabledFor(logging.DEBUG)
     try:
         for node in root.findall(".//composition/nodes"):
             location = node.attrib.get('location', '')
@@ -592,35 +819,15 @@ def shift_nodes_x_axis(root, shift_value):
                 x, y = map(int, location.split(','))
                 new_location = f"{x + shift_value},{y}"
                 node.set('location', new_location)
-                print(f"Updated node '{node.attrib.get('xmi:id')}' location to: {new_location}")
+                if debug:
+                    logger.debug("Updated node '%s' location to: %s", node.attrib.get('{http://www.omg.org/XMI}id'), new_location)
     except Exception as e:
-        print(f"Error shifting node locations: {e}")
-
-
-def insert_propertyDescriptor(property_organizer, new_property_desc):
-    current = property_organizer
-    while True:
-        last_pd = current.findall("propertyDescriptor")
-        if not last_pd:
-            break
-        last_pd = last_pd[-1]
-        current = last_pd
-    current.append(new_property_desc)
-    print(f"Inserted propertyDescriptor with describedAttribute: {new_property_desc.attrib.get('describedAttribute')}")
-from xml.dom import minidom
+        logger.error("Error shifting node locations: %s", e)
 
-def format_attribute_links(attribute_links):
-    """
-    Applies pretty-printing to the list of attributeLink elements.
-    Returns a list of formatted attributeLink strings.
-    """
-    formatted_links = []
-    for link in attribute_links:
-        rough_string = ET.tostring(link, encoding='utf-8').decode('utf-8')
-        reparsed = minidom.parseString(rough_string)
-        formatted_links.append(reparsed.toprettyxml())
-    return formatted_links
 
-# Specify your directory path for .msgflow files
-directory_path = '/Users/viniththomas/IBM/ACET12/workspace/LOGGING'
-find_and_read_msgflow_files(directory_path)
\ No newline at end of file
+if __name__ == '__main__':
+    # Specify your directory path for .msgflow files
+    directory_path = '/Users/viniththomas/IBM/ACET12/workspace/LOGGING'
+    # One summary record per file; e.g. module_levels={'msgflow_manipulation': logging.DEBUG} shows every element
+    configure_logging(logging.INFO)
+    find_and_read_msgflow_files(directory_path)
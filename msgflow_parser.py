@@ -0,0 +1,125 @@
+"""Streaming .msgflow parser.
+
+iter_msgflow() feeds a flow to expat in chunks and collects nodes, subflow references,
+compute expressions and user-defined properties from its element callbacks in one pass.
+No tree is built, so memory stays flat however large the flow is. Flows that are not well-formed XML are handed to
+iter_msgflow_regex(), the regex scans MsgFlowProcessor used before.
+"""
+import logging
+import re
+from xml.parsers import expat
+from collections import namedtuple
+
+MsgFlowNode = namedtuple("MsgFlowNode", ["name", "is_subflow", "expression"])
+MsgFlowExpression = namedtuple("MsgFlowExpression", ["code_type", "module_name", "function_name", "datasource"])
+MsgFlowProperty = namedtuple("MsgFlowProperty", ["name", "value"])
+
+CHUNK_SIZE = 64 * 1024
+
+NODE_PATTERN = re.compile(r'<Node .*?name="([^"]+)".*?>(.*?)</Node>', re.DOTALL)
+EXPRESSION_PATTERN = re.compile(
+    r'<Compute.*?codeType="([^"]+)"'
+    r'.*?moduleName="([^"]+)"'
+    r'.*?functionName="([^"]+)"'
+    r'(?:.*?dataSource="([^"]+)")?',
+    re.DOTALL
+)
+PROPERTIES_PATTERN = re.compile(r'<UserDefinedProperty .*?name="([^"]+)" value="([^"]+)"', re.DOTALL)
+
+
+def parse_msgflow(content, streaming=True):
+    """Returns (nodes, properties) of a flow, streaming it when possible and falling back to the regex scans."""
+    items = None
+    if streaming:
+        try:
+            items = list(iter_msgflow(content))
+        except expat.ExpatError as e:
+            logging.warning(f"Flow is not well-formed XML ({e}), falling back to the regex parser")
+    if items is None:
+        items = list(iter_msgflow_regex(content))
+    nodes = [item for item in items if isinstance(item, MsgFlowNode)]
+    properties = [item for item in items if isinstance(item, MsgFlowProperty)]
+    return nodes, properties
+
+
+def iter_msgflow(source, chunk_size=CHUNK_SIZE):
+    """Yields a MsgFlowNode when a node closes and a MsgFlowProperty per user-defined property, in document order.
+
+    source is the flow text (str or bytes) or a binary or text file object. Tags are matched
+    by local name, so namespace prefixes do not matter. Raises xml.parsers.expat.ExpatError
+    on malformed XML, possibly after some items have been yielded.
+    """
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    items = []  # Filled by the handlers, emptied after every chunk
+    open_nodes = []  # [name, is_subflow, expression] of the open Node elements
+
+    def start_element(tag, attributes):
+        if ":" in tag:
+            tag = tag.rsplit(":", 1)[1]
+        if tag[0] not in "CNSU":
+            return  # Most elements are layout and properties: leave them as early as possible
+        if tag == "Node":
+            open_nodes.append([attributes.get("name"), False, None])
+        elif tag.startswith("Subflow"):
+            if open_nodes:
+                open_nodes[-1][1] = True
+        elif tag.startswith("Compute"):
+            if open_nodes and open_nodes[-1][2] is None:
+                open_nodes[-1][2] = _expression(attributes)
+        elif tag == "UserDefinedProperty":
+            name, value = attributes.get("name"), attributes.get("value")
+            if name and value:
+                items.append(MsgFlowProperty(name, value))
+
+    def end_element(tag):
+        if tag == "Node" or tag.endswith(":Node"):
+            name, is_subflow, expression = open_nodes.pop()
+            if name:
+                items.append(MsgFlowNode(name, is_subflow, None if is_subflow else expression))
+
+    # No tree is built: the handlers keep only the open nodes, so memory does not grow with the flow
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    for chunk in _chunks(source, chunk_size):
+        parser.Parse(chunk, False)
+        yield from items
+        items.clear()
+    parser.Parse(b"", True)
+    yield from items
+
+
+def _expression(attributes):
+    code_type = attributes.get("codeType")
+    module_name = attributes.get("moduleName")
+    function_name = attributes.get("functionName")
+    if not (code_type and module_name and function_name):
+        return None
+    return MsgFlowExpression(code_type, module_name, function_name, attributes.get("dataSource") or None)
+
+
+def iter_msgflow_regex(content):
+    """The regex scans of the original MsgFlowProcessor, yielding what iter_msgflow yields (nodes first)."""
+    for match in NODE_PATTERN.finditer(content):
+        node_content = match.group(2)
+        is_subflow = '<Subflow' in node_content
+        expression = None
+        if not is_subflow:
+            expression_match = EXPRESSION_PATTERN.search(node_content)
+            if expression_match:
+                expression = MsgFlowExpression(*expression_match.groups())
+        yield MsgFlowNode(match.group(1), is_subflow, expression)
+    for match in PROPERTIES_PATTERN.finditer(content):
+        yield MsgFlowProperty(match.group(1), match.group(2))
+
+
+def _chunks(source, chunk_size):
+    if isinstance(source, (str, bytes)):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size]
+        return
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
@@ -1,109 +1,87 @@
-import re
-import threading
 import logging
+from db_writer import BulkRowBuffer, submit_db_operation, wait_for_db_operations
+from msgflow_parser import parse_msgflow
 
 class MsgFlowProcessor:
-    """Parses .msgflow files to extract nodes, subflows, expressions, and user-defined properties."""
+    """Parses .msgflow files to extract nodes, subflows, expressions, and user-defined properties.
 
-    def __init__(self, db_queue, db_manager):
+    Flows are read with the streaming parser of msgflow_parser, which falls back to the regex
+    scans for flows that are not well-formed XML; parser="regex" uses the regex scans only.
+    """
+
+    def __init__(self, db_queue, db_manager, bulk_batch_size=5000, parser="stream"):
+        if parser not in ("stream", "regex"):
+            raise ValueError(f"Unknown msgflow parser {parser!r}. Use 'stream' or 'regex'.")
         self.db_queue = db_queue
         self.db_manager = db_manager
+        self.parser = parser
+        # User-defined properties are leaf rows and are written in bulk
+        self.leaf_rows = BulkRowBuffer(db_queue, db_manager, bulk_batch_size)
+
+    def process_file(self, file_content, file_name, project_id, manifest_entry=None):
+        """Process the .msgflow file content with an existing project ID.
+
+        With a manifest_entry (see FileManifest) the rows previously derived from the flow are
+        deleted first, and the entry is recorded by flush() once the buffered user-defined
+        properties of the flow have been written as well.
+        """
+        nodes, properties = parse_msgflow(file_content, streaming=self.parser == "stream")
+
+        pending = []
+        if manifest_entry is not None:
+            pending.append(submit_db_operation(self.db_queue, self.db_manager.delete_msgflow_rows, file_name, project_id))
 
-    def process_file(self, file_content, file_name, project_id):
-        """Process the .msgflow file content with an existing project ID."""
         # Insert the msgflow using the given project_id
-        msgflow_id = self._queue_insert_msgflow(file_name, project_id)
+        msgflow_id = self._queue_insert_msgflow(file_name, project_id).result()
         
         # Process nodes within the msgflow
-        self._process_nodes(file_content, msgflow_id)
+        self._process_nodes(nodes, msgflow_id, project_id, pending)
 
         # Process user-defined properties
-        self._process_user_defined_properties(file_content, msgflow_id)
+        self._process_user_defined_properties(properties, msgflow_id)
 
-    def _process_nodes(self, content, msgflow_id):
-        """Identify and process each node in the .msgflow."""
-        node_pattern = re.compile(r'<Node .*?name="([^"]+)".*?>(.*?)</Node>', re.DOTALL)
-        
-        for match in node_pattern.finditer(content):
-            node_name = match.group(1)
-            node_content = match.group(2)
-            
-            is_subflow = '<Subflow' in node_content
-            subflow_id = self._queue_insert_subflow(node_name) if is_subflow else None
-            node_id = self._queue_insert_node(node_name, msgflow_id, subflow_id)
-
-            # If the node is not a subflow, check for compute expressions
-            if not is_subflow:
-                self._process_compute_expressions(node_content, node_id)
-
-    def _process_compute_expressions(self, node_content, node_id):
-        """Extract compute expressions (code type, module, function, and datasource) within a node."""
-        expression_pattern = re.compile(
-            r'<Compute.*?codeType="([^"]+)"'
-            r'.*?moduleName="([^"]+)"'
-            r'.*?functionName="([^"]+)"'
-            r'(?:.*?dataSource="([^"]+)")?',
-            re.DOTALL
+        # Surface any failed insert to the caller
+        wait_for_db_operations(pending)
+
+        if manifest_entry is not None:
+            # User-defined properties are still buffered; a crash before they are written must
+            # leave the flow unrecorded, so that the next incremental run processes it again
+            self.leaf_rows.add_after(self.db_manager.record_file, *manifest_entry)
+
+    def flush(self):
+        """Writes the buffered leaf rows, then the flows' manifest entries; call once all files have been processed."""
+        self.leaf_rows.flush()
+
+    def _process_nodes(self, nodes, msgflow_id, project_id, pending):
+        """Queue one writer operation per node of the .msgflow; the caller waits for them all at once."""
+        for node in nodes:
+            pending.append(submit_db_operation(self.db_queue, self._write_node, node, msgflow_id, project_id))
+
+    def _write_node(self, conn, node, msgflow_id, project_id):
+        """Runs on the writer thread: stores a node with its subflow or its compute expression.
+
+        The module and function of a compute expression are found by name among the project's
+        ESQL modules (see DatabaseManager.insert_module_reference), as the flow does not name
+        their file. Doing it all in one operation spares the parse thread a writer round trip
+        for every ID.
+        """
+        subflow_id = self.db_manager.insert_subflow(conn, node.name) if node.is_subflow else None
+        node_id = self.db_manager.insert_node(conn, node.name, msgflow_id, subflow_id)
+        expression = node.expression
+        # Subflow nodes carry no compute expression
+        if expression is None:
+            return node_id
+        module_id = self.db_manager.insert_module_reference(conn, expression.module_name, project_id)
+        function_id = self.db_manager.insert_function_reference(conn, expression.function_name, module_id)
+        return self.db_manager.insert_expression(
+            conn, node_id, module_id, function_id, expression.code_type, expression.datasource
         )
-        
-        match = expression_pattern.search(node_content)
-        if match:
-            code_type = match.group(1)
-            module_name = match.group(2)
-            function_name = match.group(3)
-            datasource = match.group(4)
-            
-            module_id = self._queue_insert_module(module_name)
-            function_id = self._queue_insert_function(function_name, module_id)
-            self._queue_insert_expression(node_id, module_id, function_id, code_type, datasource)
-
-    def _process_user_defined_properties(self, content, msgflow_id):
-        """Extract and store user-defined properties in the .msgflow."""
-        properties_pattern = re.compile(r'<UserDefinedProperty .*?name="([^"]+)" value="([^"]+)"', re.DOTALL)
-        
-        for match in properties_pattern.finditer(content):
-            property_name = match.group(1)
-            property_value = match.group(2)
-            self._queue_insert_user_defined_property(msgflow_id, property_name, property_value)
+
+    def _process_user_defined_properties(self, properties, msgflow_id):
+        """Store the user-defined properties of the .msgflow."""
+        for prop in properties:
+            self.leaf_rows.add("UserDefinedProperties", (msgflow_id, prop.name, prop.value))
 
     # Queue methods to insert data using the db_queue
     def _queue_insert_msgflow(self, msgflow_name, project_id):
-        callback_event = threading.Event()
-        result_container = {}
-        self.db_queue.put((self.db_manager.insert_msgflow, (msgflow_name, project_id), callback_event, result_container))
-        callback_event.wait()
-        return result_container["result"]
-
-    def _queue_insert_node(self, node_name, msgflow_id, subflow_id=None):
-        callback_event = threading.Event()
-        result_container = {}
-        self.db_queue.put((self.db_manager.insert_node, (node_name, msgflow_id, subflow_id), callback_event, result_container))
-        callback_event.wait()
-        return result_container["result"]
-
-    def _queue_insert_subflow(self, subflow_name):
-        callback_event = threading.Event()
-        result_container = {}
-        self.db_queue.put((self.db_manager.insert_subflow, (subflow_name,), callback_event, result_container))
-        callback_event.wait()
-        return result_container["result"]
-
-    def _queue_insert_expression(self, node_id, module_id, function_id, code_type, datasource):
-        self.db_queue.put((self.db_manager.insert_expression, (node_id, module_id, function_id, code_type, datasource), None, {}))
-
-    def _queue_insert_module(self, module_name):
-        callback_event = threading.Event()
-        result_container = {}
-        self.db_queue.put((self.db_manager.insert_module, (module_name,), callback_event, result_container))
-        callback_event.wait()
-        return result_container["result"]
-
-    def _queue_insert_function(self, function_name, module_id):
-        callback_event = threading.Event()
-        result_container = {}
-        self.db_queue.put((self.db_manager.insert_function, (function_name, module_id), callback_event, result_container))
-        callback_event.wait()
-        return result_container["result"]
-
-    def _queue_insert_user_defined_property(self, msgflow_id, property_name, property_value):
-        self.db_queue.put((self.db_manager.insert_user_defined_property, (msgflow_id, property_name, property_value), None, {}))
\ No newline at end of file
+        return submit_db_operation(self.db_queue, self.db_manager.insert_msgflow, msgflow_name, project_id)
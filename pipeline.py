@@ -0,0 +1,141 @@
+import logging
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+class Stage:
+    """One step of a Pipeline: func(item) returns an iterable of zero or more items for the next stage."""
+
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.input = None
+        self._lock = threading.Lock()
+        self._running = 0
+
+    def stats(self, elapsed):
+        return {
+            "workers": self.workers,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "errors": self.errors,
+            "items_per_second": self.items_in / elapsed if elapsed else 0.0,
+            # Share of the run the stage's workers spent working rather than waiting for input or output
+            "utilisation": self.busy_seconds / (elapsed * self.workers) if elapsed else 0.0,
+            "queued": self.input.qsize() if self.input is not None else 0,
+        }
+
+
+class Pipeline:
+    """Runs items through a chain of stages, each with its own worker threads.
+
+    Stages are connected by bounded queues of queue_size items: a stage that falls behind
+    blocks the stages before it instead of letting items pile up in memory. A failing item
+    is logged and counted and does not stop the run. Per-stage counters (items in and out,
+    throughput, utilisation, queue depth) are logged every log_interval seconds and at the
+    end; the stage with the highest utilisation and a full input queue is the bottleneck.
+    """
+
+    def __init__(self, queue_size=100, log_interval=30):
+        self.queue_size = queue_size
+        self.log_interval = log_interval
+        self.stages = []
+        self._started = None
+
+    def add_stage(self, name, func, workers=1):
+        self.stages.append(Stage(name, func, workers))
+        return self
+
+    def run(self, items):
+        """Feeds items into the first stage and blocks until every stage has finished."""
+        for stage in self.stages:
+            stage.input = queue.Queue(maxsize=self.queue_size)
+            stage._running = stage.workers
+
+        threads = []
+        for index, stage in enumerate(self.stages):
+            following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            for number in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(stage, following), name=f"{stage.name}-{number}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        self._started = time.monotonic()
+        finished = threading.Event()
+        monitor = threading.Thread(target=self._monitor, args=(finished,), name="pipeline-monitor", daemon=True)
+        monitor.start()
+
+        first = self.stages[0]
+        try:
+            for item in items:
+                first.input.put(item)
+        finally:
+            for _ in range(first.workers):
+                first.input.put(_DONE)
+            for thread in threads:
+                thread.join()
+            finished.set()
+        self.log_stats()
+        return self.stats()
+
+    def stats(self):
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        return {stage.name: stage.stats(elapsed) for stage in self.stages}
+
+    def log_stats(self):
+        for name, stats in self.stats().items():
+            logging.info(
+                f"Stage {name}: {stats['items_in']} in, {stats['items_out']} out, {stats['errors']} errors, "
+                f"{stats['items_per_second']:.1f} items/s, {stats['utilisation']:.0%} busy "
+                f"({stats['workers']} workers), {stats['queued']} queued"
+            )
+
+    def _work(self, stage, following):
+        while True:
+            item = stage.input.get()
+            if item is _DONE:
+                break
+            started = time.perf_counter()
+            busy = 0.0  # Added to the stage's counters once per item, under its lock
+            produced = 0
+            try:
+                for result in stage.func(item) or ():
+                    if following is not None:
+                        # Time spent blocked on a full queue is not busy time
+                        busy += time.perf_counter() - started
+                        following.input.put(result)
+                        started = time.perf_counter()
+                    produced += 1
+            except Exception as e:
+                with stage._lock:
+                    stage.errors += 1
+                logging.error(f"Stage {stage.name} failed on {self._describe(item)}: {e}")
+            busy += time.perf_counter() - started
+            with stage._lock:
+                stage.busy_seconds += busy
+                stage.items_in += 1
+                stage.items_out += produced
+
+        with stage._lock:
+            stage._running -= 1
+            last = stage._running == 0
+        if last and following is not None:
+            for _ in range(following.workers):
+                following.input.put(_DONE)
+
+    def _monitor(self, finished):
+        while not finished.wait(self.log_interval):
+            self.log_stats()
+
+    @staticmethod
+    def _describe(item):
+        text = repr(item)
+        return text if len(text) <= 120 else text[:117] + "..."
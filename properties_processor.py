@@ -1,172 +1,243 @@
+import concurrent.futures
+import logging
+import os
 import re
-import threading
 from collections import defaultdict
+from db_writer import BulkRowBuffer, submit_db_operation, wait_for_db_operations
+
+# Property files are parsed line by line: key=value, split at the first "=".
+# The keys of replace.* lines are matched against these patterns.
+QUEUE_SUFFIXES = ("_EVT", "_ERR", "_CPY")
+DB_PROPERTY_KEY_PATTERN = re.compile(r"(?P<env>\w+)\.replace\.replacement\.17")
+DYNAMIC_PROPERTY_KEY_PATTERN = re.compile(r"(?P<env>\w+)?\.?replace\.replacement\.(?P<prop_num>\d+)")
+PROP_VALUE_KEY_PATTERN = re.compile(r"replace\.value\.(?P<num>\d+)")
+
+
+def parse_env_properties(content):
+    """Parses property file content into categorized properties.
+
+    The content is read in one pass over its lines that indexes the replace.replacement
+    values by property number; the replace.value properties are then classified with hash
+    lookups, so the cost is linear in the size of the file.
+    """
+
+    # Dictionary to store different categories of properties
+    properties = {
+        "integration_server": None,
+        "queues": set(),  # Store unique queue names ending with _EVT, _ERR, or _CPY
+        "database_names": defaultdict(dict),  # Store {property_name: {environment: value}}
+        "webservices": defaultdict(dict),  # Store web service URLs {property_name: {environment: value}}
+        "other_properties": defaultdict(dict)  # Store other properties not in recognized categories
+    }
+
+    queues = properties["queues"]
+    database_names = properties["database_names"]
+    webservices = properties["webservices"]
+    other_properties = properties["other_properties"]
+    db_property_name = "{RPL_DB00}"
+    replacements = defaultdict(list)  # prop_num -> [(env, value), ...] in file order
+    prop_values = []  # (num, property_name) of the replace.value lines, in file order
+
+    for line in content.split("\n"):
+        key, separator, value = line.partition("=")
+        if not separator or not value:
+            continue
+
+        # 1. Integration Server (prod.broker.eg), the first one counts
+        if key == "prod.broker.eg":
+            if properties["integration_server"] is None:
+                properties["integration_server"] = value.strip()
+
+        # 2. Queue Names (_EVT, _ERR, _CPY): at least one character before the suffix
+        if len(value) > 4 and value.endswith(QUEUE_SUFFIXES):
+            queues.add(value.strip())
+
+        if "replace." not in key:
+            continue
+
+        # 3. Specific Database Property ({RPL_DB00}) for `replace.replacement.17`
+        match = DB_PROPERTY_KEY_PATTERN.fullmatch(key) if key.endswith(".17") else None
+        if match:
+            database_names[db_property_name][match.group("env")] = value.strip()
+
+        # 4. Dynamic Properties: env-specific or common values, indexed by property number
+        match = DYNAMIC_PROPERTY_KEY_PATTERN.fullmatch(key)
+        if match:
+            env = match.group("env") or "common"  # Use "common" if no environment prefix
+            replacements[match.group("prop_num")].append((env, value.strip()))
+            continue
+
+        # replace.value.<num> names the property of each number
+        match = PROP_VALUE_KEY_PATTERN.fullmatch(key)
+        if match:
+            prop_values.append((match.group("num"), value.strip()))
+
+    # Classify the dynamic properties once the queues and the database property are known
+    for num, property_name in prop_values:
+        # Check if the property is a database or web service
+        if "RPL_DB" in property_name:
+            category = database_names
+        elif "RPL_" in property_name and "URL" in property_name:
+            category = webservices
+        else:
+            category = None
+
+        for env, value in replacements.get(num, ()):
+            if category is not None:
+                category[property_name][env] = value
+            elif value in queues or value in database_names or value in webservices:
+                # Skip if the value is already part of queues, database_names, or webservices
+                continue
+            else:
+                other_properties[property_name][env] = value
+
+    return properties
+
 
 class PropertiesProcessor:
     """Parses property files to extract configuration details for execution groups, queues, data sources, web service URLs, and integration servers."""
 
-    def __init__(self, db_queue, db_manager):
+    def __init__(self, db_queue, db_manager, bulk_batch_size=5000):
         self.db_queue = db_queue
         self.db_manager = db_manager
+        # Database, web service and other properties are leaf rows and are written in bulk
+        self.leaf_rows = BulkRowBuffer(db_queue, db_manager, bulk_batch_size)
 
     def process_file(self, file_content, pap_id, pf_id):
         """Processes a property file to extract and categorize configuration details."""
-        # Insert or get the property file ID
-        property_file_id = self._queue_insert_property_file(pap_id, pf_id, file_content)
+        pending = []
+
+        # Insert or get the property file ID; parsing overlaps with the insert
+        property_file_future = self._queue_insert_property_file(pap_id, pf_id, file_content)
 
         # Parse the properties from the file content
         parsed_properties = self._parse_env_properties(file_content)
+        property_file_id = property_file_future.result()
 
         # Insert integration server
         if parsed_properties["integration_server"]:
             integration_servers = [parsed_properties["integration_server"]]
-            self._process_integration_servers(pap_id, integration_servers)
+            self._process_integration_servers(pap_id, integration_servers, pending)
 
         # Insert queues
-        self._process_queues(property_file_id, parsed_properties["queues"])
+        self._process_queues(pap_id, parsed_properties["queues"], pf_id, pending)
+
+        self._add_property_rows(property_file_id, parsed_properties)
+
+        # Surface any failed insert to the caller
+        wait_for_db_operations(pending)
+
+    def process_files(self, files, workers=None, chunksize=8):
+        """Ingests many property files at once; files yields (file_name, file_content, pap_id, pf_id).
+
+        The files are parsed in a pool of workers processes (default: one per CPU; 0 parses
+        them in this process). Queue names, integration servers and property files are then
+        deduplicated across the whole set and resolved to IDs with one bulk write each, and
+        the PAP links and property rows are written in bulk batches. Nothing waits on a
+        single row. Call flush() afterwards, as for process_file.
+        """
+        files = list(files)
+        contents = (file_content for _, file_content, _, _ in files)
+        if workers == 0:
+            parsed = list(map(parse_env_properties, contents))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                parsed = list(executor.map(parse_env_properties, contents, chunksize=chunksize))
+
+        file_keys = [(pap_id, pf_id, file_name) for file_name, _, pap_id, pf_id in files]
+        queue_keys = {(queue_name, queue_name.split('_')[-1]) for properties in parsed for queue_name in properties["queues"]}
+        server_keys = {(properties["integration_server"],) for properties in parsed if properties["integration_server"]}
+
+        # Three round trips for the whole set instead of one per queue, server and file
+        file_ids, queue_ids, server_ids = (
+            future.result() for future in [
+                submit_db_operation(self.db_queue, self.db_manager.get_or_insert_many, "PropertyFiles", file_keys),
+                submit_db_operation(self.db_queue, self.db_manager.get_or_insert_many, "Queues", list(queue_keys)),
+                submit_db_operation(self.db_queue, self.db_manager.get_or_insert_many, "IntegrationServers", list(server_keys)),
+            ]
+        )
+
+        for file_key, properties in zip(file_keys, parsed):
+            pap_id, pf_id, _ = file_key
+            property_file_id = file_ids[file_key]
+            if properties["integration_server"]:
+                self.leaf_rows.add("PAP_IntegrationServers", (pap_id, server_ids[(properties["integration_server"],)]))
+            for queue_name in properties["queues"]:
+                queue_id = queue_ids[(queue_name, queue_name.split('_')[-1])]
+                self.leaf_rows.add("PAP_Queues", (pap_id, pf_id, queue_id))
+            self._add_property_rows(property_file_id, properties)
+
+        logging.info(
+            f"Parsed {len(files)} property files: {len(queue_keys)} distinct queues, "
+            f"{len(server_keys)} distinct integration servers"
+        )
+
+    def process_directory(self, directory, pap_id, pf_id, suffix=".properties", workers=None):
+        """Ingests every property file below a local directory for one PAP and PF (see process_files)."""
+        def files():
+            for root, _, names in os.walk(directory):
+                for name in sorted(names):
+                    if name.endswith(suffix):
+                        path = os.path.join(root, name)
+                        with open(path, encoding="utf-8", errors="replace") as f:
+                            yield path, f.read(), pap_id, pf_id
+
+        self.process_files(files(), workers=workers)
+
+    def flush(self):
+        """Writes the buffered leaf rows; call once all files have been processed."""
+        self.leaf_rows.flush()
 
+    def _parse_env_properties(self, content):
+        """Parses property file content into categorized properties (see parse_env_properties)."""
+        return parse_env_properties(content)
+
+    def _add_property_rows(self, property_file_id, parsed_properties):
+        """Buffers the database, web service and other property rows of a parsed file."""
         # Insert databases and web services for each environment
-        for env_name, env_properties in parsed_properties["database_names"].items():
-            for db_name, db_value in env_properties.items():
-                self._queue_insert_database(property_file_id, db_name, env_name, db_value)
+        # Both map {property_name: {environment: value}} (see parse_env_properties)
+        for db_name, env_values in parsed_properties["database_names"].items():
+            for env_name, db_value in env_values.items():
+                self.leaf_rows.add("DatabaseProperties", (property_file_id, db_name, env_name, db_value))
 
-        for env_name, ws_properties in parsed_properties["webservices"].items():
-            for ws_name, ws_url in ws_properties.items():
-                self._queue_insert_web_service(property_file_id, ws_name, env_name, ws_url)
+        for ws_name, env_urls in parsed_properties["webservices"].items():
+            for env_name, ws_url in env_urls.items():
+                self.leaf_rows.add("WebServices", (property_file_id, ws_name, env_name, ws_url))
 
         # Insert other properties
         for property_name, env_data in parsed_properties["other_properties"].items():
             for env_name, value in env_data.items():
-                self._queue_insert_other_property(property_file_id, property_name, env_name, value)
-
-    def _parse_env_properties(self, content):
-        """Parses property file content into categorized properties."""
-
-        # Dictionary to store different categories of properties
-        properties = {
-            "integration_server": None,
-            "queues": set(),  # Store unique queue names ending with _EVT, _ERR, or _CPY
-            "database_names": defaultdict(dict),  # Store {property_name: {environment: value}}
-            "webservices": defaultdict(dict),  # Store web service URLs {property_name: {environment: value}}
-            "other_properties": defaultdict(dict)  # Store other properties not in recognized categories
-        }
-
-        # Define regex patterns
-        integration_server_pattern = re.compile(r"^prod\.broker\.eg=(.+)$", re.MULTILINE)
-        queue_pattern = re.compile(r"=(.+?(_EVT|_ERR|_CPY))$", re.MULTILINE)
-        db_property_pattern = re.compile(r"^(?P<env>\w+)\.replace\.replacement\.17=(?P<value>.+)$", re.MULTILINE)
-        dynamic_property_pattern = re.compile(r"^(?P<env>\w+)?\.?replace\.replacement\.(?P<prop_num>\d+)=(?P<value>.+)$", re.MULTILINE)
-        prop_value_pattern = re.compile(r"^replace\.value\.(?P<num>\d+)=(?P<property_name>.+)$", re.MULTILINE)
-
-        # 1. Integration Server (prod.broker.eg)
-        match = integration_server_pattern.search(content)
-        if match:
-            properties["integration_server"] = match.group(1).strip()
-
-        # 2. Queue Names (_EVT, _ERR, _CPY)
-        for match in queue_pattern.finditer(content):
-            queue_name = match.group(1).strip()
-            properties["queues"].add(queue_name)
-
-        # 3. Specific Database Property ({RPL_DB00}) for `replace.replacement.17`
-        db_property_name = "{RPL_DB00}"
-        for match in db_property_pattern.finditer(content):
-            env = match.group("env")
-            properties["database_names"][db_property_name][env] = match.group("value").strip()
-
-        # 4. Dynamic Properties (replace.value.<num> for each property, environment-specific values)
-        for match in prop_value_pattern.finditer(content):
-            num = match.group("num")  # Number, like "23" in replace.value.23
-            property_name = match.group("property_name").strip()
-
-            # Find all env-specific or common values for this property
-            for env_match in dynamic_property_pattern.finditer(content):
-                env = env_match.group("env") or "common"  # Use "common" if no environment prefix
-                prop_num = env_match.group("prop_num")
-                value = env_match.group("value").strip()
-
-                # Only process if it matches the current property number
-                if prop_num == num:
-                    # Check if the property is a database, web service, or queue
-                    if "RPL_DB" in property_name:
-                        properties["database_names"][property_name][env] = value
-                    elif "RPL_" in property_name and "URL" in property_name:
-                        properties["webservices"][property_name][env] = value
-                    elif any(value in prop_set for prop_set in [properties["queues"], properties["database_names"], properties["webservices"]]):
-                        # Skip if the value is already part of queues, database_names, or webservices
-                        continue
-                    else:
-                        properties["other_properties"][property_name][env] = value
-
-        return properties
+                self.leaf_rows.add("OtherProperties", (property_file_id, property_name, env_name, value))
 
     # Insert methods for property file, queues, databases, and other properties
 
     def _queue_insert_property_file(self, pap_id, pf_id, file_name):
-        callback_event = threading.Event()
-        result_container = {}
-        self.db_queue.put((
-            self.db_manager.insert_property_file, 
-            (pap_id, pf_id, file_name), 
-            callback_event, 
-            result_container
-        ))
-        callback_event.wait()
-        return result_container["result"]
-
-    def _process_queues(self, property_file_id, queues, pf_id):
+        return submit_db_operation(self.db_queue, self.db_manager.insert_property_file, pap_id, pf_id, file_name)
+
+    def _process_queues(self, pap_id, queues, pf_id, pending):
         """Processes common queues and inserts them into the database."""
+        queue_futures = []
         for queue_name in queues:
             queue_type = queue_name.split('_')[-1]  # Assume queue type is the suffix like EVT, ERR, CPY
-            queue_id = self._queue_insert_queue(queue_name, queue_type)
-            self._queue_insert_pap_queue(property_file_id, pf_id, queue_id)
+            queue_futures.append(self._queue_insert_queue(queue_name, queue_type))
+        for queue_future in queue_futures:
+            pending.append(self._queue_insert_pap_queue(pap_id, pf_id, queue_future.result()))
 
-    def _queue_insert_pap_queue(self, property_file_id, pf_id, queue_id):
+    def _queue_insert_pap_queue(self, pap_id, pf_id, queue_id):
         """Links a PAP and PF with a queue."""
-        self.db_queue.put((self.db_manager.insert_pap_queue, (property_file_id, pf_id, queue_id), None, {}))
+        return submit_db_operation(self.db_queue, self.db_manager.insert_pap_queue, pap_id, pf_id, queue_id)
 
-    def _process_integration_servers(self, pap_id, integration_servers):
+    def _process_integration_servers(self, pap_id, integration_servers, pending):
         """Processes and inserts integration servers for a specific PAP."""
         for server_name in integration_servers:
-            server_id = self._queue_insert_integration_server(server_name)
-            self._queue_insert_pap_integration_server(pap_id, server_id)
+            server_id = self._queue_insert_integration_server(server_name).result()
+            pending.append(self._queue_insert_pap_integration_server(pap_id, server_id))
 
     def _queue_insert_queue(self, queue_name, queue_type):
-        callback_event = threading.Event()
-        result_container = {}
-        self.db_queue.put((self.db_manager.insert_queue, (queue_name, queue_type), callback_event, result_container))
-        callback_event.wait()
-        return result_container["result"]
-
-
-    def _queue_insert_database(self, property_file_id, db_name, environment, value):
-        callback_event = threading.Event()
-        result_container = {}
-        self.db_queue.put((self.db_manager.insert_database_property, (property_file_id, db_name, environment, value), callback_event, result_container))
-        callback_event.wait()
-        return result_container["result"]
-
-    def _queue_insert_web_service(self, property_file_id, ws_name, environment, url):
-        callback_event = threading.Event()
-        result_container = {}
-        self.db_queue.put((self.db_manager.insert_web_service, (property_file_id, ws_name, environment, url), callback_event, result_container))
-        callback_event.wait()
-        return result_container["result"]
+        return submit_db_operation(self.db_queue, self.db_manager.insert_queue, queue_name, queue_type)
 
     def _queue_insert_integration_server(self, server_name):
-        callback_event = threading.Event()
-        result_container = {}
-        self.db_queue.put((self.db_manager.insert_integration_server, (server_name,), callback_event, result_container))
-        callback_event.wait()
-        return result_container["result"]
+        return submit_db_operation(self.db_queue, self.db_manager.insert_integration_server, server_name)
 
     def _queue_insert_pap_integration_server(self, pap_id, server_id):
-        self.db_queue.put((self.db_manager.insert_pap_integration_server, (pap_id, server_id), None, {}))
-
-    def _queue_insert_other_property(self, property_file_id, property_name, environment, value):
-        """Inserts non-standard properties that do not fit into the predefined categories."""
-        callback_event = threading.Event()
-        result_container = {}
-        self.db_queue.put((self.db_manager.insert_other_property, (property_file_id, property_name, environment, value), callback_event, result_container))
-        callback_event.wait()
-        return result_container["result"]
+        return submit_db_operation(self.db_queue, self.db_manager.insert_pap_integration_server, pap_id, server_id)
@@ -1,12 +1,43 @@
+import base64
+import concurrent.futures
 import logging
+import tarfile
 import time
+from binary_transfer import read_stream
+from ssh_pool import backoff_delays
+
+FILE_TYPES = ("esql", "msgflow")
+
 
 class RemoteFileHandler:
-    def __init__(self, ssh_executor):
+    """Finds and fetches files on the CVS server.
+
+    With a content_cache (see ContentCache), file contents are only downloaded when their
+    revision is not cached yet; if the cache is offline, everything is served from the cache
+    and no remote command is run.
+
+    With binary_transfer, file contents are read as raw bytes from the command's output
+    stream instead of travelling as base64 text; this needs an executor that provides
+    open_command_stream(command) (see SSHSessionPool).
+    """
+
+    def __init__(self, ssh_executor, content_cache=None, binary_transfer=True):
         self.ssh_executor = ssh_executor
+        self.content_cache = content_cache
+        self.binary_transfer = binary_transfer and hasattr(ssh_executor, "open_command_stream")
+
+    @property
+    def offline(self):
+        return self.content_cache is not None and self.content_cache.offline
 
     def find_files(self, folder, file_type):
         """Find specific file types (.esql or .msgflow) in the specified folder on the remote server."""
+        if file_type not in FILE_TYPES:
+            raise ValueError("Invalid file type specified. Use 'esql' or 'msgflow'.")
+        if self.offline:
+            files = [path for path in self.content_cache.revisions(folder) if path.endswith(f".{file_type}")]
+            logging.info(f"Found {len(files)} cached {file_type} files in {folder}")
+            return files
         if file_type == 'esql':
             command = f"find {folder} -type f -name '*.esql' -not -path '*/Attic/*'"
         elif file_type == 'msgflow':
@@ -20,19 +51,198 @@ class RemoteFileHandler:
         return files
 
     def get_file_content_base64(self, cvsroot, file_path, retries=3, delay=1):
-        """Retrieve the latest version of a versioned file from CVS as base64 encoded content with retries."""
-        file_path = file_path.rstrip(',v')  # Remove the ',v' suffix from file_path
+        """Retrieve the latest version of a versioned file from CVS as base64 encoded content with retries.
+
+        Empty output is retried after an exponential backoff with jitter starting at delay seconds.
+        """
+        file_path = _cvs_path(file_path)
         command = f"CVSROOT={cvsroot} cvs checkout -p {file_path} | base64"
-        
+        delays = backoff_delays(retries - 1, base=delay)
+
         for attempt in range(1, retries + 1):
             result = self.ssh_executor.execute_command(command).strip()
             
             if result:
                 logging.info(f"Successfully retrieved base64 content for {file_path} on attempt {attempt}")
                 return result
-            
-            logging.warning(f"Attempt {attempt} to retrieve {file_path} failed. Retrying in {delay} second(s)...")
-            time.sleep(delay)
+
+            wait = next(delays, None)
+            if wait is None:
+                break
+            logging.warning(f"Attempt {attempt} to retrieve {file_path} failed. Retrying in {wait:.2f} second(s)...")
+            time.sleep(wait)
         
         logging.error(f"Failed to retrieve base64 content for {file_path} after {retries} attempts")
-        return None
\ No newline at end of file
+        return None
+
+    def get_file_bytes(self, cvsroot, file_path, retries=3, delay=1):
+        """Retrieve the latest version of a versioned file from CVS as raw bytes, with retries like get_file_content_base64.
+
+        The output is read into the thread's reusable transfer buffer and copied out once.
+        """
+        file_path = _cvs_path(file_path)
+        command = f"CVSROOT={cvsroot} cvs checkout -p {file_path}"
+        delays = backoff_delays(retries - 1, base=delay)
+
+        for attempt in range(1, retries + 1):
+            try:
+                stream = self.ssh_executor.open_command_stream(command)
+                try:
+                    content = bytes(read_stream(stream))
+                finally:
+                    stream.close()
+            except Exception as e:
+                # Streams are not retried by the session pool, so connection failures end up here too
+                logging.warning(f"Attempt {attempt} to retrieve {file_path} raised: {e}")
+                content = None
+
+            if content:
+                logging.info(f"Successfully retrieved {len(content)} bytes for {file_path} on attempt {attempt}")
+                return content
+
+            wait = next(delays, None)
+            if wait is None:
+                break
+            logging.warning(f"Attempt {attempt} to retrieve {file_path} failed. Retrying in {wait:.2f} second(s)...")
+            time.sleep(wait)
+
+        logging.error(f"Failed to retrieve content for {file_path} after {retries} attempts")
+        return None
+
+    def get_file_revision(self, cvsroot, file_path):
+        """Return the head revision of a single versioned file, or None if CVS does not report one."""
+        revisions = self.get_folder_revisions(cvsroot, _cvs_path(file_path))
+        return revisions.get(_cvs_path(file_path))
+
+    def get_file_content(self, cvsroot, file_path, revision=None):
+        """Return the content bytes of the latest version of file_path, or None if it could not be retrieved.
+
+        Goes through the content cache when there is one; revision saves the revision probe
+        when the caller already knows the head revision (see get_folder_revisions).
+        """
+        def download():
+            if self.binary_transfer:
+                return self.get_file_bytes(cvsroot, file_path)
+            encoded_content = self.get_file_content_base64(cvsroot, file_path)
+            return base64.b64decode(encoded_content) if encoded_content is not None else None
+
+        if self.content_cache is None:
+            return download()
+        return self.content_cache.fetch(
+            cvsroot, _cvs_path(file_path), download,
+            probe=lambda: self.get_file_revision(cvsroot, file_path), revision=revision
+        )
+
+    def fetch_files(self, cvsroot, file_paths, max_workers=None, revisions=None):
+        """Yield (file path, content bytes or None) for file_paths as the fetches complete.
+
+        Up to max_workers fetches run at the same time; by default as many as the executor has
+        sessions (see SSHSessionPool), one for a plain executor. The caller can start parsing
+        the first files while the others are still being fetched. revisions ({path: head
+        revision}, as returned by get_folder_revisions) lets the content cache skip its probes.
+        """
+        max_workers = max_workers or getattr(self.ssh_executor, "size", 1)
+        revisions = revisions or {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.get_file_content, cvsroot, file_path, revisions.get(_cvs_path(file_path))): file_path
+                for file_path in file_paths
+            }
+            for future in concurrent.futures.as_completed(futures):
+                file_path = futures[future]
+                try:
+                    yield file_path, future.result()
+                except Exception as e:
+                    logging.error(f"Failed to retrieve {file_path}: {e}")
+                    yield file_path, None
+
+    def get_folder_revisions(self, cvsroot, folder):
+        """Return {file path: head revision} for every versioned file below folder, using a single cvs rlog call.
+
+        Paths are the repository paths without the ',v' suffix and the Attic directory.
+        """
+        if self.offline:
+            return self.content_cache.revisions(folder, cvsroot)
+        command = f"CVSROOT={cvsroot} cvs -Q rlog -h {folder}"
+        logging.info(f"Executing command to read revisions: {command}")
+        output = self.ssh_executor.execute_command(command)
+
+        revisions = {}
+        rcs_file = None
+        for line in output.splitlines():
+            if line.startswith("RCS file:"):
+                rcs_file = line[len("RCS file:"):].strip()
+                if rcs_file.endswith(",v"):
+                    rcs_file = rcs_file[:-2]
+                rcs_file = rcs_file.replace("/Attic/", "/")
+            elif line.startswith("head:") and rcs_file is not None:
+                revisions[rcs_file] = line[len("head:"):].strip()
+                rcs_file = None
+        logging.info(f"Read {len(revisions)} revisions in {folder}")
+        return revisions
+
+    def iter_folder_files(self, cvsroot, folder, file_types=FILE_TYPES, cvs_export=True):
+        """Yield (file path, content bytes) for every matching file in folder, fetched as one compressed tar stream.
+
+        The head revisions of folder are exported from CVS into a temporary directory on the
+        remote side, so the contents are the ones get_folder_revisions reports and the file
+        manifest records. Paths are given below folder, as find_files returns them. The archive
+        is unpacked member by member while it arrives, so no more than one file is held in
+        memory at a time.
+
+        cvs_export=False reads folder as it is on disk instead. A working tree can differ from
+        the head revision, so such contents must not be recorded or cached under it (see
+        FileManifest.check_content).
+
+        The executor has to provide open_command_stream(command), returning a binary file-like
+        object with the command's standard output. Offline, the latest cached revisions of the
+        folder's files are yielded instead.
+        """
+        for file_type in file_types:
+            if file_type not in FILE_TYPES:
+                raise ValueError("Invalid file type specified. Use 'esql' or 'msgflow'.")
+        if self.offline:
+            yield from self._iter_cached_files(cvsroot, folder, file_types)
+            return
+        names = " -o ".join(f"-name '*.{file_type}'" for file_type in file_types)
+        if cvs_export:
+            command = (
+                f"tmp=$(mktemp -d) && cd $tmp && CVSROOT={cvsroot} cvs -Q export -r HEAD -d export {folder} >/dev/null && "
+                f"cd export && find . -type f \\( {names} \\) -print0 | tar czf - --null -T -; rm -rf $tmp"
+            )
+            # Members are ./relative paths of the export
+            prefix = folder.rstrip("/") + "/"
+        else:
+            command = f"find {folder} -type f \\( {names} \\) -not -path '*/Attic/*' -print0 | tar czf - --null -T -"
+            # tar drops the leading slash of absolute paths; put it back so paths match find_files
+            prefix = "/" if folder.startswith("/") else ""
+        logging.info(f"Executing command to stream {', '.join(file_types)} files: {command}")
+
+        count = 0
+        stream = self.ssh_executor.open_command_stream(command)
+        try:
+            with tarfile.open(fileobj=stream, mode="r|gz") as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    count += 1
+                    name = member.name[2:] if member.name.startswith("./") else member.name
+                    yield prefix + name, archive.extractfile(member).read()
+        except tarfile.ReadError as e:
+            logging.error(f"Failed to read the file archive of {folder}: {e}")
+            raise
+        finally:
+            stream.close()
+        logging.info(f"Streamed {count} files from {folder}")
+
+    def _iter_cached_files(self, cvsroot, folder, file_types):
+        for file_path, revision in sorted(self.content_cache.revisions(folder, cvsroot).items()):
+            if file_path.rsplit(".", 1)[-1] in file_types:
+                content = self.content_cache.get(cvsroot, file_path, revision)
+                if content is not None:
+                    yield file_path, content
+
+
+def _cvs_path(file_path):
+    """Repository path of file_path without the ',v' suffix, as used for revisions and cache keys."""
+    return file_path[:-2] if file_path.endswith(",v") else file_path
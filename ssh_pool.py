@@ -0,0 +1,160 @@
+import logging
+import queue
+import random
+import threading
+import time
+
+
+def backoff_delays(retries, base=0.5, maximum=10.0):
+    """Yields the wait before each retry: exponential backoff with full jitter, capped at maximum."""
+    for attempt in range(retries):
+        yield random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+class SSHSessionPool:
+    """Bounded pool of SSH sessions that can be used wherever a single SSHExecutor was used.
+
+    Sessions come from session_factory and are opened lazily, at most size of them; a command
+    waits for a free session, so size is also the concurrency limit for remote commands.
+    Sessions that are context managers (like SSHExecutor) are entered when created and exited
+    when discarded. A session has to provide execute_command(command, timeout=None) and, for
+    streamed fetches, open_command_stream(command).
+
+    A command that raises (connection loss, timeout) discards its session and is retried on a
+    fresh one after an exponential backoff with jitter, up to retries times.
+    """
+
+    def __init__(self, session_factory, size=4, command_timeout=60, retries=3, backoff_base=0.5, backoff_max=10.0):
+        self.session_factory = session_factory
+        self.size = size
+        self.command_timeout = command_timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = {"commands": 0, "retries": 0, "failures": 0, "sessions_opened": 0}
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def execute_command(self, command, timeout=None):
+        """Runs command on a pooled session and returns its output, retrying on a new session on failure."""
+        timeout = self.command_timeout if timeout is None else timeout
+        delays = backoff_delays(self.retries, self.backoff_base, self.backoff_max)
+        while True:
+            session = self._acquire()
+            try:
+                result = session.execute_command(command, timeout=timeout)
+            except Exception as e:
+                self._discard(session)
+                delay = next(delays, None)
+                if delay is None:
+                    self._count("failures")
+                    logging.error(f"Command failed after {self.retries} retries: {command} ({e})")
+                    raise
+                self._count("retries")
+                logging.warning(f"Command failed ({e}), retrying in {delay:.2f} s: {command}")
+                time.sleep(delay)
+                continue
+            self._release(session)
+            self._count("commands")
+            return result
+
+    def open_command_stream(self, command):
+        """Starts command on a pooled session and returns its output stream.
+
+        The session stays checked out until the stream is closed. Streams are not retried:
+        a failure halfway through cannot be replayed without the caller knowing.
+        """
+        session = self._acquire()
+        try:
+            stream = session.open_command_stream(command)
+        except Exception:
+            self._discard(session)
+            self._count("failures")
+            raise
+        self._count("commands")
+        return _PooledStream(stream, self, session)
+
+    def close(self):
+        """Closes all idle sessions; sessions still in use are closed when they are returned."""
+        self._closed = True
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close_session(session)
+
+    def _acquire(self):
+        if self._closed:
+            raise RuntimeError("SSH session pool is closed")
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            session = self.session_factory()
+            if hasattr(session, "__enter__"):
+                session = session.__enter__()
+        except Exception:
+            self._slots.release()
+            raise
+        self._count("sessions_opened")
+        return session
+
+    def _release(self, session):
+        if self._closed:
+            self._close_session(session)
+        else:
+            self._idle.put(session)
+        self._slots.release()
+
+    def _discard(self, session):
+        self._close_session(session)
+        self._slots.release()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    @staticmethod
+    def _close_session(session):
+        try:
+            if hasattr(session, "__exit__"):
+                session.__exit__(None, None, None)
+            elif hasattr(session, "close"):
+                session.close()
+        except Exception as e:
+            logging.warning(f"Error closing SSH session: {e}")
+
+
+class _PooledStream:
+    """Output stream of a pooled command; closing it hands the session back to the pool."""
+
+    def __init__(self, stream, pool, session):
+        self._stream = stream
+        self._pool = pool
+        self._session = session
+
+    def read(self, size=-1):
+        return self._stream.read(size)
+
+    def close(self):
+        if self._session is None:
+            return
+        session, self._session = self._session, None
+        try:
+            self._stream.close()
+        finally:
+            self._pool._release(session)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
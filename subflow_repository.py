@@ -0,0 +1,103 @@
+"""Parsed .subflow templates, shared by all the msgflows that use a subflow.
+
+A workspace references the same few standard subflows from nearly every flow. The
+repository parses each .subflow once and keeps the parsed template until the file's
+modification time changes. A template is never modified: callers get copies of the
+pieces the rewrite needs (features, property descriptors, attribute links) and are free
+to rename and re-link them.
+"""
+import copy
+import os
+import threading
+import xml.etree.ElementTree as ET
+
+
+class SubflowTemplate:
+    """The promoted properties of one parsed .subflow. Hands out copies only."""
+
+    def __init__(self, path, mtime, root):
+        self.path = path
+        self.mtime = mtime
+        # Only the pieces the rewrite needs are kept, not the whole tree. One pass in document
+        # order indexes them by xmi:id: the descriptor by describedAttribute (the last one wins)
+        # and the attribute link by promotedAttribute (the first one wins, as with find()).
+        features = []
+        self._property_descriptors = {}
+        self._attribute_links = {}
+        for elem in root.iter():
+            tag = elem.tag
+            if tag == 'eClassifiers':
+                features.extend(child for child in elem if child.tag == 'eStructuralFeatures')
+            elif tag == 'propertyDescriptor':
+                described_attribute = elem.attrib.get('describedAttribute')
+                if described_attribute:
+                    self._property_descriptors[described_attribute] = elem
+            elif tag == 'attributeLinks' and elem is not root:
+                self._attribute_links.setdefault(elem.attrib.get('promotedAttribute'), elem)
+        self._features = tuple(features)
+
+    def features(self):
+        """Returns copies of the eStructuralFeatures, in document order."""
+        return [copy.deepcopy(feature) for feature in self._features]
+
+    def property_descriptor(self, described_attribute):
+        """Returns a copy of the propertyDescriptor of an attribute, or None.
+
+        Descriptors are nested in a chain, each one holding the next; the copy leaves out the
+        nested descriptors, so it costs the size of one descriptor rather than the rest of the chain.
+        """
+        descriptor = self._property_descriptors.get(described_attribute)
+        if descriptor is None:
+            return None
+        clone = descriptor.makeelement(descriptor.tag, dict(descriptor.attrib))
+        clone.text = descriptor.text
+        clone.tail = descriptor.tail
+        clone.extend(copy.deepcopy(child) for child in descriptor if child.tag != 'propertyDescriptor')
+        return clone
+
+    def attribute_link(self, promoted_attribute):
+        """Returns a copy of the first attributeLinks element promoting an attribute, or None."""
+        link = self._attribute_links.get(promoted_attribute)
+        return copy.deepcopy(link) if link is not None else None
+
+
+class SubflowRepository:
+    """Caches SubflowTemplates by path and modification time, counting hits and misses."""
+
+    def __init__(self):
+        self._templates = {}  # path -> SubflowTemplate
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        """Returns the template of a .subflow file, parsing it only when it is new or has changed.
+
+        Raises OSError if the file cannot be read and ET.ParseError if it is not well-formed.
+        """
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            template = self._templates.get(path)
+            if template is not None and template.mtime == mtime:
+                self.hits += 1
+                return template
+            self.misses += 1
+        with open(path, 'r', encoding='utf-8') as file:
+            template = SubflowTemplate(path, mtime, ET.fromstring(file.read()))
+        with self._lock:
+            self._templates[path] = template
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "templates": len(self._templates),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
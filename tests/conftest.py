@@ -0,0 +1,30 @@
+import os
+import queue
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import DatabaseManager
+from db_writer import DBWriterThread
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    """A DatabaseManager on a fresh database made by create_database."""
+    manager = DatabaseManager(str(tmp_path / "analysis.db"))
+    manager.create_database()
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def db_queue(db_manager):
+    """The queue of a running DBWriterThread in batched mode, stopped after the test."""
+    db_queue = queue.Queue()
+    writer = DBWriterThread(db_queue, db_manager, batch_size=50)
+    writer.start()
+    yield db_queue
+    db_queue.put(None)
+    writer.join()
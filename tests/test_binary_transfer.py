@@ -0,0 +1,23 @@
+import io
+
+from binary_transfer import TransferBuffer
+
+
+def test_read_stream_grows_for_large_content_and_shrinks_afterwards():
+    buffer = TransferBuffer(initial_size=16, max_kept_size=64)
+    large = bytes(range(256)) * 2
+
+    view = buffer.read_stream(io.BytesIO(large))
+
+    assert bytes(view) == large
+    # The grown buffer is not kept for the next read, but the returned view still is valid
+    assert len(buffer._buffer) == 16
+    assert bytes(buffer.read_stream(io.BytesIO(b"small"))) == b"small"
+    assert bytes(view) == large
+
+
+def test_read_stream_keeps_a_buffer_within_the_limit():
+    buffer = TransferBuffer(initial_size=16, max_kept_size=64)
+
+    assert bytes(buffer.read_stream(io.BytesIO(b"x" * 40))) == b"x" * 40
+    assert len(buffer._buffer) == 64
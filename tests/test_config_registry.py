@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+from config_registry import ConfigError, ConfigRegistry
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MAPPING = {
+    "STD_INPUT": {
+        "Name": "STD_ERROR_SF",
+        "de_it_eai_STD_INPUT.subflow": "de_it_eai_STD_ERROR_SF.subflow",
+        "de/it/eai/STD_INPUT.subflow": "de/it/eai/STD_ERROR_SF.subflow",
+    },
+    "STD_SAMPLE": {
+        "Name": "STD_SAMPLE",
+        "de_it_eai_STD_SAMPLE.subflow": "de_it_eai_STD_SAMPLE.subflow",
+    },
+}
+
+
+def write_json(path, data, mtime_ns=None):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+def test_configuration_is_loaded_once_until_the_file_changes(tmp_path):
+    registry = ConfigRegistry()
+    path = write_json(tmp_path / "property_names.json", {"property_names": ["a", "b"]}, mtime_ns=1_000_000_000)
+
+    names = registry.property_names(path)
+    assert names == frozenset({"a", "b"})
+    assert registry.property_names(path) is names
+    assert registry.loads == 1
+
+    write_json(tmp_path / "property_names.json", {"property_names": ["c"]}, mtime_ns=2_000_000_000)
+    assert registry.property_names(path) == frozenset({"c"})
+    assert registry.loads == 2
+
+    registry.clear()
+    registry.property_names(path)
+    assert registry.loads == 3
+
+
+def test_replacement_mapping_replaces_the_namespaces_in_file_order(tmp_path):
+    mapping = ConfigRegistry().replacement_mapping(write_json(tmp_path / "mapping.json", MAPPING))
+
+    assert [(entry.key, entry.name) for entry in mapping.entries] == [("STD_INPUT", "STD_ERROR_SF"), ("STD_SAMPLE", "STD_SAMPLE")]
+    assert mapping.replace('xmlns:de_it_eai_STD_INPUT.subflow="de/it/eai/STD_INPUT.subflow"') == (
+        'xmlns:de_it_eai_STD_ERROR_SF.subflow="de/it/eai/STD_ERROR_SF.subflow"'
+    )
+    text = "de_it_eai_STD_SAMPLE.subflow and nothing else"
+    assert mapping.replace(text) is text
+    assert [entry.key for entry in mapping.entries_in("uses STD_SAMPLE")] == ["STD_SAMPLE"]
+    assert mapping.entries_in("no subflow") == ()
+
+
+def test_input_node_config_is_checked(tmp_path):
+    registry = ConfigRegistry()
+    config = {"input_node": {"node": {"translation": "MQ Input"}, "connections": [{"sourceTerminalName": "out"}]}}
+
+    assert registry.input_node_config(write_json(tmp_path / "good.json", config)) == config
+    with pytest.raises(ConfigError, match="connections"):
+        registry.input_node_config(write_json(tmp_path / "bad.json", {"input_node": {"connections": ["out"]}}))
+
+
+@pytest.mark.parametrize("loader, data", [
+    ("replacement_mapping", ["STD_INPUT"]),
+    ("replacement_mapping", {"STD_INPUT": {"Name": 1}}),
+    ("property_names", {"property_names": "a"}),
+    ("input_node_config", {"input_node": {"node": []}}),
+])
+def test_malformed_configuration_raises_config_error(tmp_path, loader, data):
+    with pytest.raises(ConfigError):
+        getattr(ConfigRegistry(), loader)(write_json(tmp_path / "config.json", data))
+
+
+def test_invalid_json_raises_config_error(tmp_path):
+    path = tmp_path / "mapping.json"
+    path.write_text("{", encoding="utf-8")
+
+    with pytest.raises(ConfigError):
+        ConfigRegistry().replacement_mapping(str(path))
+
+
+def test_shipped_configuration_files_load(monkeypatch):
+    monkeypatch.chdir(REPO)
+    registry = ConfigRegistry()
+
+    assert registry.replacement_mapping().entries
+    assert registry.property_names()
+    assert "input_node" in registry.input_node_config()
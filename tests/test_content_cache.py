@@ -0,0 +1,29 @@
+import os
+
+from content_cache import ContentCache
+
+
+def test_put_keeps_the_object_it_stores_and_evicts_older_ones(tmp_path):
+    # Random bytes do not compress, so each object takes about 600 of the 1000 bytes
+    cache = ContentCache(str(tmp_path), max_bytes=1000)
+    first, second = os.urandom(600), os.urandom(600)
+
+    cache.put("root", "a.esql", "1.1", first)
+    content_hash = cache.put("root", "b.esql", "1.1", second)
+
+    assert content_hash is not None
+    assert cache.get("root", "b.esql", "1.1") == second
+    assert cache.get("root", "a.esql", "1.1") is None
+    assert cache.stats["evictions"] == 1
+    cache.close()
+
+
+def test_put_skips_content_larger_than_the_cache(tmp_path):
+    cache = ContentCache(str(tmp_path), max_bytes=1000)
+    cache.put("root", "a.esql", "1.1", b"small")
+
+    assert cache.put("root", "big.esql", "1.1", os.urandom(2000)) is None
+    assert cache.get("root", "big.esql", "1.1") is None
+    # Nothing was evicted to make room for it
+    assert cache.get("root", "a.esql", "1.1") == b"small"
+    cache.close()
@@ -0,0 +1,34 @@
+from database_manager import DatabaseManager, JOIN_INDEXES
+
+JOIN_INDEX_NAMES = {index_name for index_name, _, _ in JOIN_INDEXES}
+
+
+def index_names(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def bulk_load_manager(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "analysis.db"), profile="bulk-load")
+    manager.create_database()
+    return manager
+
+
+def test_begin_run_drops_the_join_indexes_of_an_empty_database(tmp_path):
+    manager = bulk_load_manager(tmp_path)
+
+    manager.begin_run()
+    assert not JOIN_INDEX_NAMES & index_names(manager.conn)
+    manager.end_run()
+    assert JOIN_INDEX_NAMES <= index_names(manager.conn)
+    manager.close()
+
+
+def test_begin_run_keeps_the_join_indexes_of_a_filled_database(tmp_path):
+    manager = bulk_load_manager(tmp_path)
+    conn = manager.connect()
+    manager.insert_msgflow(conn, "Main.msgflow", manager.insert_project(conn, "P1"))
+
+    # A full run deletes the rows of every flow it analyses again, by msgflow_id
+    manager.begin_run()
+    assert JOIN_INDEX_NAMES <= index_names(manager.conn)
+    manager.close()
@@ -0,0 +1,108 @@
+import concurrent.futures
+import queue
+import time
+
+import pytest
+
+from db_writer import DBWriterThread, submit_db_operation
+
+
+def project_names(db_manager):
+    return {row[0] for row in db_manager.conn.execute("SELECT project_name FROM Projects")}
+
+
+def insert_then_fail(db_manager):
+    def operation(conn):
+        db_manager.insert_project(conn, "Broken")
+        raise ValueError("bad row")
+    return operation
+
+
+def test_submit_db_operation_returns_the_result_or_raises(db_manager, db_queue):
+    project_id = submit_db_operation(db_queue, db_manager.insert_project, "P1").result(timeout=5)
+    assert db_manager.conn.execute("SELECT project_id FROM Projects WHERE project_name = 'P1'").fetchone()[0] == project_id
+
+    future = submit_db_operation(db_queue, insert_then_fail(db_manager))
+    with pytest.raises(ValueError, match="bad row"):
+        future.result(timeout=5)
+    assert project_names(db_manager) == {"P1"}
+    # The ID cached for the rolled back row is gone with it
+    assert db_manager.id_caches["Projects"].get(("Broken",)) is None
+
+
+def test_a_failed_batch_is_rolled_back_and_retried_item_by_item(db_manager):
+    writer = DBWriterThread(queue.Queue(), db_manager, batch_size=10)
+    conn = db_manager.connect()
+    futures = [concurrent.futures.Future() for _ in range(3)]
+    batch = [
+        (db_manager.insert_project, ("A",), futures[0], None),
+        (insert_then_fail(db_manager), (), futures[1], None),
+        (db_manager.insert_project, ("C",), futures[2], None),
+    ]
+
+    writer._execute_batch(conn, batch)
+
+    assert project_names(db_manager) == {"A", "C"}
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=0)
+    # IDs cached inside the rolled back transaction were discarded, so the results are the committed rows
+    ids = dict(conn.execute("SELECT project_name, project_id FROM Projects"))
+    assert futures[0].result(timeout=0) == ids["A"]
+    assert futures[2].result(timeout=0) == ids["C"]
+    assert db_manager.insert_project(conn, "A") == ids["A"]
+
+
+def test_a_batch_commits_once_and_delivers_every_result(db_manager):
+    writer = DBWriterThread(queue.Queue(), db_manager, batch_size=10)
+    futures = [concurrent.futures.Future() for _ in range(3)]
+    batch = [(db_manager.insert_project, (f"P{index}",), future, None) for index, future in enumerate(futures)]
+
+    writer._execute_batch(db_manager.connect(), batch)
+
+    ids = dict(db_manager.conn.execute("SELECT project_name, project_id FROM Projects"))
+    assert [future.result(timeout=0) for future in futures] == [ids["P0"], ids["P1"], ids["P2"]]
+
+
+def test_get_or_insert_many_creates_missing_keys_once(db_manager):
+    conn = db_manager.conn
+    project_id = db_manager.insert_project(conn, "P1")
+    # More keys than fit in one SELECT of two-column row values
+    keys = [(f"PF{index}", project_id) for index in range(1200)]
+
+    ids = db_manager.get_or_insert_many(conn, "PFNumbers", keys + keys[:10])
+
+    assert len(ids) == 1200
+    assert dict(((row[0], row[1]), row[2]) for row in conn.execute("SELECT pf_number, project_id, pf_id FROM PFNumbers")) == ids
+    db_manager.id_caches["PFNumbers"].clear()
+    assert db_manager.get_or_insert_many(conn, "PFNumbers", keys) == ids
+    assert conn.execute("SELECT COUNT(*) FROM PFNumbers").fetchone()[0] == 1200
+
+
+def test_get_or_insert_many_uses_the_id_cache(db_manager):
+    conn = db_manager.conn
+    ids = db_manager.get_or_insert_many(conn, "Projects", [("P1",), ("P2",)])
+    conn.execute("DELETE FROM Projects")
+
+    # Served from the cache without touching the table
+    assert db_manager.get_or_insert_many(conn, "Projects", [("P1",), ("P2",)]) == ids
+    assert db_manager.insert_project(conn, "P1") == ids[("P1",)]
+
+
+def test_next_batch_returns_once_the_queue_is_drained(db_manager):
+    db_queue = queue.Queue()
+    writer = DBWriterThread(db_queue, db_manager, batch_size=2)
+    for index in range(3):
+        db_queue.put((db_manager.insert_project, (f"P{index}",), None, None))
+    db_queue.put(None)
+
+    assert len(writer._next_batch()[0]) == 2
+    assert writer._next_batch() == ([(db_manager.insert_project, ("P2",), None, None)], False)
+
+
+def test_round_trips_do_not_wait_for_the_batch_to_fill(db_manager, db_queue):
+    start = time.perf_counter()
+    for index in range(20):
+        submit_db_operation(db_queue, db_manager.insert_project, f"P{index}").result(timeout=5)
+
+    # Each round trip used to linger for the 50 ms batch timeout
+    assert time.perf_counter() - start < 0.5
@@ -0,0 +1,117 @@
+import os
+import sys
+
+import pytest
+
+from esql_lexer import parse_esql
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from bench_esql_parser import legacy_parse  # noqa: E402 - frozen copy of the regex scans
+
+
+def flatten(modules):
+    """parse_esql results in the (module, function, operations, calls) shape of legacy_parse."""
+    return [
+        (module.name, routine.name, list(routine.sql_operations), set(routine.calls))
+        for module in modules for routine in module.routines
+    ]
+
+
+# Sources both parsers must read the same way
+AGREEING_SOURCES = {
+    "quoted names": """
+        CREATE COMPUTE MODULE Quoted
+          CREATE FUNCTION Main() RETURNS BOOLEAN
+          BEGIN
+            SET r[] = SELECT C.ID FROM Database."Sales"."Customer" AS C WHERE C.ID = 1;
+            RETURN TRUE;
+          END;
+        END MODULE;
+    """,
+    "schema expressions": """
+        CREATE COMPUTE MODULE Schemas
+          CREATE FUNCTION Main() RETURNS BOOLEAN
+          BEGIN
+            SET r[] = SELECT T.A FROM Database.{SCHEMA}.ORDERS AS T;
+            SET s[] = SELECT T.A FROM Database.{getSchema(Env)}.ITEMS AS T;
+            INSERT INTO Database.{SCHEMA}.AUDIT VALUES (1);
+            RETURN TRUE;
+          END;
+        END MODULE;
+    """,
+    "strings and calls": """
+        CREATE COMPUTE MODULE Strings
+          CREATE PROCEDURE report(IN total INTEGER)
+          BEGIN
+            SET result = PASSTHRU('SELECT A FROM Reporting.Totals WHERE X = ?', total);
+            CASE WHEN total > 1 THEN
+              CALL logMessage(total);
+            END CASE;
+          END;
+        END MODULE;
+        CREATE FUNCTION standalone_helper(IN x INTEGER) RETURNS INTEGER
+        BEGIN
+          INSERT INTO Database.HELPER VALUES (x);
+          RETURN x;
+        END;
+    """,
+}
+
+
+@pytest.mark.parametrize("source", AGREEING_SOURCES.values(), ids=AGREEING_SOURCES.keys())
+def test_lexer_matches_the_regex_parser(source):
+    assert flatten(parse_esql(source)) == legacy_parse(source)
+
+
+def test_column_lists_are_not_part_of_the_table_name():
+    source = """
+        CREATE PROCEDURE store()
+        BEGIN
+          INSERT INTO Database.{SCHEMA}.AUDIT(col1, col2) VALUES (1, 2);
+          INSERT INTO Database.T1(A,B) VALUES (1, 2);
+          INSERT INTO Database.LOG (A, B) VALUES (1, 2);
+          INSERT INTO Database.{getSchema(Env)}.T2(A) VALUES (1);
+        END;
+    """
+    # The regex parser read 'Database.{SCHEMA}.AUDIT(col1' and 'Database.T1(A'
+    assert flatten(parse_esql(source))[0][2] == [
+        ("INSERT", "Database.{SCHEMA}.AUDIT"),
+        ("INSERT", "Database.T1"),
+        ("INSERT", "Database.LOG"),
+        ("INSERT", "Database.{getSchema(Env)}.T2"),
+    ]
+
+
+def test_comments_and_strings_do_not_count_as_code():
+    source = """
+        CREATE COMPUTE MODULE Commented
+          CREATE FUNCTION Main() RETURNS BOOLEAN
+          BEGIN
+            -- SELECT x FROM CommentedOut
+            /* INSERT INTO Hidden VALUES (1); END MODULE; */
+            SET msg = 'BEGIN processing; END';
+            SET OutputRoot.XMLNSC.Begin = msg;
+            INSERT INTO Database.LOG VALUES (msg);
+            RETURN TRUE;
+          END;
+          CREATE FUNCTION Second() RETURNS BOOLEAN
+          BEGIN
+            RETURN FALSE;
+          END;
+        END MODULE;
+    """
+    assert flatten(parse_esql(source)) == [
+        ("Commented", "Main", [("INSERT", "Database.LOG")], set()),
+        ("Commented", "Second", [], set()),
+    ]
+
+
+def test_subquery_parenthesis_is_not_part_of_the_table_name():
+    source = """
+        CREATE FUNCTION count_rows() RETURNS INTEGER
+        BEGIN
+          RETURN (SELECT COUNT(*) FROM Database.T1);
+        END;
+    """
+    assert flatten(parse_esql(source))[0][2] == [("SELECT", "Database.T1")]
@@ -0,0 +1,66 @@
+import io
+import logging
+
+from msgflow_parser import MsgFlowExpression, MsgFlowNode, MsgFlowProperty, iter_msgflow, parse_msgflow
+
+FLOW = """<?xml version="1.0" encoding="UTF-8"?>
+<Flow>
+  <Node name="Route">
+    <ComputeNode codeType="ESQL" moduleName="Route_Compute" functionName="Main" dataSource="DSN1"/>
+  </Node>
+  <Node name="Audit">
+    <ComputeNode codeType="ESQL" moduleName="Audit_Compute" functionName="Main"/>
+  </Node>
+  <Node name="Logging">
+    <SubflowNode/>
+    <ComputeNode codeType="ESQL" moduleName="Ignored_Compute" functionName="Main"/>
+  </Node>
+  <UserDefinedProperty name="Timeout" value="30"/>
+</Flow>
+"""
+
+NODES = [
+    MsgFlowNode("Route", False, MsgFlowExpression("ESQL", "Route_Compute", "Main", "DSN1")),
+    MsgFlowNode("Audit", False, MsgFlowExpression("ESQL", "Audit_Compute", "Main", None)),
+    MsgFlowNode("Logging", True, None),
+]
+PROPERTIES = [MsgFlowProperty("Timeout", "30")]
+
+
+def test_streaming_parser_finds_what_the_regex_scans_find():
+    assert parse_msgflow(FLOW) == (NODES, PROPERTIES)
+    assert parse_msgflow(FLOW, streaming=False) == (NODES, PROPERTIES)
+
+
+def test_streaming_parser_does_not_depend_on_chunk_boundaries():
+    expected = list(iter_msgflow(FLOW))
+
+    assert list(iter_msgflow(FLOW, chunk_size=7)) == expected
+    assert list(iter_msgflow(io.BytesIO(FLOW.encode("utf-8")), chunk_size=5)) == expected
+    assert list(iter_msgflow(io.StringIO(FLOW), chunk_size=3)) == expected
+
+
+def test_namespace_prefixes_are_ignored():
+    flow = """<ecore:EPackage xmlns:ecore="http://www.eclipse.org/emf/2002/Ecore" xmlns:eflow="urn:eflow">
+      <eflow:Node name="Route">
+        <eflow:ComputeNode codeType="ESQL" moduleName="Route_Compute" functionName="Main"/>
+      </eflow:Node>
+      <eflow:UserDefinedProperty name="Timeout" value="30"/>
+    </ecore:EPackage>"""
+
+    assert parse_msgflow(flow) == (
+        [MsgFlowNode("Route", False, MsgFlowExpression("ESQL", "Route_Compute", "Main", None))],
+        [MsgFlowProperty("Timeout", "30")],
+    )
+
+
+def test_malformed_flow_falls_back_to_the_regex_scans(caplog):
+    # An unescaped ampersand and no closing root element: not XML, but the regex scans still read it
+    flow = FLOW.replace('value="30"', 'value="A&B"').replace("</Flow>", "")
+
+    with caplog.at_level(logging.WARNING):
+        nodes, properties = parse_msgflow(flow)
+
+    assert "falling back to the regex parser" in caplog.text
+    assert nodes == NODES
+    assert properties == [MsgFlowProperty("Timeout", "A&B")]
@@ -0,0 +1,96 @@
+from database_manager import UNRESOLVED_ESQL_FILE
+from db_writer import submit_db_operation
+from esql_processor import ESQLProcessor, parse_esql_file
+from msgflow_processor import MsgFlowProcessor
+
+FLOW = """<?xml version="1.0" encoding="UTF-8"?>
+<Flow>
+  <Node name="Route">
+    <ComputeNode codeType="ESQL" moduleName="Route_Compute" functionName="Main" dataSource="DSN1"/>
+  </Node>
+  <Node name="Audit">
+    <ComputeNode codeType="ESQL" moduleName="Audit_Compute" functionName="Main"/>
+  </Node>
+  <Node name="Logging">
+    <SubflowNode/>
+  </Node>
+  <UserDefinedProperty name="Timeout" value="30"/>
+</Flow>
+"""
+
+
+def expressions(db_manager):
+    return db_manager.conn.execute("""
+        SELECT n.node_name, m.module_name, f.function_name, ef.esql_file_name, e.code_type, e.datasource
+        FROM Expressions e
+            JOIN Nodes n ON e.node_id = n.node_id
+            JOIN Modules m ON e.module_id = m.module_id
+            JOIN Functions f ON e.function_id = f.function_id AND f.module_id = m.module_id
+            JOIN EsqlFiles ef ON m.esql_file_id = ef.esql_file_id
+        ORDER BY n.node_name
+    """).fetchall()
+
+
+def test_process_file_stores_expressions(db_manager, db_queue):
+    project_id = submit_db_operation(db_queue, db_manager.insert_project, "PRJ").result()
+    processor = MsgFlowProcessor(db_queue, db_manager)
+
+    processor.process_file(FLOW, "flows/Main.msgflow", project_id)
+    processor.flush()
+
+    assert expressions(db_manager) == [
+        ("Audit", "Audit_Compute", "Main", UNRESOLVED_ESQL_FILE, "ESQL", None),
+        ("Route", "Route_Compute", "Main", UNRESOLVED_ESQL_FILE, "ESQL", "DSN1"),
+    ]
+    assert db_manager.conn.execute("SELECT property_name, property_value FROM UserDefinedProperties").fetchall() == [
+        ("Timeout", "30")
+    ]
+
+    # Processing the flow again stores nothing new
+    processor.process_file(FLOW, "flows/Main.msgflow", project_id)
+    processor.flush()
+    assert len(expressions(db_manager)) == 2
+
+
+def test_expressions_refer_to_parsed_esql_modules(db_manager, db_queue):
+    project_id = submit_db_operation(db_queue, db_manager.insert_project, "PRJ").result()
+    esql_processor = ESQLProcessor(db_queue, db_manager)
+    processor = MsgFlowProcessor(db_queue, db_manager)
+    esql = "CREATE COMPUTE MODULE Route_Compute\n  CREATE FUNCTION Main() RETURNS BOOLEAN\n  BEGIN\n  END;\nEND MODULE;\n"
+
+    # Route_Compute is declared before the flow is processed, Audit_Compute only afterwards
+    esql_processor.write_records("Route.esql", project_id, _parse(esql, project_id))
+    esql_processor.flush()
+    processor.process_file(FLOW, "flows/Main.msgflow", project_id)
+    processor.flush()
+    esql_processor.write_records("Audit.esql", project_id, _parse(esql.replace("Route", "Audit"), project_id))
+    esql_processor.flush()
+
+    assert [(node, module, esql_file) for node, module, _, esql_file, _, _ in expressions(db_manager)] == [
+        ("Audit", "Audit_Compute", "Audit.esql"),
+        ("Route", "Route_Compute", "Route.esql"),
+    ]
+    # Each module and function exists once, in the file that declares it
+    assert db_manager.conn.execute("SELECT COUNT(*) FROM Modules").fetchone()[0] == 2
+    assert db_manager.conn.execute("SELECT COUNT(*) FROM Functions").fetchone()[0] == 2
+    assert db_manager.conn.execute(
+        "SELECT COUNT(*) FROM Functions f JOIN Modules m ON f.module_id = m.module_id WHERE f.esql_file_id != m.esql_file_id"
+    ).fetchone()[0] == 0
+
+
+def _parse(content, project_id):
+    return parse_esql_file((content, "file.esql", project_id))[2]
+
+
+def test_manifest_entry_is_recorded_after_the_properties(db_manager, db_queue):
+    project_id = submit_db_operation(db_queue, db_manager.insert_project, "PRJ").result()
+    processor = MsgFlowProcessor(db_queue, db_manager)
+    manifest_entry = ("flows/Main.msgflow", project_id, "msgflow", "1.2", "hash")
+
+    processor.process_file(FLOW, "flows/Main.msgflow", project_id, manifest_entry)
+
+    # Until the buffered properties are written the flow must not count as processed
+    assert db_manager.get_file_manifest() == {}
+    processor.flush()
+    assert db_manager.get_file_manifest() == {"flows/Main.msgflow": ("1.2", "hash", project_id, "msgflow")}
+    assert db_manager.conn.execute("SELECT COUNT(*) FROM UserDefinedProperties").fetchone()[0] == 1
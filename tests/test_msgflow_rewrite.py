@@ -0,0 +1,35 @@
+import io
+import os
+import xml.etree.ElementTree as ET
+
+from msgflow_manipulation import (
+    _StartTagSplicer, load_msgflow, update_ecore_package_content, update_namespaces_with_replacements,
+    update_tree_namespaces
+)
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(REPO, "tests", "data")
+
+
+def rewrite(path):
+    """The load and write steps of read_msgflow_file and create_new_msgflow, into a string."""
+    root, namespaces, epackage_attributes = load_msgflow(path)
+    for prefix, uri in update_namespaces_with_replacements(namespaces).items():
+        ET.register_namespace(prefix, uri)
+    update_tree_namespaces(root)
+    output = io.StringIO()
+    output.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    ET.ElementTree(root).write(_StartTagSplicer(output, update_ecore_package_content(epackage_attributes)), encoding="unicode")
+    return output.getvalue()
+
+
+def test_rewrite_matches_the_whole_document_replacement(monkeypatch):
+    # The replacement mapping is read from the working directory
+    monkeypatch.chdir(REPO)
+
+    result = rewrite(os.path.join(DATA, "SubflowPrefixes.msgflow"))
+
+    # Written by the previous code, which applied the replacements to the serialized document:
+    # subflow prefixes in xmi:type, the xmlns declaration, hrefs, text and tails
+    with open(os.path.join(DATA, "SubflowPrefixes.expected.msgflow"), encoding="utf-8") as expected:
+        assert result == expected.read()
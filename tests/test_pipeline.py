@@ -0,0 +1,69 @@
+import threading
+import time
+
+from pipeline import Pipeline
+
+
+def test_items_flow_through_every_stage():
+    results = []
+    lock = threading.Lock()
+
+    def collect(item):
+        with lock:
+            results.append(item)
+        return ()
+
+    stats = (Pipeline(queue_size=4)
+             .add_stage("split", lambda n: [n, n + 100] if n % 2 else [], workers=2)
+             .add_stage("square", lambda n: [n * n], workers=3)
+             .add_stage("collect", collect)
+             .run(range(10)))
+
+    assert sorted(results) == sorted(n * n for odd in (1, 3, 5, 7, 9) for n in (odd, odd + 100))
+    assert (stats["split"]["items_in"], stats["split"]["items_out"]) == (10, 10)
+    assert (stats["square"]["items_in"], stats["square"]["items_out"]) == (10, 10)
+    assert stats["collect"]["items_in"] == 10
+    assert all(stage["queued"] == 0 for stage in stats.values())
+
+
+def test_full_queues_hold_back_the_earlier_stages():
+    pulled = []
+    release = threading.Event()
+
+    def items():
+        for n in range(100):
+            pulled.append(n)
+            yield n
+
+    def slow(item):
+        release.wait()
+        return ()
+
+    pipeline = Pipeline(queue_size=2).add_stage("pass", lambda n: [n]).add_stage("slow", slow)
+    runner = threading.Thread(target=pipeline.run, args=(items(),))
+    runner.start()
+    time.sleep(0.2)
+
+    # Two queues of two, one item in each worker and one waiting to be put
+    assert len(pulled) <= 7
+    assert pipeline.stages[1].input.qsize() == 2
+
+    release.set()
+    runner.join(timeout=10)
+    assert not runner.is_alive()
+    assert len(pulled) == 100
+    assert pipeline.stages[1].items_in == 100
+
+
+def test_failing_items_are_counted_and_do_not_stop_the_run():
+    def fail_on_three(n):
+        if n == 3:
+            raise ValueError("bad item")
+        return [n]
+
+    stats = Pipeline().add_stage("check", fail_on_three, workers=2).add_stage("sink", lambda n: ()).run(range(6))
+
+    assert stats["check"]["errors"] == 1
+    assert stats["check"]["items_in"] == 6
+    assert stats["check"]["items_out"] == 5
+    assert stats["sink"]["items_in"] == 5
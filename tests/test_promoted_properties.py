@@ -0,0 +1,75 @@
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from msgflow_manipulation import RewriteContext, process_subflow_data
+from subflow_repository import SubflowTemplate
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUBFLOW_PATH = "de/it/eai/STD_INPUT.subflow"
+
+SUBFLOW = """<ecore:EPackage xmlns:ecore="http://www.eclipse.org/emf/2002/Ecore" xmlns:xmi="http://www.omg.org/XMI">
+  <eClassifiers xmi:id="FCMComposite_1">
+    <eStructuralFeatures xmi:id="Property.Queue" name="Queue"/>
+    <eStructuralFeatures xmi:id="Property.Queue1" name="Queue1"/>
+    <attributeLinks promotedAttribute="Property.Queue">
+      <overriddenAttribute href="ComIbmMQInput.msgnode#Property.queueName"/>
+    </attributeLinks>
+    <attributeLinks promotedAttribute="Property.Queue1">
+      <overriddenAttribute href="ComIbmMQInput.msgnode#Property.backoutQueue"/>
+    </attributeLinks>
+    <attributeLinks promotedAttribute="Property.Queue1">
+      <overriddenAttribute href="ComIbmMQInput.msgnode#Property.ignored"/>
+    </attributeLinks>
+    <propertyOrganizer>
+      <propertyDescriptor describedAttribute="Property.Queue1" readOnly="true">
+        <propertyName key="Property.Queue1"/>
+        <propertyDescriptor describedAttribute="Property.Queue">
+          <propertyName key="Property.Queue"/>
+          <propertyDescriptor describedAttribute="Property.Queue1">
+            <propertyName key="Property.Queue1"/>
+          </propertyDescriptor>
+        </propertyDescriptor>
+      </propertyDescriptor>
+    </propertyOrganizer>
+  </eClassifiers>
+</ecore:EPackage>
+"""
+
+
+@pytest.fixture
+def template(monkeypatch):
+    # property_names.json is read from the working directory
+    monkeypatch.chdir(REPO)
+    return SubflowTemplate(SUBFLOW_PATH, 0, ET.fromstring(SUBFLOW))
+
+
+def test_template_indexes_descriptors_and_links_by_attribute(template):
+    # The last descriptor of an attribute and the first link promoting it win
+    assert template.property_descriptor("Property.Queue1").get("readOnly") is None
+    assert template.attribute_link("Property.Queue1").find("overriddenAttribute").get("href").endswith("backoutQueue")
+    assert template.attribute_link("Property.Missing") is None
+
+
+def test_renamed_ids_do_not_capture_the_elements_of_later_features(template):
+    context = RewriteContext("flows/Main.msgflow")
+    # The flow already has a Queue property, so both promoted properties move up by one
+    context.name_increment_tracker["Queue"] = 0
+
+    features, descriptors, links = process_subflow_data(
+        template, "de_it_eai_STD_INPUT.subflow", SUBFLOW_PATH, "FCMComposite_1_1", context)
+
+    # Queue becomes Property.Queue1, the original ID of the second feature, which becomes Property.Queue2
+    assert [(feature.get("name"), feature.get("{http://www.omg.org/XMI}id")) for feature in features] == [
+        ("Queue1", "Property.Queue1"), ("Queue2", "Property.Queue2")
+    ]
+    assert [(descriptor.get("describedAttribute"), descriptor.find("propertyName").get("key"))
+            for descriptor in descriptors] == [("Property.Queue1", "Property.Queue1"), ("Property.Queue2", "Property.Queue2")]
+    assert [(link.get("promotedAttribute"), link.get("overriddenNodes"), link.find("overriddenAttribute").get("href"))
+            for link in links] == [
+        ("Property.Queue1", "FCMComposite_1_1", f"{SUBFLOW_PATH}#Property.Queue"),
+        ("Property.Queue2", "FCMComposite_1_1", f"{SUBFLOW_PATH}#Property.Queue1"),
+    ]
+    # The template itself is left as it was
+    assert template.attribute_link("Property.Queue").get("promotedAttribute") == "Property.Queue"
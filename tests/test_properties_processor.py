@@ -0,0 +1,76 @@
+from db_writer import submit_db_operation
+from properties_processor import PropertiesProcessor
+
+PROPERTIES = """prod.broker.eg=IS_ORDERS
+queue.in=ORDERS.IN_EVT
+queue.err=ORDERS.IN_ERR
+prod.replace.replacement.17=ORDERSDB_PROD
+test.replace.replacement.17=ORDERSDB_TEST
+replace.value.3={RPL_PARTNER_URL}
+prod.replace.replacement.3=https://partner.example/prod
+replace.value.4=Timeout
+replace.replacement.4=30
+"""
+
+
+def setup_pap(db_manager, db_queue):
+    project_id = submit_db_operation(db_queue, db_manager.insert_project, "PRJ").result()
+    pf_id = submit_db_operation(db_queue, db_manager.insert_pf_number, "PF1", project_id).result()
+    pap_id = submit_db_operation(db_queue, db_manager.insert_pap, "PAP1").result()
+    return pap_id, pf_id
+
+
+def rows(db_manager, query):
+    return sorted(db_manager.conn.execute(query).fetchall())
+
+
+def test_process_files_stores_rows(db_manager, db_queue):
+    pap_id, pf_id = setup_pap(db_manager, db_queue)
+    processor = PropertiesProcessor(db_queue, db_manager)
+    files = [
+        ("orders.properties", PROPERTIES, pap_id, pf_id),
+        ("orders2.properties", PROPERTIES.replace("ORDERS.IN_ERR", "ORDERS.OUT_ERR"), pap_id, pf_id),
+    ]
+
+    processor.process_files(files, workers=0)
+    processor.flush()
+
+    file_ids = dict((name, file_id) for file_id, name in rows(db_manager, "SELECT file_id, file_name FROM PropertyFiles"))
+    assert sorted(file_ids) == ["orders.properties", "orders2.properties"]
+    assert rows(db_manager, """
+        SELECT q.queue_name, q.queue_type, pq.pap_id, pq.pf_id FROM PAP_Queues pq JOIN Queues q ON pq.queue_id = q.queue_id
+    """) == [
+        ("ORDERS.IN_ERR", "ERR", pap_id, pf_id),
+        ("ORDERS.IN_EVT", "EVT", pap_id, pf_id),
+        ("ORDERS.OUT_ERR", "ERR", pap_id, pf_id),
+    ]
+    assert rows(db_manager, "SELECT s.server_name, ps.pap_id FROM PAP_IntegrationServers ps JOIN IntegrationServers s USING (server_id)") == [
+        ("IS_ORDERS", pap_id)
+    ]
+    orders_id = file_ids["orders.properties"]
+    assert rows(db_manager, f"SELECT db_name, environment, value FROM DatabaseProperties WHERE file_id = {orders_id}") == [
+        ("{RPL_DB00}", "prod", "ORDERSDB_PROD"),
+        ("{RPL_DB00}", "test", "ORDERSDB_TEST"),
+    ]
+    assert rows(db_manager, f"SELECT ws_name, environment, url FROM WebServices WHERE file_id = {orders_id}") == [
+        ("{RPL_PARTNER_URL}", "prod", "https://partner.example/prod")
+    ]
+    assert rows(db_manager, f"SELECT property_name, environment, value FROM OtherProperties WHERE property_file_id = {orders_id}") == [
+        ("Timeout", "common", "30")
+    ]
+
+    # Ingesting the same files again adds nothing
+    counts = [rows(db_manager, f"SELECT COUNT(*) FROM {table}") for table in ("PropertyFiles", "PAP_Queues", "DatabaseProperties")]
+    processor.process_files(files, workers=0)
+    processor.flush()
+    assert [rows(db_manager, f"SELECT COUNT(*) FROM {table}") for table in ("PropertyFiles", "PAP_Queues", "DatabaseProperties")] == counts
+
+
+def test_process_file_links_queues_to_the_pap(db_manager, db_queue):
+    pap_id, pf_id = setup_pap(db_manager, db_queue)
+    processor = PropertiesProcessor(db_queue, db_manager)
+
+    processor.process_file(PROPERTIES, pap_id, pf_id)
+    processor.flush()
+
+    assert rows(db_manager, "SELECT pap_id, pf_id FROM PAP_Queues") == [(pap_id, pf_id), (pap_id, pf_id)]
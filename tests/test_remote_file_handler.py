@@ -0,0 +1,46 @@
+from fake_ssh_executor import FakeSSHExecutor
+from file_manifest import FileManifest
+from remote_file_handler import RemoteFileHandler
+
+FOLDER = "/repo/PROJECT"
+HEAD = {f"{FOLDER}/flows/Main.esql": b"CREATE FUNCTION head() BEGIN END;", f"{FOLDER}/Other.esql": b"-- other"}
+WORKING_TREE = dict(HEAD, **{f"{FOLDER}/flows/Main.esql": b"CREATE FUNCTION edited() BEGIN END;"})
+
+
+def handler():
+    return RemoteFileHandler(FakeSSHExecutor(HEAD, latency=0, working_tree=WORKING_TREE))
+
+
+def test_iter_folder_files_exports_the_head_revisions():
+    file_handler = handler()
+
+    files = dict(file_handler.iter_folder_files("cvsroot", FOLDER, ("esql",)))
+
+    assert "cvs -Q export -r HEAD" in file_handler.ssh_executor.commands[-1]
+    # Same paths as find_files, contents from CVS rather than from the edited working tree
+    assert files == HEAD
+    assert sorted(files) == sorted(file_handler.find_files(FOLDER, "esql"))
+
+
+def test_iter_folder_files_reads_the_working_tree_on_request():
+    files = dict(handler().iter_folder_files("cvsroot", FOLDER, ("esql",), cvs_export=False))
+
+    assert files == WORKING_TREE
+
+
+def test_working_tree_contents_are_not_recorded_under_the_head_revision(db_manager, db_queue):
+    file_handler = handler()
+    manifest = FileManifest(db_queue, db_manager, file_handler, "cvsroot", incremental=True)
+    path = f"{FOLDER}/flows/Main.esql"
+
+    entry = manifest.check_content(FOLDER, path, 1, "esql", WORKING_TREE[path], versioned=False)
+    assert entry[3] is None
+    assert manifest.check_content(FOLDER, path, 1, "esql", HEAD[path])[3] == "1.1"
+
+
+def test_only_the_rcs_suffix_is_removed_from_checkout_paths():
+    files = {"/repo/nav": b"navigation", "/repo/flows/Main.esql": b"main"}
+    file_handler = RemoteFileHandler(FakeSSHExecutor(files, latency=0), binary_transfer=False)
+
+    assert file_handler.get_file_content("cvsroot", "/repo/nav") == b"navigation"
+    assert file_handler.get_file_content("cvsroot", "/repo/flows/Main.esql,v") == b"main"
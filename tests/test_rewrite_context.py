@@ -0,0 +1,78 @@
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from msgflow_manipulation import RewriteContext, generate_unique_group_name, process_subflow_data
+from subflow_repository import SubflowTemplate
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+XMI_ID = "{http://www.omg.org/XMI}id"
+
+SUBFLOW = """<ecore:EPackage xmlns:ecore="http://www.eclipse.org/emf/2002/Ecore" xmlns:xmi="http://www.omg.org/XMI">
+  <eClassifiers xmi:id="FCMComposite_1">
+    <eStructuralFeatures xmi:id="Property.Queue" name="Queue"/>
+    <propertyOrganizer>
+      <propertyDescriptor describedAttribute="Property.Queue">
+        <propertyName key="Property.Queue"/>
+      </propertyDescriptor>
+    </propertyOrganizer>
+  </eClassifiers>
+</ecore:EPackage>
+"""
+
+
+@pytest.fixture
+def template(monkeypatch):
+    # property_names.json is read from the working directory
+    monkeypatch.chdir(REPO)
+    return SubflowTemplate("de/it/eai/STD_INPUT.subflow", 0, ET.fromstring(SUBFLOW))
+
+
+def promote(template, context, node_id="FCMComposite_1_1"):
+    features, descriptors, links = process_subflow_data(
+        template, "de_it_eai_STD_INPUT.subflow", "de/it/eai/STD_INPUT.subflow", node_id, context)
+    return ([feature.get("name") for feature in features],
+            [descriptor.get("groupName") for descriptor in descriptors],
+            [link.get("promotedAttribute") for link in links])
+
+
+def test_names_are_numbered_within_one_file(template):
+    context = RewriteContext("flows/Main.msgflow")
+
+    assert promote(template, context) == (["Queue"], ["Group.STD_INPUT"], ["Property.Queue"])
+    # The second node of the same subflow in the same flow gets the next names
+    assert promote(template, context, "FCMComposite_1_2") == (["Queue1"], ["Group.STD_INPUT1"], ["Property.Queue1"])
+
+
+def test_every_file_starts_from_a_fresh_context(template):
+    first = RewriteContext("flows/First.msgflow")
+    promote(template, first)
+    promote(template, first)
+
+    assert promote(template, RewriteContext("flows/Second.msgflow")) == (
+        ["Queue"], ["Group.STD_INPUT"], ["Property.Queue"]
+    )
+    assert generate_unique_group_name("Group.STD_INPUT", RewriteContext("flows/Third.msgflow")) == "Group.STD_INPUT"
+
+
+def test_summary_reports_counts_fields_and_step_timings():
+    context = RewriteContext("flows/Main.msgflow")
+    context.subflow_nodes = 3
+    context.missing_subflows = 1
+    with context.timed("load"):
+        pass
+    with context.timed("subflows"):
+        pass
+    with pytest.raises(ValueError):
+        with context.timed("subflows"):
+            raise ValueError("failed step")
+
+    summary = context.summary(features=2, output=None)
+
+    assert {key: summary[key] for key in ("file", "subflow_nodes", "missing_subflows", "features", "output")} == {
+        "file": "flows/Main.msgflow", "subflow_nodes": 3, "missing_subflows": 1, "features": 2, "output": None
+    }
+    # A failing step is timed as well; a step that did not run counts as zero
+    assert summary["subflows_seconds"] > 0 and summary["write_seconds"] == 0.0
+    assert summary["seconds"] == pytest.approx(summary["load_seconds"] + summary["subflows_seconds"])
@@ -0,0 +1,177 @@
+import sqlite3
+
+import pytest
+
+from database_manager import DatabaseManager, SCHEMA_VERSION
+
+
+def old_database(path):
+    """The property tables as create_database declared them before schema version 3."""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE PropertyFiles (
+            property_file_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pf_id INTEGER NOT NULL,
+            mandant_id INTEGER NOT NULL,
+            execution_group TEXT,
+            event_queue TEXT,
+            output_queue TEXT,
+            copy_queue TEXT
+        );
+        CREATE TABLE EnvironmentProperties (
+            env_property_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            property_file_id INTEGER NOT NULL,
+            environment_id INTEGER NOT NULL,
+            data_source_name TEXT,
+            web_service_url TEXT,
+            FOREIGN KEY (property_file_id) REFERENCES PropertyFiles(property_file_id)
+        );
+        CREATE UNIQUE INDEX ux_environment_properties_key
+            ON EnvironmentProperties (property_file_id, environment_id, data_source_name, web_service_url);
+        CREATE TABLE PAP_Queues (
+            pap_queue_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pap_id INTEGER NOT NULL,
+            pf_id INTEGER NOT NULL,
+            queue_id INTEGER NOT NULL,
+            FOREIGN KEY (pf_id) REFERENCES PropertyFiles(pf_id),
+            UNIQUE (pap_id, pf_id, queue_id)
+        );
+        INSERT INTO PropertyFiles (pf_id, mandant_id, execution_group) VALUES (1, 1, 'EG1');
+        INSERT INTO PAP_Queues (pap_id, pf_id, queue_id) VALUES (1, 1, 1);
+        PRAGMA user_version = 2;
+    """)
+    conn.close()
+
+
+def test_migration_rebuilds_the_property_tables(tmp_path):
+    path = str(tmp_path / "old.db")
+    old_database(path)
+
+    manager = DatabaseManager(path)
+    manager.create_database()
+    conn = manager.conn
+
+    assert [row[1] for row in conn.execute("PRAGMA table_info(PropertyFiles)")] == ["file_id", "pap_id", "pf_id", "file_name"]
+    assert conn.execute("SELECT pf_id, mandant_id, execution_group FROM PropertyFiles_legacy").fetchall() == [(1, 1, "EG1")]
+    assert conn.execute("SELECT pap_id, pf_id, queue_id FROM PAP_Queues").fetchall() == [(1, 1, 1)]
+    assert {(row[2], row[3], row[4]) for row in conn.execute("PRAGMA foreign_key_list(PAP_Queues)")} == {
+        ("PAP", "pap_id", "pap_id"), ("PFNumbers", "pf_id", "pf_id"), ("Queues", "queue_id", "queue_id")
+    }
+    # Indexes dropped with the rebuilt tables are created again
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ux_environment_properties_key'").fetchone()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    manager.close()
+
+
+def test_migration_runs_again_over_the_tables_an_earlier_one_left(tmp_path):
+    path = str(tmp_path / "old.db")
+    old_database(path)
+    manager = DatabaseManager(path)
+    manager.create_database()
+    manager.close()
+
+    # The old table is back, together with a half-built table from a migration that failed partway
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        DROP TABLE PropertyFiles;
+        CREATE TABLE PropertyFiles (
+            property_file_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pf_id INTEGER NOT NULL,
+            mandant_id INTEGER NOT NULL,
+            execution_group TEXT
+        );
+        INSERT INTO PropertyFiles (pf_id, mandant_id, execution_group) VALUES (2, 1, 'EG2');
+        CREATE TABLE PropertyFiles_new (file_id INTEGER);
+        PRAGMA user_version = 2;
+    """)
+    conn.close()
+
+    manager = DatabaseManager(path)
+    manager.create_database()
+    conn = manager.conn
+
+    assert [row[1] for row in conn.execute("PRAGMA table_info(PropertyFiles)")] == ["file_id", "pap_id", "pf_id", "file_name"]
+    assert conn.execute("SELECT pf_id, execution_group FROM PropertyFiles_legacy").fetchall() == [(1, "EG1")]
+    assert conn.execute("SELECT pf_id, execution_group FROM PropertyFiles_legacy_2").fetchall() == [(2, "EG2")]
+    assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'PropertyFiles_new'").fetchone()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    manager.close()
+
+
+def test_migration_leaves_a_current_database_alone(db_manager):
+    schema = db_manager.conn.execute("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall()
+    db_manager.conn.execute("PRAGMA user_version = 2")
+
+    db_manager.migrate_schema()
+
+    assert db_manager.conn.execute("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall() == schema
+
+
+def index_definitions(conn):
+    return conn.execute(
+        "SELECT name, tbl_name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL ORDER BY name"
+    ).fetchall()
+
+
+def test_migration_brings_an_unversioned_database_to_the_fresh_schema(tmp_path):
+    path = str(tmp_path / "unversioned.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE Functions (
+            function_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            function_name TEXT NOT NULL,
+            esql_file_id INTEGER NOT NULL
+        );
+        CREATE TABLE Calls (
+            call_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            function_id INTEGER NOT NULL,
+            call_name TEXT NOT NULL
+        );
+    """)
+    conn.close()
+
+    manager = DatabaseManager(path)
+    manager.create_database()
+    fresh = DatabaseManager(str(tmp_path / "fresh.db"))
+    fresh.create_database()
+
+    assert "module_id" in [row[1] for row in manager.conn.execute("PRAGMA table_info(Functions)")]
+    assert index_definitions(manager.conn) == index_definitions(fresh.conn)
+    manager.close()
+    fresh.close()
+
+
+def test_version_3_key_indexes_are_rebuilt(db_manager):
+    conn = db_manager.conn
+    conn.execute("DROP INDEX ux_functions_key")
+    conn.execute("DROP INDEX ux_calls_key")
+    conn.execute("CREATE UNIQUE INDEX ux_functions_key ON Functions (function_name, esql_file_id, module_id)")
+    conn.execute("PRAGMA user_version = 3")
+
+    db_manager.migrate_schema()
+
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'ux_functions_key'").fetchone()[0]
+    assert "IFNULL(module_id, 0)" in sql
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ux_calls_key'").fetchone()
+
+
+def test_null_key_columns_do_not_duplicate_rows(db_manager):
+    conn = db_manager.conn
+    project_id = db_manager.insert_project(conn, "P1")
+    esql_file_id = db_manager.insert_esql_file(conn, "Flow.esql", project_id)
+    msgflow_id = db_manager.insert_msgflow(conn, "Flow", project_id)
+
+    function_id = db_manager._insert_function(conn, "Main", esql_file_id, None)
+    db_manager.id_caches["Functions"].clear()
+    assert db_manager._insert_function(conn, "Main", esql_file_id, None) == function_id
+    assert db_manager.get_or_insert_many(conn, "Functions", [("Main", esql_file_id, None), ("Other", esql_file_id, None)])[
+        ("Main", esql_file_id, None)] == function_id
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO Functions (function_name, esql_file_id) VALUES ('Main', ?)", (esql_file_id,))
+
+    rows = [(msgflow_id, "Timeout", None)] * 2
+    db_manager.insert_rows_bulk(conn, "UserDefinedProperties", rows)
+    db_manager.insert_rows_bulk(conn, "UserDefinedProperties", rows)
+    assert conn.execute("SELECT COUNT(*) FROM Functions").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM UserDefinedProperties").fetchone()[0] == 1
@@ -0,0 +1,92 @@
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from msgflow_manipulation import create_new_msgflow, insert_propertyDescriptors, splice_children
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def tags(parent):
+    return [child.tag for child in parent]
+
+
+def parent_with(*names):
+    parent = ET.Element("eClassifiers")
+    for name in names:
+        ET.SubElement(parent, name)
+    return parent
+
+
+def elements(*names):
+    return [ET.Element(name) for name in names]
+
+
+def insert_one_by_one(parent, insertions):
+    """What splice_children replaces: insert() per element, from the highest index down."""
+    for index, new_elements in sorted(insertions, key=lambda insertion: insertion[0], reverse=True):
+        for offset, element in enumerate(new_elements):
+            parent.insert(index + offset, element)
+
+
+@pytest.mark.parametrize("insertions", [
+    [],
+    [(0, ["n1", "n2"])],
+    [(3, ["n1"])],
+    [(1, ["n1"]), (3, ["n2", "n3"]), (0, ["n4"])],
+    [(2, ["n1"]), (2, []), (3, ["n2"])],
+])
+def test_splice_children_matches_single_inserts(insertions):
+    spliced, inserted = parent_with("a", "b", "c"), parent_with("a", "b", "c")
+
+    splice_children(spliced, [(index, elements(*names)) for index, names in insertions])
+    insert_one_by_one(inserted, [(index, elements(*names)) for index, names in insertions])
+
+    assert tags(spliced) == tags(inserted)
+
+
+def test_insertions_at_the_same_index_keep_their_order():
+    parent = parent_with("a", "b")
+
+    splice_children(parent, [(1, elements("first")), (2, elements("end")), (1, elements("second"))])
+
+    assert tags(parent) == ["a", "first", "second", "b", "end"]
+
+
+def test_property_descriptors_are_chained_below_the_last_one():
+    organizer = ET.fromstring(
+        "<propertyOrganizer><propertyDescriptor describedAttribute='A'>"
+        "<propertyDescriptor describedAttribute='B'/></propertyDescriptor></propertyOrganizer>")
+
+    insert_propertyDescriptors(organizer, [ET.Element("propertyDescriptor", describedAttribute=name) for name in "CD"])
+
+    chain, current = [], organizer
+    while current.find("propertyDescriptor") is not None:
+        current = current.find("propertyDescriptor")
+        chain.append(current.get("describedAttribute"))
+    assert chain == ["A", "B", "C", "D"]
+
+
+def test_new_msgflow_places_the_promoted_properties(tmp_path, monkeypatch):
+    # The replacement mapping is read from the working directory
+    monkeypatch.chdir(REPO)
+    root = ET.fromstring(
+        "<EPackage><eClassifiers><eSuperTypes/><eStructuralFeatures name='Existing'/><composition/>"
+        "<propertyOrganizer/><stickyBoard/></eClassifiers></EPackage>")
+    features = [ET.Element("eStructuralFeatures", name=name) for name in ("Queue", "Queue1")]
+    descriptors = [ET.Element("propertyDescriptor", describedAttribute="Property.Queue")]
+    links = [ET.Element("attributeLinks", promotedAttribute=name) for name in ("Property.Queue", "Property.Queue1")]
+
+    path = create_new_msgflow(str(tmp_path / "Main.msgflow"), features, descriptors, links, root, None)
+
+    classifier = ET.parse(path).getroot().find("eClassifiers")
+    assert [(child.tag, child.get("name") or child.get("promotedAttribute")) for child in classifier] == [
+        ("eSuperTypes", None),
+        ("eStructuralFeatures", "Existing"), ("eStructuralFeatures", "Queue"), ("eStructuralFeatures", "Queue1"),
+        ("composition", None),
+        ("propertyOrganizer", None),
+        ("attributeLinks", "Property.Queue"), ("attributeLinks", "Property.Queue1"),
+        ("stickyBoard", None),
+    ]
+    assert classifier.find("propertyOrganizer/propertyDescriptor").get("describedAttribute") == "Property.Queue"
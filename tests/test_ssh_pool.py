@@ -0,0 +1,129 @@
+import random
+import threading
+import time
+
+import pytest
+
+import ssh_pool
+from fake_ssh_executor import FakeSSHExecutor
+from ssh_pool import SSHSessionPool, backoff_delays
+
+FILES = {"/repo/P/a.esql": b"CREATE FUNCTION a() BEGIN END;"}
+
+
+class FlakySession:
+    """Fails the first failures commands across all sessions, then answers with "ok"."""
+
+    def __init__(self, state):
+        self.state = state
+        self.closed = False
+        state["opened"] += 1
+
+    def execute_command(self, command, timeout=None):
+        with self.state["lock"]:
+            self.state["active"] += 1
+            self.state["max_active"] = max(self.state["max_active"], self.state["active"])
+            fail = self.state["failures"] > 0
+            self.state["failures"] -= fail
+        try:
+            if self.state["latency"]:
+                time.sleep(self.state["latency"])
+            if fail:
+                raise ConnectionError("Simulated SSH channel failure")
+            return "ok"
+        finally:
+            with self.state["lock"]:
+                self.state["active"] -= 1
+
+    def close(self):
+        self.closed = True
+
+
+def flaky_state(failures=0, latency=0):
+    return {"failures": failures, "latency": latency, "opened": 0, "active": 0, "max_active": 0,
+            "lock": threading.Lock()}
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """The backoff waits of the pool, recorded instead of slept."""
+    recorded = []
+    monkeypatch.setattr(ssh_pool.time, "sleep", recorded.append)
+    return recorded
+
+
+def test_backoff_delays_are_jittered_below_the_exponential_cap():
+    random.seed(1)
+    runs = [list(backoff_delays(6, base=0.5, maximum=4.0)) for _ in range(50)]
+
+    for delays in runs:
+        assert len(delays) == 6
+        for attempt, delay in enumerate(delays):
+            assert 0 <= delay <= min(4.0, 0.5 * 2 ** attempt)
+    # Full jitter: retries of concurrent commands do not line up
+    assert len({delays[3] for delays in runs}) == len(runs)
+
+
+def test_failed_command_is_retried_on_a_fresh_session(sleeps):
+    state = flaky_state(failures=2)
+    sessions = []
+    pool = SSHSessionPool(lambda: sessions.append(FlakySession(state)) or sessions[-1], size=2, retries=3,
+                          backoff_base=0.5, backoff_max=10.0)
+
+    assert pool.execute_command("true") == "ok"
+
+    assert [session.closed for session in sessions] == [True, True, False]
+    assert pool.stats == {"commands": 1, "retries": 2, "failures": 0, "sessions_opened": 3}
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.5 and 0 <= sleeps[1] <= 1.0
+
+
+def test_command_fails_once_the_retries_are_used_up(sleeps):
+    state = flaky_state(failures=10)
+    pool = SSHSessionPool(lambda: FlakySession(state), size=1, retries=2)
+
+    with pytest.raises(ConnectionError):
+        pool.execute_command("true")
+
+    assert pool.stats["retries"] == 2 and pool.stats["failures"] == 1
+    assert len(sleeps) == 2
+    # The slots of the discarded sessions were given back
+    state["failures"] = 0
+    assert pool.execute_command("true") == "ok"
+
+
+def test_pool_bounds_concurrency_and_reuses_sessions():
+    state = flaky_state(latency=0.02)
+    pool = SSHSessionPool(lambda: FlakySession(state), size=2)
+
+    threads = [threading.Thread(target=pool.execute_command, args=("true",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert state["max_active"] == 2
+    assert state["opened"] == 2
+    assert pool.stats["commands"] == 8
+
+
+def test_stream_holds_its_session_until_closed():
+    pool = SSHSessionPool(lambda: FakeSSHExecutor(FILES, latency=0), size=1)
+
+    stream = pool.open_command_stream("cvs checkout -p /repo/P/a.esql")
+    assert not pool._slots.acquire(blocking=False)
+    assert stream.read() == FILES["/repo/P/a.esql"]
+    stream.close()
+    stream.close()
+
+    assert pool.execute_command("find /repo/P -type f -name '*.esql'") == "/repo/P/a.esql\n"
+    assert pool.stats["sessions_opened"] == 1
+
+
+def test_closed_pool_refuses_commands():
+    pool = SSHSessionPool(lambda: FakeSSHExecutor(FILES, latency=0))
+    pool.execute_command("find /repo/P -type f -name '*.esql'")
+    pool.close()
+
+    with pytest.raises(RuntimeError):
+        pool.execute_command("find /repo/P -type f -name '*.esql'")
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from subflow_repository import SubflowRepository
+
+SUBFLOW = """<?xml version="1.0" encoding="UTF-8"?>
+<ecore:EPackage xmlns:ecore="http://www.eclipse.org/emf/2002/Ecore" xmlns:xmi="http://www.omg.org/XMI">
+  <eClassifiers xmi:id="FCMComposite_1">
+    <eStructuralFeatures xmi:id="Property.{feature}" name="{feature}"/>
+    <attributeLinks promotedAttribute="Property.{feature}">
+      <overriddenAttribute href="Compute.msgnode#Property.dataSource"/>
+    </attributeLinks>
+    <propertyOrganizer>
+      <propertyDescriptor describedAttribute="Property.{feature}">
+        <propertyName key="Property.{feature}"/>
+        <propertyDescriptor describedAttribute="Property.Next"/>
+      </propertyDescriptor>
+    </propertyOrganizer>
+  </eClassifiers>
+</ecore:EPackage>
+"""
+
+
+def write_subflow(path, feature, mtime_ns=None):
+    path.write_text(SUBFLOW.format(feature=feature), encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_unchanged_subflow_is_parsed_once(tmp_path):
+    path = tmp_path / "Logging.subflow"
+    write_subflow(path, "Queue")
+    repository = SubflowRepository()
+
+    template = repository.get(str(path))
+    assert repository.get(str(path)) is template
+    assert repository.get(str(path)) is template
+
+    assert repository.stats() == {"templates": 1, "hits": 2, "misses": 1, "hit_rate": 2 / 3}
+
+
+def test_changed_modification_time_reparses_the_subflow(tmp_path):
+    path = tmp_path / "Logging.subflow"
+    write_subflow(path, "Queue", mtime_ns=1_000_000_000)
+    repository = SubflowRepository()
+    assert [feature.get("name") for feature in repository.get(str(path)).features()] == ["Queue"]
+
+    write_subflow(path, "Topic", mtime_ns=2_000_000_000)
+    template = repository.get(str(path))
+
+    assert [feature.get("name") for feature in template.features()] == ["Topic"]
+    assert template.mtime == 2_000_000_000
+    assert repository.stats()["misses"] == 2
+    assert repository.stats()["templates"] == 1
+
+
+def test_template_hands_out_copies(tmp_path):
+    path = tmp_path / "Logging.subflow"
+    write_subflow(path, "Queue")
+    template = SubflowRepository().get(str(path))
+
+    template.features()[0].set("name", "Renamed")
+    template.attribute_link("Property.Queue").set("promotedAttribute", "Property.Renamed")
+    descriptor = template.property_descriptor("Property.Queue")
+
+    assert template.features()[0].get("name") == "Queue"
+    assert template.attribute_link("Property.Queue").get("promotedAttribute") == "Property.Queue"
+    # The nested descriptor of the chain is left out of the copy
+    assert [child.tag for child in descriptor] == ["propertyName"]
+    assert template.property_descriptor("Property.Missing") is None
+
+
+def test_missing_subflow_raises_and_clear_empties_the_cache(tmp_path):
+    repository = SubflowRepository()
+    with pytest.raises(OSError):
+        repository.get(str(tmp_path / "Missing.subflow"))
+
+    path = tmp_path / "Logging.subflow"
+    write_subflow(path, "Queue")
+    repository.get(str(path))
+    repository.clear()
+    repository.get(str(path))
+
+    assert repository.stats()["misses"] == 2